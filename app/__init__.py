@@ -1,8 +1,13 @@
 import os
+from datetime import datetime
+import numpy as np
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
-from flask_login import LoginManager
+from flask_login import LoginManager, UserMixin
+from sqlalchemy.orm import validates, deferred
+from app.competence import parse_month_year, format_competence
+from app.salary_packing import salary_views, unpack_series
 
 # Get the absolute path of the project directory
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -10,8 +15,20 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 app = Flask(__name__)
 # Configure the secret key and database URI
 app.config['SECRET_KEY'] = 'a_very_secret_key_that_should_be_changed'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'site.db')
+# DATABASE_URL points the app at another database (e.g. a scratch one for benchmarks)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'site.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# How often (in seconds) a worker checks the database for a new factor version
+app.config['FACTOR_VERSION_CHECK_SECONDS'] = 5
+# Where new salary series are written: 'rows' (one SalaryContribution per month)
+# or 'packed' (one float64 blob per simulation, see app/salary_packing.py)
+app.config['SALARY_STORAGE'] = 'rows'
+app.config['DASHBOARD_PAGE_SIZE'] = 25
+# Rendered PDF reports are cached here, keyed by simulation and content hash
+app.config['PDF_CACHE_DIR'] = os.path.join(basedir, 'pdf_cache')
+app.config['PDF_RENDER_WORKERS'] = 2
+# How long a download request waits for a fresh render before showing the progress page
+app.config['PDF_RENDER_WAIT_SECONDS'] = 3
 
 # Initialize extensions
 db = SQLAlchemy(app)
@@ -23,7 +40,7 @@ login_manager.login_message_category = 'info'
 
 # --- Database Models ---
 
-class User(db.Model):
+class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
     password_hash = db.Column(db.String(60), nullable=False)
@@ -38,32 +55,108 @@ class CorrectionFactor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # Storing as 'jul/94' format
     month_year = db.Column(db.String(10), unique=True, nullable=False)
+    # Same month as year * 12 + (month - 1), kept in sync with month_year
+    competence = db.Column(db.Integer, unique=True, index=True)
     value = db.Column(db.Float, nullable=False)
 
+    @validates('month_year')
+    def _sync_competence(self, key, month_year):
+        self.competence = parse_month_year(month_year)
+        return format_competence(self.competence)
+
     def __repr__(self):
         return f"CorrectionFactor('{self.month_year}', {self.value})"
 
+class FactorVersion(db.Model):
+    # Single row bumped every time the factor table changes, so each worker
+    # knows when its in-process factor cache is stale.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"FactorVersion({self.version})"
+
+class VintageFactor(db.Model):
+    # Every factor table ever published, one row per (vintage, competence). The
+    # vintage is the publication month as a competence (year * 12 + month - 1).
+    vintage = db.Column(db.Integer, primary_key=True)
+    competence = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"VintageFactor({format_competence(self.vintage)}, {format_competence(self.competence)}, {self.value})"
+
 class Simulation(db.Model):
+    __table_args__ = (
+        # Serves the dashboard: one user's simulations, newest first
+        db.Index('ix_simulation_user_created', 'user_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     server_name = db.Column(db.String(100), nullable=False)
     dob = db.Column(db.Date, nullable=False)
     benefit_type = db.Column(db.String(100), nullable=False)
     gender = db.Column(db.String(20), nullable=False)
     result = db.Column(db.Float, nullable=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    # FactorVersion.version the result was calculated with
+    factor_version = db.Column(db.Integer, nullable=True)
+    # Published factor table (VintageFactor.vintage) to calculate with;
+    # None uses the current CorrectionFactor table
+    reference_vintage = db.Column(db.Integer, nullable=True)
+    # Set in Python, so every row is stored with microseconds ('%Y-%m-%d %H:%M:%S.%f'),
+    # the same text a bound datetime compares with
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    salaries = db.relationship('SalaryContribution', backref='simulation', lazy=True, cascade="all, delete-orphan")
+    salary_rows = db.relationship('SalaryContribution', backref='simulation', lazy=True, cascade="all, delete-orphan")
+    # Packed salary series ('packed' storage mode): first competence + float64 blob
+    salary_start = db.Column(db.Integer, nullable=True, index=True)
+    salary_data = deferred(db.Column(db.LargeBinary, nullable=True))
+
+    @property
+    def is_packed(self):
+        return self.salary_data is not None
+
+    @property
+    def salaries(self):
+        """The salary months of the simulation, whichever storage mode holds them."""
+        if self.is_packed:
+            return salary_views(self.salary_start, self.salary_data)
+        return self.salary_rows
+
+    def salary_series(self):
+        """Returns (competences, amounts) arrays of the months with a salary."""
+        if self.is_packed:
+            return unpack_series(self.salary_start, self.salary_data)
+        rows = self.salary_rows
+        return (np.array([s.competence for s in rows], dtype=np.int64),
+                np.array([s.amount for s in rows], dtype=np.float64))
+
+    @classmethod
+    def name_contains(cls, text):
+        """Case-insensitive filter on server_name; '%' and '_' in `text` match literally."""
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return cls.server_name.ilike(f'%{escaped}%', escape='\\')
 
     def __repr__(self):
         return f"Simulation(Server: '{self.server_name}', Result: {self.result})"
 
 class SalaryContribution(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('simulation_id', 'month_year', name='uq_salary_contribution_simulation_month'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     simulation_id = db.Column(db.Integer, db.ForeignKey('simulation.id'), nullable=False)
     # Storing as 'jul/94' format
-    month_year = db.Column(db.String(10), nullable=False)
+    month_year = db.Column(db.String(10), nullable=False, index=True)
+    competence = db.Column(db.Integer, index=True)
     amount = db.Column(db.Float, nullable=False)
 
+    @validates('month_year')
+    def _sync_competence(self, key, month_year):
+        self.competence = parse_month_year(month_year)
+        return format_competence(self.competence)
+
     def __repr__(self):
         return f"SalaryContribution('{self.month_year}', {self.amount})"
 
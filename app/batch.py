@@ -0,0 +1,144 @@
+import csv
+import math
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from app import app, db
+from app import Simulation, SalaryContribution
+from app.calculations import calculate_benefits_batch
+from app.competence import parse_month_year, format_competence
+from app.factor_cache import MissingFactorError
+from app.salary_packing import pack_series
+
+GENDERS = ('FEMININO', 'MASCULINO')
+
+SimulationSpec = namedtuple('SimulationSpec', ['server_name', 'dob', 'benefit_type', 'gender', 'salaries'])
+
+
+def make_spec(record, position):
+    """Validates one simulation record ({..., 'salaries': {'jul/94': 1000.0}}) into a SimulationSpec."""
+    if not isinstance(record, dict):
+        raise ValueError(f"Simulation #{position}: expected an object with the simulation fields")
+    try:
+        server_name = str(record['server_name']).strip()
+        benefit_type = str(record['benefit_type']).strip()
+        gender = str(record['gender']).strip().upper()
+        dob = datetime.strptime(str(record['dob']).strip(), '%Y-%m-%d').date()
+    except KeyError as e:
+        raise ValueError(f"Simulation #{position}: missing field {e.args[0]!r}")
+    except ValueError:
+        raise ValueError(f"Simulation #{position}: dob must be YYYY-MM-DD")
+
+    if not (2 <= len(server_name) <= 100) or not (2 <= len(benefit_type) <= 100):
+        raise ValueError(f"Simulation #{position}: server_name and benefit_type must have 2 to 100 characters")
+    if gender not in GENDERS:
+        raise ValueError(f"Simulation #{position}: gender must be one of {', '.join(GENDERS)}")
+
+    records = record.get('salaries') or {}
+    if not isinstance(records, dict):
+        raise ValueError(f"Simulation #{position}: salaries must map 'mon/yy' months to amounts")
+    salaries = {}
+    for month_year, amount in records.items():
+        try:
+            competence = parse_month_year(month_year)
+            amount = float(amount)
+        except (TypeError, ValueError):
+            raise ValueError(f"Simulation #{position}: invalid salary {month_year!r}: {amount!r}")
+        if not math.isfinite(amount):
+            raise ValueError(f"Simulation #{position}: invalid salary {month_year!r}: {amount!r}")
+        if amount > 0:
+            salaries[competence] = amount
+    if not salaries:
+        raise ValueError(f"Simulation #{position}: no salary data provided")
+
+    return SimulationSpec(server_name, dob, benefit_type, gender, salaries)
+
+
+def specs_from_json(data):
+    """Accepts a list of records or {'simulations': [...]}."""
+    if isinstance(data, dict):
+        data = data.get('simulations')
+    if not isinstance(data, list) or not data:
+        raise ValueError("Expected a non-empty list of simulations")
+    return [make_spec(record, i) for i, record in enumerate(data, start=1)]
+
+
+def specs_from_csv(lines):
+    """
+    Reads a long-format CSV with the columns
+    server_name, dob, benefit_type, gender, month_year, amount.
+    All rows with the same first four columns form one simulation, wherever
+    they are in the file.
+    """
+    records = {}
+    for row in csv.DictReader(lines):
+        key = tuple((row.get(col) or '').strip() for col in ('server_name', 'dob', 'benefit_type', 'gender'))
+        record = records.get(key)
+        if record is None:
+            record = records[key] = dict(zip(('server_name', 'dob', 'benefit_type', 'gender'), key), salaries={})
+        record['salaries'][row.get('month_year', '')] = row.get('amount')
+    return specs_from_json(list(records.values()))
+
+
+def check_factors(specs, factors):
+    """Raises ValueError for the first simulation with a salary month the snapshot has no factor for."""
+    for position, spec in enumerate(specs, start=1):
+        try:
+            factors.require(spec.salaries)
+        except MissingFactorError as e:
+            raise ValueError(f"Simulation #{position}: {e}")
+
+
+def calculate_series(series, factors):
+    """
+    Computes the results of many salary series ({competence: amount} dicts) in
+    one vectorized pass against a single factor snapshot. Like every other
+    calculation, raises MissingFactorError if a month has no factor.
+    """
+    factors.require({c for salaries in series for c in salaries})
+    columns = {c: i for i, c in enumerate(factors.competences.tolist())}
+
+    matrix = np.zeros((len(series), len(columns)))
+    for row, salaries in enumerate(series):
+        matrix[row, [columns[c] for c in salaries]] = list(salaries.values())
+
+    return calculate_benefits_batch(matrix, factors.values)
+
+
+def calculate_specs(specs, factors):
+    return calculate_series([spec.salaries for spec in specs], factors)
+
+
+def create_simulations(user, specs, factors):
+    """
+    Calculates and stores the simulations with bulk inserts. The caller owns
+    the transaction; nothing is committed here. Returns the new ids.
+    """
+    results = calculate_specs(specs, factors)
+    packed = app.config['SALARY_STORAGE'] == 'packed'
+
+    rows = []
+    for spec, result in zip(specs, results):
+        row = dict(server_name=spec.server_name, dob=spec.dob, benefit_type=spec.benefit_type,
+                   gender=spec.gender, result=float(result), factor_version=factors.version,
+                   user_id=user.id)
+        if packed:
+            row['salary_start'], row['salary_data'] = pack_series(spec.salaries)
+        rows.append(row)
+
+    ids = db.session.scalars(
+        db.insert(Simulation).returning(Simulation.id, sort_by_parameter_order=True), rows
+    ).all()
+
+    if not packed:
+        # Core insert: a plain executemany without ORM bookkeeping per row
+        db.session.execute(
+            SalaryContribution.__table__.insert(),
+            [dict(simulation_id=simulation_id, month_year=format_competence(competence),
+                  competence=competence, amount=amount)
+             for simulation_id, spec in zip(ids, specs)
+             for competence, amount in spec.salaries.items()],
+        )
+    return ids, results
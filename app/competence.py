@@ -0,0 +1,53 @@
+# Helpers for the 'jul/94' month strings used by CorrectionFactor and
+# SalaryContribution. A "competence" is the same month as a single integer,
+# year * 12 + (month - 1), so consecutive months differ by exactly 1 and
+# ordering, ranges and joins work on plain integers.
+
+from functools import lru_cache
+
+MONTHS = ('jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez')
+
+# English abbreviations accepted on input, stored in the Portuguese form
+_ALIASES = {'feb': 'fev', 'apr': 'abr', 'may': 'mai', 'aug': 'ago', 'sep': 'set', 'oct': 'out', 'dec': 'dez'}
+
+# Two-digit years from this value up belong to the 1900s
+_CENTURY_PIVOT = 50
+
+
+@lru_cache(maxsize=4096)
+def parse_month_year(month_year):
+    """Converts 'jul/94' into its competence integer. Raises ValueError on bad input."""
+    try:
+        month_str, year_str = month_year.strip().lower().split('/')
+        month_str = _ALIASES.get(month_str, month_str)
+        month = MONTHS.index(month_str) + 1
+        year = int(year_str)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid month/year: {month_year!r}")
+
+    if len(year_str) == 2:
+        year += 1900 if year >= _CENTURY_PIVOT else 2000
+    elif len(year_str) != 4:
+        raise ValueError(f"Invalid month/year: {month_year!r}")
+    return to_competence(year, month)
+
+
+def to_competence(year, month):
+    return year * 12 + (month - 1)
+
+
+def from_competence(competence):
+    """Returns (year, month) for a competence integer."""
+    year, month_index = divmod(competence, 12)
+    return year, month_index + 1
+
+
+def format_competence(competence):
+    """Converts a competence integer back into the 'jul/94' format."""
+    year, month = from_competence(competence)
+    return f"{MONTHS[month - 1]}/{year % 100:02d}"
+
+
+def normalize_month_year(month_year):
+    """Returns the canonical 'jul/94' spelling of a month string."""
+    return format_competence(parse_month_year(month_year))
@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+from app import app, db
+from app import CorrectionFactor, FactorVersion, VintageFactor
+from app.competence import format_competence
+
+FactorRow = namedtuple('FactorRow', ['month_year', 'competence', 'value'])
+
+
+class MissingFactorError(KeyError):
+    """Salary months a factor table has no factor for. Every calculation path refuses them."""
+
+    def __init__(self, competences):
+        self.competences = sorted(competences)
+        super().__init__(f"No correction factor for {', '.join(format_competence(c) for c in self.competences)}")
+
+    def __str__(self):
+        return self.args[0]
+
+
+class FactorSnapshot:
+    """
+    Immutable, chronologically ordered view of a correction factor table at one
+    version: the current table, or the published table of one `vintage`.
+    """
+
+    def __init__(self, version, month_years, competences, values, vintage=None):
+        self.version = version
+        self.vintage = vintage
+        self.month_years = tuple(month_years)
+        self.competences = np.array(competences, dtype=np.int64)
+        self.values = np.array(values, dtype=np.float64)
+        self.competences.flags.writeable = False
+        self.values.flags.writeable = False
+        self.by_competence = MappingProxyType(dict(zip(self.competences.tolist(), self.values.tolist())))
+        self.rows = tuple(FactorRow(m, c, v) for m, c, v in
+                          zip(self.month_years, self.competences.tolist(), self.values.tolist()))
+        # Content hash of the table, used to key artifacts derived from it
+        self.digest = hashlib.sha256(
+            '|'.join(self.month_years).encode() + self.values.tobytes()
+        ).hexdigest()
+
+    def __len__(self):
+        return len(self.month_years)
+
+    def missing(self, competences):
+        """The competences in `competences` that have no factor in this table."""
+        return [c for c in competences if c not in self.by_competence]
+
+    def require(self, competences):
+        """Raises MissingFactorError if any of `competences` has no factor in this table."""
+        unknown = self.missing(competences)
+        if unknown:
+            raise MissingFactorError(unknown)
+
+    def lookup(self, competences):
+        """Returns the factors for `competences` as an array. Raises MissingFactorError if a month has no factor."""
+        self.require(competences)
+        return np.array([self.by_competence[c] for c in competences], dtype=np.float64)
+
+    def window(self, start=None, end=None):
+        """Returns the (start, stop) slice of the months between two competences, inclusive."""
+        lo = 0 if start is None else int(np.searchsorted(self.competences, start, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.competences, end, side='right'))
+        return lo, hi
+
+    def last_months(self, n):
+        """Returns the rows of the latest `n` months, oldest first."""
+        return self.rows[max(len(self) - n, 0):]
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+_checked_version = None
+# Published tables loaded so far ({vintage: FactorSnapshot}) and the version they belong to
+_vintages = {}
+_vintages_version = None
+_vintage_list = None
+
+
+def current_version():
+    """Reads the factor version row (0 if the table was never written)."""
+    version = db.session.execute(db.select(FactorVersion.version)).scalar()
+    return version or 0
+
+
+def _load(version):
+    rows = db.session.execute(
+        db.select(CorrectionFactor.month_year, CorrectionFactor.competence, CorrectionFactor.value)
+        .order_by(CorrectionFactor.competence)
+    ).all()
+    return FactorSnapshot(version,
+                          [r.month_year for r in rows],
+                          [r.competence for r in rows],
+                          [r.value for r in rows])
+
+
+def _check_version():
+    global _checked_at, _checked_version
+
+    now = time.monotonic()
+    if _checked_version is None or now - _checked_at >= app.config['FACTOR_VERSION_CHECK_SECONDS']:
+        _checked_version = current_version()
+        _checked_at = now
+    return _checked_version
+
+
+def get_factors(vintage=None):
+    """
+    Returns the cached FactorSnapshot, reloading it only when the version row
+    changed. The version itself is read at most once every
+    FACTOR_VERSION_CHECK_SECONDS, so most requests never touch the database.
+    With a `vintage`, returns that published table instead (None if it was
+    never imported).
+    """
+    global _snapshot
+
+    version = _check_version()
+    if vintage is not None:
+        return _get_vintage(vintage, version)
+
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = _load(version)
+            snapshot = _snapshot
+    return snapshot
+
+
+def _load_vintage(vintage, version):
+    rows = db.session.execute(
+        db.select(VintageFactor.competence, VintageFactor.value)
+        .where(VintageFactor.vintage == vintage)
+        .order_by(VintageFactor.competence)
+    ).all()
+    if not rows:
+        return None
+    return FactorSnapshot(version,
+                          [format_competence(r.competence) for r in rows],
+                          [r.competence for r in rows],
+                          [r.value for r in rows],
+                          vintage=vintage)
+
+
+def _reset_vintages(version):
+    global _vintages, _vintages_version, _vintage_list
+    if _vintages_version != version:
+        with _lock:
+            if _vintages_version != version:
+                _vintages, _vintage_list = {}, None
+                _vintages_version = version
+
+
+def _get_vintage(vintage, version):
+    global _vintages
+    _reset_vintages(version)
+
+    # One dict lookup per request; each table is read from the database once per version
+    snapshot = _vintages.get(vintage)
+    if snapshot is None:
+        with _lock:
+            snapshot = _vintages.get(vintage)
+            if snapshot is None:
+                snapshot = _load_vintage(vintage, version)
+                if snapshot is not None:
+                    # Replaced, not mutated, so readers never see a dict being resized
+                    _vintages = {**_vintages, vintage: snapshot}
+    return snapshot
+
+
+def available_vintages():
+    """The published vintages in the database, newest first."""
+    global _vintage_list
+    _reset_vintages(_check_version())
+
+    vintages = _vintage_list
+    if vintages is None:
+        vintages = _vintage_list = tuple(db.session.execute(
+            db.select(VintageFactor.vintage).distinct().order_by(VintageFactor.vintage.desc())
+        ).scalars())
+    return vintages
+
+
+def factors_for(simulation):
+    """The snapshot a simulation is calculated with: its reference vintage if it still exists, else the current table."""
+    if simulation.reference_vintage is not None:
+        snapshot = get_factors(simulation.reference_vintage)
+        if snapshot is not None:
+            return snapshot
+    return get_factors()
+
+
+def invalidate():
+    """Forces the next get_factors() call in this process to re-check the version."""
+    global _checked_version
+    _checked_version = None
+
+
+def bump_factor_version():
+    """
+    Increments the factor version as part of the current transaction. Call it
+    from every code path that writes CorrectionFactor or VintageFactor rows, before committing,
+    and call invalidate() once the commit went through.
+    """
+    updated = db.session.execute(db.update(FactorVersion).values(version=FactorVersion.version + 1))
+    if not updated.rowcount:
+        db.session.add(FactorVersion(id=1, version=1))
@@ -2,17 +2,23 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, DateField, SelectField, FloatField
 from wtforms.validators import DataRequired, Length, EqualTo, ValidationError
 from app import User, CorrectionFactor
+from app.competence import parse_month_year
 
 class FactorForm(FlaskForm):
-    # e.g., 'sep/25'
-    month_year = StringField('Month/Year (e.g., sep/25)', validators=[DataRequired(), Length(min=6, max=7)])
+    # e.g., 'set/25'
+    month_year = StringField('Month/Year (e.g., set/25)', validators=[DataRequired(), Length(min=6, max=7)])
     value = FloatField('Factor Value', validators=[DataRequired()])
     submit = SubmitField('Save Factor')
 
     def validate_month_year(self, month_year):
+        try:
+            competence = parse_month_year(month_year.data)
+        except ValueError:
+            raise ValidationError('Use the mon/yy format, e.g. set/25.')
+
         # This validation is for creating new factors. We'll bypass it for editing.
         if not hasattr(self, 'editing') or not self.editing:
-            factor = CorrectionFactor.query.filter_by(month_year=month_year.data).first()
+            factor = CorrectionFactor.query.filter_by(competence=competence).first()
             if factor:
                 raise ValidationError('This month/year already has a factor. Please edit the existing one.')
 
@@ -22,6 +28,8 @@ class SimulationForm(FlaskForm):
     benefit_type = StringField('Benefit Type', validators=[DataRequired(), Length(min=2, max=100)])
     gender = SelectField('Gender', choices=[('FEMININO', 'Feminino'), ('MASCULINO', 'Masculino')],
                          validators=[DataRequired()])
+    # Choices are filled in by the route from the vintages in the database
+    reference_vintage = SelectField('Factor Table', coerce=int, default=0)
     submit = SubmitField('Create Simulation')
 
 class RegistrationForm(FlaskForm):
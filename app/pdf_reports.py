@@ -0,0 +1,301 @@
+import csv
+import glob
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from flask import render_template
+from sqlalchemy.orm import selectinload, undefer
+from werkzeug.utils import secure_filename
+
+from app import app, Simulation
+from app.calculations import calculate_benefit
+from app.factor_cache import MissingFactorError
+
+PDF_TEMPLATE = 'pdf_template.html'
+
+# A pending marker older than this is a render whose worker died; it no longer counts
+PENDING_MARKER_MAX_AGE = 600
+
+_lock = threading.Lock()
+_executor = None
+_jobs = {}
+_template_digest = (None, None)  # (mtime, sha256) of the PDF template
+
+
+def report_date():
+    return datetime.utcnow().strftime('%d de %B de %Y')
+
+
+def build_report(simulation, factors):
+    """
+    Returns the template context for a simulation's PDF report. Raises
+    MissingFactorError if a salary month has no factor, as the calculation does.
+    """
+    user_salaries = {s.competence: s.amount for s in simulation.salaries}
+    factors.require(user_salaries)
+
+    benefit = calculate_benefit([user_salaries.get(c) or 0.0 for c in factors.competences.tolist()],
+                                factors.values)
+
+    report_data = []
+    for factor, adjusted in zip(factors.rows, benefit.adjusted):
+        salary = user_salaries.get(factor.competence)
+        report_data.append({
+            'month_year': factor.month_year,
+            'salary': salary,
+            'factor': factor.value,
+            'adjusted': float(adjusted) if salary else None,
+        })
+
+    return dict(simulation=simulation,
+                report_data=report_data,
+                total_adjusted=benefit.total_adjusted,
+                sum_top_90=benefit.sum_top,
+                count_top_90=benefit.count_top)
+
+
+def render_report_html(simulation, factors, today_date=None):
+    return render_template(PDF_TEMPLATE,
+                           today_date=today_date or report_date(),
+                           **build_report(simulation, factors))
+
+
+def template_digest():
+    """Hash of the PDF template source, recomputed only when the file changes."""
+    global _template_digest
+    path = os.path.join(app.root_path, app.template_folder, PDF_TEMPLATE)
+    mtime = os.path.getmtime(path)
+    if _template_digest[0] != mtime:
+        with open(path, 'rb') as f:
+            _template_digest = (mtime, hashlib.sha256(f.read()).hexdigest())
+    return _template_digest[1]
+
+
+def report_key(simulation, factors):
+    """
+    Content hash of what ends up in the PDF: the simulation fields, its
+    salaries, the factor table and the template. The report date is left out
+    on purpose, so a cached PDF keeps the date it was first rendered on
+    instead of being rendered again every midnight.
+    """
+    h = hashlib.sha256()
+    h.update(template_digest().encode())
+    h.update(factors.digest.encode())
+    h.update(repr((simulation.server_name, simulation.dob.isoformat(), simulation.benefit_type,
+                   simulation.gender, simulation.result)).encode())
+    for competence, amount in sorted((s.competence, s.amount) for s in simulation.salaries):
+        h.update(f"{competence}={amount!r};".encode())
+    return h.hexdigest()[:32]
+
+
+def artifact_path(simulation_id, key):
+    return os.path.join(app.config['PDF_CACHE_DIR'], f"simulation_{simulation_id}_{key}.pdf")
+
+
+def pending_marker(path):
+    # Exists while a render of `path` is queued or running, in whichever web worker started it
+    return path + ".pending"
+
+
+def discard_artifacts(simulation_id, keep=None):
+    """Removes cached PDFs of a simulation, except the one at `keep`."""
+    pattern = os.path.join(app.config['PDF_CACHE_DIR'], f"simulation_{simulation_id}_*.pdf")
+    for path in glob.glob(pattern):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _render_pdf(html, path):
+    # Runs in a worker process; returns the render time in seconds
+    from weasyprint import HTML
+
+    started = time.perf_counter()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    HTML(string=html).write_pdf(tmp_path)
+    os.replace(tmp_path, path)
+    return time.perf_counter() - started
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        os.makedirs(app.config['PDF_CACHE_DIR'], exist_ok=True)
+        _executor = ProcessPoolExecutor(max_workers=app.config['PDF_RENDER_WORKERS'])
+    return _executor
+
+
+def request_render(simulation_id, key, html):
+    """
+    Queues a render of `html` unless the artifact already exists or a render for
+    the same key is in flight. Returns the job's Future, or None if cached.
+    """
+    path = artifact_path(simulation_id, key)
+    if os.path.exists(path):
+        return None
+
+    with _lock:
+        future = _jobs.get((simulation_id, key))
+        submitted = future is None or (future.done() and future.exception() is not None)
+        if submitted:
+            executor = _get_executor()
+            open(pending_marker(path), 'w').close()
+            future = executor.submit(_render_pdf, html, path)
+            _jobs[(simulation_id, key)] = future
+    # Outside the lock: the callback runs right away if the job already finished
+    if submitted:
+        future.add_done_callback(lambda f: _finish(simulation_id, key, f))
+    return future
+
+
+def _finish(simulation_id, key, future):
+    try:
+        os.remove(pending_marker(artifact_path(simulation_id, key)))
+    except OSError:
+        pass
+    if future.exception() is None:
+        discard_artifacts(simulation_id, keep=artifact_path(simulation_id, key))
+        with _lock:
+            _jobs.pop((simulation_id, key), None)
+    else:
+        app.logger.error("PDF render for simulation %s failed: %s", simulation_id, future.exception())
+
+
+def job_status(simulation_id, key):
+    """
+    One of 'done', 'pending', 'failed' or 'missing'. A render started by
+    another web worker is only known here through its pending marker.
+    """
+    path = artifact_path(simulation_id, key)
+    if os.path.exists(path):
+        return 'done'
+    future = _jobs.get((simulation_id, key))
+    if future is None:
+        try:
+            age = time.time() - os.path.getmtime(pending_marker(path))
+        except OSError:
+            return 'missing'
+        return 'pending' if age < PENDING_MARKER_MAX_AGE else 'missing'
+    if not future.done():
+        return 'pending'
+    return 'failed' if future.exception() is not None else 'done'
+
+
+# --- Bulk export ---
+
+ExportItem = namedtuple('ExportItem', ['simulation', 'path', 'seconds', 'cached', 'error'])
+
+
+def export_query(user, simulation_ids=None, server_name=None, benefit_type=None):
+    """
+    The simulations of `user` selected by id list and/or filters. Salaries are
+    loaded up front so the export can stream after the request's session ends.
+    """
+    query = Simulation.query.filter_by(user_id=user.id).options(selectinload(Simulation.salary_rows),
+                                                                undefer(Simulation.salary_data))
+    if simulation_ids:
+        query = query.filter(Simulation.id.in_(simulation_ids))
+    if server_name:
+        query = query.filter(Simulation.name_contains(server_name))
+    if benefit_type:
+        query = query.filter(Simulation.benefit_type == benefit_type)
+    return query.order_by(Simulation.id)
+
+
+def render_many(simulations, factors_for):
+    """
+    Queues every simulation on the render pool and yields an ExportItem for
+    each one as soon as its PDF is available (cached files come first).
+    `factors_for(simulation)` returns the factor snapshot of each simulation.
+    """
+    today_date = report_date()
+    pending = {}
+    for simulation in simulations:
+        factors = factors_for(simulation)
+        key = report_key(simulation, factors)
+        path = artifact_path(simulation.id, key)
+        future = None
+        if not os.path.exists(path):
+            try:
+                html = render_report_html(simulation, factors, today_date)
+            except MissingFactorError as e:
+                yield ExportItem(simulation, None, 0.0, False, e)
+                continue
+            future = request_render(simulation.id, key, html)
+        if future is None:
+            yield ExportItem(simulation, path, 0.0, True, None)
+        else:
+            pending[future] = (simulation, path)
+
+    for future in as_completed(pending):
+        simulation, path = pending[future]
+        error = future.exception()
+        if error is None:
+            yield ExportItem(simulation, path, future.result(), False, None)
+        else:
+            yield ExportItem(simulation, None, 0.0, False, error)
+
+
+class _ZipStream:
+    """Write-only buffer that lets ZipFile produce output chunk by chunk."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_filename(simulation):
+    name = secure_filename(simulation.server_name) or 'simulation'
+    return f"simulation_{simulation.id}_{name}.pdf"
+
+
+def stream_export_zip(simulations, factors_for, progress=None):
+    """
+    Yields a ZIP archive of the simulations' PDFs, one chunk per finished file.
+    The archive ends with export_report.csv holding the status and render time
+    of each item. `progress(done, total, item)` is called after each file.
+    """
+    simulations = list(simulations)
+    stream = _ZipStream()
+    report = io.StringIO()
+    writer = csv.writer(report)
+    writer.writerow(['simulation_id', 'file', 'status', 'render_seconds'])
+
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+        for done, item in enumerate(render_many(simulations, factors_for), start=1):
+            if item.error is None:
+                filename = export_filename(item.simulation)
+                try:
+                    # A newer render of the same simulation may have discarded this file
+                    archive.write(item.path, filename)
+                    status = 'cached' if item.cached else 'rendered'
+                except FileNotFoundError as e:
+                    filename, status = '', f'failed: {e}'
+            else:
+                filename, status = '', f'failed: {item.error}'
+            writer.writerow([item.simulation.id, filename, status, f"{item.seconds:.3f}"])
+            if progress:
+                progress(done, len(simulations), item)
+            yield stream.drain()
+        archive.writestr('export_report.csv', report.getvalue())
+    yield stream.drain()
@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, db
+from app import Simulation, SalaryContribution
+from app.batch import calculate_series
+from app.competence import parse_month_year, format_competence
+from app.salary_packing import SALARY_DTYPE, unpack_series
+from app.factor_cache import get_factors
+
+# Simulations recalculated per query/update round trip
+BATCH_SIZE = 500
+
+# A single worker thread, so recalculations run in the order the changes happened
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recalculation')
+
+
+def affected_simulation_ids(month_years):
+    """
+    Ids of the simulations on the current factor table with a salary in any of
+    `month_years`: per-month rows are found through the month_year index,
+    packed series by their month range. Simulations pinned to a published
+    vintage don't depend on the current table and are left out.
+    """
+    month_years = list(month_years)
+    ids = set(db.session.execute(
+        db.select(SalaryContribution.simulation_id)
+        .join(Simulation, Simulation.id == SalaryContribution.simulation_id)
+        .where(SalaryContribution.month_year.in_(month_years))
+        .where(Simulation.reference_vintage.is_(None))
+        .distinct()
+    ).scalars())
+
+    # One query over the salary_start index for the whole span of months, then
+    # the exact check against each series' own range
+    competences = sorted({parse_month_year(m) for m in month_years})
+    if not competences:
+        return sorted(ids)
+    series_end = Simulation.salary_start + db.func.length(Simulation.salary_data) / SALARY_DTYPE.itemsize
+    packed = db.session.execute(
+        db.select(Simulation.id, Simulation.salary_start, series_end)
+        .where(Simulation.salary_start <= competences[-1])
+        .where(series_end > competences[0])
+        .where(Simulation.reference_vintage.is_(None))
+    )
+    for simulation_id, start, end in packed:
+        # First changed month at or after the series start; affected if it falls before the end
+        position = bisect_left(competences, start)
+        if position < len(competences) and competences[position] < end:
+            ids.add(simulation_id)
+    return sorted(ids)
+
+
+def _load_series(simulation_ids):
+    series = {simulation_id: {} for simulation_id in simulation_ids}
+    rows = db.session.execute(
+        db.select(SalaryContribution.simulation_id, SalaryContribution.competence, SalaryContribution.amount)
+        .where(SalaryContribution.simulation_id.in_(simulation_ids))
+    )
+    for simulation_id, competence, amount in rows:
+        if amount > 0:
+            series[simulation_id][competence] = amount
+
+    packed = db.session.execute(
+        db.select(Simulation.id, Simulation.salary_start, Simulation.salary_data)
+        .where(Simulation.id.in_(simulation_ids))
+        .where(Simulation.salary_data.is_not(None))
+    )
+    for simulation_id, start, data in packed:
+        competences, amounts = unpack_series(start, data)
+        series[simulation_id] = dict(zip(competences.tolist(), amounts.tolist()))
+    return series
+
+
+def recalculate(simulation_ids, factors):
+    """
+    Recomputes the results of `simulation_ids` in vectorized batches and stores
+    them with the snapshot's version. A result already computed with a newer
+    version is left alone. A simulation with a salary month the snapshot has
+    no factor for is not calculated (as in calculate_salaries): its result is
+    cleared, so it shows as not calculated until its salaries are reviewed.
+    Returns how many simulations were updated.
+    """
+    update = (
+        Simulation.__table__.update()
+        .where(Simulation.id == db.bindparam('simulation_id'))
+        .where(db.or_(Simulation.factor_version.is_(None),
+                      Simulation.factor_version <= factors.version))
+        .values(result=db.bindparam('new_result'), factor_version=factors.version)
+    )
+
+    updated = 0
+    simulation_ids = list(simulation_ids)
+    for start in range(0, len(simulation_ids), BATCH_SIZE):
+        series = _load_series(simulation_ids[start:start + BATCH_SIZE])
+        incomplete = [simulation_id for simulation_id, salaries in series.items() if factors.missing(salaries)]
+        for simulation_id in incomplete:
+            del series[simulation_id]
+        results = calculate_series(list(series.values()), factors) if series else []
+
+        params = [{'simulation_id': simulation_id, 'new_result': float(result)}
+                  for simulation_id, result in zip(series, results)]
+        params += [{'simulation_id': simulation_id, 'new_result': None} for simulation_id in incomplete]
+        db.session.execute(update, params)
+        db.session.commit()
+        if incomplete:
+            app.logger.warning("Cleared the result of %d simulations with salaries in months without a factor "
+                               "(factor version %d): %s", len(incomplete), factors.version,
+                               ', '.join(map(str, incomplete[:20])))
+        updated += len(params)
+    return updated
+
+
+def recalculate_months(month_years):
+    """Recalculates every simulation that uses one of the changed months."""
+    with app.app_context():
+        factors = get_factors()
+        simulation_ids = affected_simulation_ids(month_years)
+        if simulation_ids:
+            count = recalculate(simulation_ids, factors)
+            app.logger.info("Recalculated %d simulations for factor version %d (months: %s)",
+                            count, factors.version, ', '.join(sorted(month_years)))
+
+
+def recalculate_vintages(vintages):
+    """Recalculates the simulations pinned to any of the (re)imported `vintages`."""
+    with app.app_context():
+        for vintage in sorted(vintages):
+            factors = get_factors(vintage)
+            if factors is None:
+                continue
+            simulation_ids = db.session.execute(
+                db.select(Simulation.id).where(Simulation.reference_vintage == vintage)
+            ).scalars().all()
+            if simulation_ids:
+                count = recalculate(simulation_ids, factors)
+                app.logger.info("Recalculated %d simulations for vintage %s", count, format_competence(vintage))
+
+
+def schedule(month_years):
+    """Queues a background recalculation for the changed `month_years`."""
+    future = _executor.submit(recalculate_months, set(month_years))
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        app.logger.error("Background recalculation failed: %s", future.exception())
@@ -1,20 +1,66 @@
-from flask import render_template, url_for, flash, redirect, request
-from flask import render_template, url_for, flash, redirect, request
-from flask import render_template, url_for, flash, redirect, request, abort, Response
-from weasyprint import HTML
+import os
 from datetime import datetime
+from flask import (render_template, url_for, flash, redirect, request, abort, jsonify, send_file,
+                   Response, stream_with_context)
 from app import app, db, bcrypt
 from app.forms import RegistrationForm, LoginForm, SimulationForm, FactorForm
-from app import User, Simulation, CorrectionFactor, SalaryContribution
+from app import User, Simulation, CorrectionFactor
 from flask_login import login_user, current_user, logout_user, login_required
 from app.decorators import admin_required
+from app.calculations import calculate_benefit
+from app.factor_cache import (get_factors, factors_for, available_vintages, bump_factor_version,
+                              invalidate as invalidate_factors, MissingFactorError)
+from app import pdf_reports
+from app import batch
+from app import recalculation
+from app.salaries import parse_salary_form, save_salaries
+from app.competence import parse_month_year, format_competence
 
 @app.route("/")
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    simulations = Simulation.query.filter_by(author=current_user).order_by(Simulation.created_at.desc()).all()
-    return render_template('dashboard.html', simulations=simulations)
+    search = request.args.get('q', '').strip()
+    benefit_type = request.args.get('benefit_type', '').strip()
+    before = request.args.get('before')
+    page_size = app.config['DASHBOARD_PAGE_SIZE']
+
+    query = Simulation.query.filter(Simulation.user_id == current_user.id)
+    if search:
+        query = query.filter(Simulation.name_contains(search))
+    if benefit_type:
+        query = query.filter(Simulation.benefit_type == benefit_type)
+    # The count runs on the (user_id, created_at, id) index, not the table
+    total = query.with_entities(db.func.count(Simulation.id)).scalar()
+
+    # Keyset pagination: continue after the last (created_at, id) of the previous page
+    cursor = parse_dashboard_cursor(before)
+    if cursor:
+        created_at, simulation_id = cursor
+        query = query.filter(db.or_(Simulation.created_at < created_at,
+                                    db.and_(Simulation.created_at == created_at,
+                                            Simulation.id < simulation_id)))
+
+    simulations = query.order_by(Simulation.created_at.desc(), Simulation.id.desc()).limit(page_size + 1).all()
+    next_cursor = None
+    if len(simulations) > page_size:
+        simulations = simulations[:page_size]
+        last = simulations[-1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+
+    return render_template('dashboard.html', simulations=simulations, total=total,
+                           search=search, benefit_type=benefit_type,
+                           next_cursor=next_cursor, paged=bool(cursor))
+
+def parse_dashboard_cursor(value):
+    """Turns a '<created_at ISO>_<id>' cursor back into (datetime, id), or None if invalid."""
+    if not value:
+        return None
+    try:
+        created_at, simulation_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(simulation_id)
+    except ValueError:
+        return None
 
 @app.route("/register", methods=['GET', 'POST'])
 def register():
@@ -56,11 +102,16 @@ def logout():
 @login_required
 def create_simulation():
     form = SimulationForm()
+    # 0 stands for the current table; the others are the published vintages
+    form.reference_vintage.choices = [(0, 'Current table')] + [
+        (vintage, format_competence(vintage)) for vintage in available_vintages()
+    ]
     if form.validate_on_submit():
         simulation = Simulation(server_name=form.server_name.data,
                                 dob=form.dob.data,
                                 benefit_type=form.benefit_type.data,
                                 gender=form.gender.data,
+                                reference_vintage=form.reference_vintage.data or None,
                                 author=current_user)
         db.session.add(simulation)
         db.session.commit()
@@ -75,15 +126,15 @@ def enter_salaries(simulation_id):
     if simulation.author != current_user:
         abort(403)
 
-    factors = CorrectionFactor.query.order_by(CorrectionFactor.id).all()
+    snapshot = factors_for(simulation)
 
-    existing_salaries_query = SalaryContribution.query.filter_by(simulation_id=simulation.id).all()
-    existing_salaries = {s.month_year: s.amount for s in existing_salaries_query}
+    existing_salaries = {s.competence: s.amount for s in simulation.salaries}
 
     return render_template('enter_salaries.html',
                            title='Enter Salaries',
                            simulation=simulation,
-                           factors=factors,
+                           factors=snapshot.rows,
+                           vintage=None if snapshot.vintage is None else format_competence(snapshot.vintage),
                            existing_salaries=existing_salaries)
 
 @app.route("/simulation/<int:simulation_id>/calculate", methods=['POST'])
@@ -93,65 +144,57 @@ def calculate_salaries(simulation_id):
     if simulation.author != current_user:
         abort(403)
 
-    # Clear old salary contributions for this simulation
-    SalaryContribution.query.filter_by(simulation_id=simulation.id).delete()
-
-    # Add new salary contributions from the form
-    new_salaries = []
-    for key, value in request.form.items():
-        if key.startswith('salary_') and value:
-            try:
-                amount = float(value)
-                if amount > 0:
-                    month_year = key.replace('salary_', '')
-                    sc = SalaryContribution(simulation_id=simulation.id,
-                                            month_year=month_year,
-                                            amount=amount)
-                    new_salaries.append(sc)
-            except (ValueError, TypeError):
-                # Ignore non-numeric values
-                continue
+    new_salaries = parse_salary_form(request.form)
 
     if not new_salaries:
         flash('No salary data provided. Calculation aborted.', 'warning')
         return redirect(url_for('enter_salaries', simulation_id=simulation.id))
 
-    db.session.bulk_save_objects(new_salaries)
-
-    # --- Perform the 90% calculation ---
-    all_factors = {f.month_year: f.value for f in CorrectionFactor.query.all()}
-
-    adjusted_salaries = []
-    for salary in new_salaries:
-        factor = all_factors.get(salary.month_year, 1.0)
-        adjusted_salaries.append(salary.amount * factor)
-
-    adjusted_salaries.sort(reverse=True)
-
-    # Calculate how many values are 90%
-    count_90_percent = int(len(adjusted_salaries) * 0.9)
-    if count_90_percent < 1:
-        count_90_percent = 1 if adjusted_salaries else 0
+    factors = factors_for(simulation)
+    competences = [parse_month_year(m) for m in new_salaries]
+    try:
+        factors.require(competences)
+    except MissingFactorError as e:
+        flash(f'{e}. Calculation aborted.', 'danger')
+        return redirect(url_for('enter_salaries', simulation_id=simulation.id))
 
-    top_90_percent_salaries = adjusted_salaries[:count_90_percent]
+    # Only the months that were added, changed or cleared are written
+    save_salaries(simulation, new_salaries)
 
-    if top_90_percent_salaries:
-        average = sum(top_90_percent_salaries) / len(top_90_percent_salaries)
-        simulation.result = average
-    else:
-        simulation.result = 0
+    # --- Perform the 90% calculation ---
+    benefit = calculate_benefit(list(new_salaries.values()), factors.lookup(competences))
+    simulation.result = benefit.average
+    simulation.factor_version = factors.version
 
     db.session.commit()
 
     flash('Calculation complete! The result has been updated.', 'success')
     return redirect(url_for('dashboard'))
 
+@app.route("/api/simulations/batch", methods=['POST'])
+@login_required
+def batch_simulations():
+    data = request.get_json(silent=True)
+    factors = get_factors()
+    try:
+        specs = batch.specs_from_json(data)
+        batch.check_factors(specs, factors)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    ids, results = batch.create_simulations(current_user, specs, factors)
+    db.session.commit()
+
+    return jsonify(created=len(ids),
+                   simulations=[{'id': i, 'server_name': spec.server_name, 'result': float(result)}
+                                for i, spec, result in zip(ids, specs, results)]), 201
+
 # --- Admin Routes ---
 @app.route("/admin/factors")
 @admin_required
 def manage_factors():
     form = FactorForm()
-    factors = CorrectionFactor.query.order_by(CorrectionFactor.id.desc()).all()
+    factors = CorrectionFactor.query.order_by(CorrectionFactor.competence.desc()).all()
     return render_template('admin_factors.html', title='Manage Factors', form=form, factors=factors)
 
 @app.route("/admin/factor/add", methods=['POST'])
@@ -161,7 +204,10 @@ def add_factor():
     if form.validate_on_submit():
         factor = CorrectionFactor(month_year=form.month_year.data, value=form.value.data)
         db.session.add(factor)
+        bump_factor_version()
         db.session.commit()
+        invalidate_factors()
+        recalculation.schedule([factor.month_year])
         flash('Factor has been added!', 'success')
     # Redirect back to the management page, which will display errors if any
     return redirect(url_for('manage_factors'))
@@ -175,9 +221,14 @@ def edit_factor(factor_id):
     form.editing = True
 
     if form.validate_on_submit():
+        changed_months = {factor.month_year}
         factor.month_year = form.month_year.data
         factor.value = form.value.data
+        changed_months.add(factor.month_year)
+        bump_factor_version()
         db.session.commit()
+        invalidate_factors()
+        recalculation.schedule(changed_months)
         flash('Factor has been updated!', 'success')
         return redirect(url_for('manage_factors'))
     elif request.method == 'GET':
@@ -191,8 +242,12 @@ def edit_factor(factor_id):
 @admin_required
 def delete_factor(factor_id):
     factor = CorrectionFactor.query.get_or_404(factor_id)
+    month_year = factor.month_year
     db.session.delete(factor)
+    bump_factor_version()
     db.session.commit()
+    invalidate_factors()
+    recalculation.schedule([month_year])
     flash('Factor has been deleted!', 'success')
     return redirect(url_for('manage_factors'))
 
@@ -203,52 +258,78 @@ def generate_pdf(simulation_id):
     if simulation.author != current_user:
         abort(403)
 
-    # --- Re-gather all data needed for the report ---
-    all_factors = CorrectionFactor.query.order_by(CorrectionFactor.id).all()
-    user_salaries = {s.month_year: s.amount for s in simulation.salaries}
-
-    report_data = []
-    adjusted_salaries_for_calc = []
-    total_adjusted = 0
-
-    for factor in all_factors:
-        salary = user_salaries.get(factor.month_year)
-        adjusted = None
-        if salary:
-            adjusted = salary * factor.value
-            adjusted_salaries_for_calc.append(adjusted)
-            total_adjusted += adjusted
-
-        report_data.append({
-            'month_year': factor.month_year,
-            'salary': salary,
-            'factor': factor.value,
-            'adjusted': adjusted,
-        })
-
-    # --- Re-calculate summary numbers ---
-    adjusted_salaries_for_calc.sort(reverse=True)
-    count_90_percent = int(len(adjusted_salaries_for_calc) * 0.9)
-    if count_90_percent < 1:
-        count_90_percent = 1 if adjusted_salaries_for_calc else 0
-
-    top_90_percent_salaries = adjusted_salaries_for_calc[:count_90_percent]
-    sum_top_90 = sum(top_90_percent_salaries)
-
-    # Render the HTML template for the PDF
-    rendered_html = render_template('pdf_template.html',
-                                    simulation=simulation,
-                                    report_data=report_data,
-                                    total_adjusted=total_adjusted,
-                                    sum_top_90=sum_top_90,
-                                    count_top_90=len(top_90_percent_salaries),
-                                    today_date=datetime.utcnow().strftime('%d de %B de %Y'))
-
-    # Generate PDF
-    pdf = HTML(string=rendered_html).write_pdf()
-
-    return Response(pdf, mimetype='application/pdf', headers={
-        'Content-Disposition': f'attachment;filename=simulation_{simulation.id}.pdf'
+    factors = factors_for(simulation)
+    today_date = pdf_reports.report_date()
+    key = pdf_reports.report_key(simulation, factors)
+    path = pdf_reports.artifact_path(simulation.id, key)
+
+    # Unchanged simulations are served straight from the artifact store
+    if not os.path.exists(path):
+        try:
+            html = pdf_reports.render_report_html(simulation, factors, today_date)
+        except MissingFactorError as e:
+            flash(f'{e}. Please review the salaries before generating the report.', 'danger')
+            return redirect(url_for('enter_salaries', simulation_id=simulation.id))
+        future = pdf_reports.request_render(simulation.id, key, html)
+        if future is not None:
+            try:
+                future.result(timeout=app.config['PDF_RENDER_WAIT_SECONDS'])
+            except Exception:
+                # Still rendering (or failed): let the browser poll the job status
+                return render_template('pdf_pending.html', title='Generating PDF',
+                                       simulation=simulation, key=key), 202
+
+    return send_pdf(simulation, key)
+
+@app.route("/simulation/<int:simulation_id>/pdf/<key>/status")
+@login_required
+def pdf_status(simulation_id, key):
+    simulation = Simulation.query.get_or_404(simulation_id)
+    if simulation.author != current_user:
+        abort(403)
+    status = pdf_reports.job_status(simulation.id, key)
+    return jsonify(status=status,
+                   download_url=url_for('download_pdf', simulation_id=simulation.id, key=key))
+
+@app.route("/simulation/<int:simulation_id>/pdf/<key>")
+@login_required
+def download_pdf(simulation_id, key):
+    simulation = Simulation.query.get_or_404(simulation_id)
+    if simulation.author != current_user:
+        abort(403)
+    if not os.path.exists(pdf_reports.artifact_path(simulation.id, key)):
+        abort(404)
+    return send_pdf(simulation, key)
+
+def send_pdf(simulation, key):
+    return send_file(pdf_reports.artifact_path(simulation.id, key),
+                     mimetype='application/pdf',
+                     as_attachment=True,
+                     download_name=f'simulation_{simulation.id}.pdf')
+
+@app.route("/simulations/export", methods=['POST'])
+@login_required
+def export_pdfs():
+    simulation_ids = request.form.getlist('simulation_id', type=int)
+    server_name = request.form.get('server_name')
+    benefit_type = request.form.get('benefit_type')
+    if not (simulation_ids or server_name or benefit_type):
+        flash('Select at least one simulation to export.', 'warning')
+        return redirect(url_for('dashboard'))
+
+    simulations = pdf_reports.export_query(current_user, simulation_ids, server_name, benefit_type).all()
+    if not simulations:
+        flash('No simulations matched the export.', 'warning')
+        return redirect(url_for('dashboard'))
+
+    def log_progress(done, total, item):
+        app.logger.info("PDF export %d/%d: simulation %s %s (%.2fs)", done, total, item.simulation.id,
+                        'cached' if item.cached else 'failed' if item.error else 'rendered', item.seconds)
+
+    archive = pdf_reports.stream_export_zip(simulations, factors_for, progress=log_progress)
+    filename = f"simulations_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(stream_with_context(archive), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment;filename={filename}'
     })
 
 @app.route("/simulation/<int:simulation_id>/delete", methods=['POST', 'GET'])
@@ -259,5 +340,6 @@ def delete_simulation(simulation_id):
         abort(403)
     db.session.delete(simulation)
     db.session.commit()
+    pdf_reports.discard_artifacts(simulation_id)
     flash('Simulation has been deleted!', 'success')
     return redirect(url_for('dashboard'))
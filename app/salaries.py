@@ -0,0 +1,85 @@
+import math
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import app, db
+from app import SalaryContribution
+from app.competence import parse_month_year, normalize_month_year
+from app.salary_packing import pack_series
+
+
+def parse_salary_form(form):
+    """Returns {month_year: amount} for the positive 'salary_<month>' fields of a form."""
+    salaries = {}
+    for key, value in form.items():
+        if key.startswith('salary_') and value:
+            try:
+                amount = float(value)
+                if amount > 0 and math.isfinite(amount):
+                    salaries[normalize_month_year(key.replace('salary_', ''))] = amount
+            except (ValueError, TypeError):
+                # Ignore non-numeric values and unknown months
+                continue
+    return salaries
+
+
+def save_salaries(simulation, salaries):
+    """
+    Stores `salaries` ({month_year: amount}) as the salary series of a
+    simulation, in the storage mode set by SALARY_STORAGE. Returns
+    (written, deleted). The caller commits.
+    """
+    if app.config['SALARY_STORAGE'] == 'packed':
+        return save_packed_salaries(simulation, salaries)
+    if simulation.is_packed:
+        simulation.salary_start = simulation.salary_data = None
+    return save_salary_rows(simulation.id, salaries)
+
+
+def save_packed_salaries(simulation, salaries):
+    """Writes the whole series as one blob on the simulation row and drops any per-month rows."""
+    simulation.salary_start, simulation.salary_data = pack_series(
+        {parse_month_year(month_year): amount for month_year, amount in salaries.items()}
+    )
+    deleted = db.session.execute(
+        SalaryContribution.__table__.delete().where(SalaryContribution.simulation_id == simulation.id)
+    ).rowcount
+    return len(salaries), deleted
+
+
+def save_salary_rows(simulation_id, salaries):
+    """
+    Makes the stored salary rows of a simulation equal to `salaries` by writing
+    only the difference: new and changed months are upserted on the
+    (simulation_id, month_year) constraint, missing months are deleted.
+    Returns (written, deleted). The caller commits.
+    """
+    table = SalaryContribution.__table__
+    existing = dict(db.session.execute(
+        db.select(table.c.month_year, table.c.amount).where(table.c.simulation_id == simulation_id)
+    ).all())
+
+    changed = [
+        {'simulation_id': simulation_id, 'month_year': month_year,
+         'competence': parse_month_year(month_year), 'amount': amount}
+        for month_year, amount in salaries.items()
+        if existing.get(month_year) != amount
+    ]
+    removed = [month_year for month_year in existing if month_year not in salaries]
+
+    if removed:
+        db.session.execute(
+            table.delete()
+            .where(table.c.simulation_id == simulation_id)
+            .where(table.c.month_year.in_(removed))
+        )
+    if changed:
+        upsert = sqlite_insert(table)
+        db.session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[table.c.simulation_id, table.c.month_year],
+                set_={'amount': upsert.excluded.amount, 'competence': upsert.excluded.competence},
+            ),
+            changed,
+        )
+    return len(changed), len(removed)
@@ -0,0 +1,43 @@
+# Packed storage of a simulation's salary series: the competence of the first
+# month plus one little-endian float64 per month, 0.0 where there is no salary.
+# A full career (~370 months) fits in a single ~3 KB blob on the simulation row.
+
+from collections import namedtuple
+
+import numpy as np
+
+from app.competence import format_competence
+
+SALARY_DTYPE = np.dtype('<f8')
+
+SalaryView = namedtuple('SalaryView', ['month_year', 'competence', 'amount'])
+
+
+def pack_series(salaries):
+    """Packs {competence: amount} into (start_competence, bytes). Empty input gives (None, None)."""
+    if not salaries:
+        return None, None
+    start = min(salaries)
+    values = np.zeros(max(salaries) - start + 1, dtype=SALARY_DTYPE)
+    values[np.fromiter(salaries.keys(), dtype=np.int64, count=len(salaries)) - start] = list(salaries.values())
+    return start, values.tobytes()
+
+
+def unpack_series(start, data):
+    """
+    Returns (competences, amounts) for the months that have a salary. The full
+    series is read with frombuffer, without copying the blob.
+    """
+    values = np.frombuffer(data, dtype=SALARY_DTYPE)
+    months = np.flatnonzero(values)
+    return months + start, values[months]
+
+
+def series_length(data):
+    return len(data) // SALARY_DTYPE.itemsize
+
+
+def salary_views(start, data):
+    competences, amounts = unpack_series(start, data)
+    return [SalaryView(format_competence(c), c, a)
+            for c, a in zip(competences.tolist(), amounts.tolist())]
@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from colunar import para_tabela, para_dataframe, gravar_dados
+
+# Armazenamento dos dados consolidados em partições: um arquivo Parquet por
+# mes_referencia_planilha (uma publicação), mais um índice JSON com as
+# partições existentes. Incluir uma publicação nova só escreve a partição
+# dela e o índice, sem reler nem regravar o histórico inteiro.
+
+PASTA_PARTICOES = "dados_particionados"
+ARQUIVO_INDICE = "indice.json"
+VERSAO_INDICE = 1
+
+CHAVE_DUPLICATAS = ['competencia', 'fator', 'mes_referencia_planilha']
+
+
+def nome_particao(mes_referencia):
+    """Nome de arquivo seguro e único para um mes_referencia_planilha ('set/2024' -> 'set-2024-<hash>.parquet')."""
+    base = re.sub(r'[^\w.-]+', '-', str(mes_referencia)).strip('-.') or 'particao'
+    sufixo = hashlib.sha1(str(mes_referencia).encode('utf-8')).hexdigest()[:8]
+    return f"{base[:60]}-{sufixo}.parquet"
+
+
+def _gravar_atomico(caminho, escrever):
+    temporario = caminho + ".tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+class ArmazenamentoParticionado:
+    def __init__(self, pasta=PASTA_PARTICOES):
+        self.pasta = pasta
+        self.caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+        try:
+            with open(self.caminho_indice, encoding='utf-8') as f:
+                self.indice = json.load(f)
+        except FileNotFoundError:
+            self.indice = {'versao': VERSAO_INDICE, 'particoes': {}}
+
+    def existe(self):
+        return os.path.exists(self.caminho_indice)
+
+    @property
+    def particoes(self):
+        return self.indice['particoes']
+
+    def total_linhas(self):
+        return sum(p['linhas'] for p in self.particoes.values())
+
+    def _ler_arquivo(self, arquivo, filtros=None):
+        caminho = os.path.join(self.pasta, arquivo)
+        return para_dataframe(pq.read_table(caminho, filters=filtros or None))
+
+    def ler_particao(self, mes_referencia, filtros=None):
+        info = self.particoes.get(mes_referencia)
+        return None if info is None else self._ler_arquivo(info['arquivo'], filtros)
+
+    def gravar_particao(self, mes_referencia, df):
+        """
+        Grava as linhas de uma publicação na sua partição. Se a partição já
+        existir, só ela é relida para remover duplicatas. Devolve quantas
+        linhas novas entraram.
+        """
+        os.makedirs(self.pasta, exist_ok=True)
+        df = df.copy()
+        df['mes_referencia_planilha'] = mes_referencia
+        df['competencia'] = pd.to_datetime(df['competencia'])
+
+        anterior = self.ler_particao(mes_referencia)
+        antes = 0 if anterior is None else len(anterior)
+        if anterior is not None:
+            df = pd.concat([anterior, df], ignore_index=True)
+        df.drop_duplicates(subset=CHAVE_DUPLICATAS, keep='last', inplace=True)
+        df.sort_values(by='competencia', kind='stable', inplace=True)
+
+        arquivo = nome_particao(mes_referencia)
+        _gravar_atomico(os.path.join(self.pasta, arquivo),
+                        lambda caminho: pq.write_table(para_tabela(df), caminho, compression='zstd'))
+        anterior_arquivo = self.particoes.get(mes_referencia, {}).get('arquivo')
+
+        self.particoes[mes_referencia] = {
+            'arquivo': arquivo,
+            'linhas': len(df),
+            'arquivos_origem': sorted(df['arquivo_origem'].astype(str).unique().tolist()),
+            'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.gravar_indice()
+        if anterior_arquivo and anterior_arquivo != arquivo:
+            os.remove(os.path.join(self.pasta, anterior_arquivo))
+        return len(df) - antes
+
+    def gravar_indice(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        _gravar_atomico(self.caminho_indice, self._escrever_indice)
+
+    def _escrever_indice(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.indice, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def carregar(self, meses=None, filtros=None):
+        """
+        Junta as partições (todas, ou só as de `meses`) na ordem de
+        mes_referencia_planilha, cada uma ordenada por competência. As outras
+        partições nem são abertas; `filtros` vale dentro de cada uma (ver ler_dados).
+        """
+        escolhidas = sorted(self.particoes) if meses is None else sorted(set(meses) & set(self.particoes))
+        if not escolhidas:
+            return pd.DataFrame(columns=['competencia', 'fator', 'mes_referencia_planilha', 'arquivo_origem'])
+        df = pd.concat([self.ler_particao(m, filtros) for m in escolhidas], ignore_index=True)
+        # Cada partição tem suas próprias categorias; o concat volta para texto
+        for coluna in ('mes_referencia_planilha', 'arquivo_origem'):
+            df[coluna] = df[coluna].astype(str).astype('category')
+        return df
+
+    def importar(self, df):
+        """Carga inicial: divide um DataFrame consolidado em uma partição por mes_referencia_planilha."""
+        df = df.copy()
+        df['mes_referencia_planilha'] = df['mes_referencia_planilha'].astype(str)
+        for mes_referencia, grupo in df.groupby('mes_referencia_planilha', sort=True):
+            self.gravar_particao(mes_referencia, grupo)
+        return len(self.particoes)
+
+    def exportar(self, destino, csv=False):
+        """Regrava o arquivo único a partir das partições (só quando alguém precisar dele)."""
+        df = self.carregar()
+        gravar_dados(df, destino, csv=csv)
+        return len(df)
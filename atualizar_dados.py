@@ -2,15 +2,19 @@
 import pandas as pd
 import os
 import re
+import argparse
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime
+from processador_inteligente import processar_planilha
+from armazenamento_particionado import ArmazenamentoParticionado, PASTA_PARTICOES
+from colunar import ler_dados, caminho_parquet, caminho_csv
+from baixar_planilhas import baixar_urls, PASTA_DOWNLOAD
 
 # --- Configuração ---
 URL = "https://www.gov.br/previdencia/pt-br/assuntos/previdencia-social/legislacao/indice-de-atualizacao-das-contribuicoes-para-calculo-do-salario-de-beneficio"
-ARQUIVO_PRINCIPAL = "dados_completos_automatico.csv"
-PASTA_DOWNLOAD = "planilhas"
+ARQUIVO_PRINCIPAL = "dados_completos_automatico.parquet"
 
 def encontrar_link_mais_recente():
     """Encontra o URL da planilha com a data mais recente no nome."""
@@ -50,73 +54,60 @@ def encontrar_link_mais_recente():
         return None
 
 def processar_planilha_nova(filepath):
-    """Processa a nova planilha baixada com as regras fixas."""
+    """Processa a nova planilha com a mesma lógica do processador_inteligente."""
     print(f"Processando '{os.path.basename(filepath)}'...")
-    # Reutiliza a mesma lógica do processador_inteligente
-    try:
-        df_full = pd.read_excel(filepath, header=None)
-        ref_month_str = str(df_full.iloc[4, 1])
-        if 'nan' in ref_month_str.lower(): ref_month_str = str(df_full.iloc[4, 0])
-        if 'nan' in ref_month_str.lower(): ref_month_str = str(df_full.iloc[4, 2])
-        match = re.search(r'(\w+/\d{4})', ref_month_str)
-        ref_month_str = match.group(1) if match else os.path.basename(filepath)
-
-        df_data = pd.read_excel(filepath, header=None, skiprows=9, usecols=[1, 2])
-        df_data.columns = ['competencia', 'fator']
-        df_data['mes_referencia_planilha'] = ref_month_str
-        df_data['arquivo_origem'] = os.path.basename(filepath)
-
-        df_data.dropna(how='all', inplace=True)
-        df_data['competencia'] = pd.to_datetime(df_data['competencia'], errors='coerce')
-        df_data['fator'] = pd.to_numeric(df_data['fator'], errors='coerce')
-        df_data.dropna(subset=['competencia', 'fator'], inplace=True)
-        return df_data
-    except Exception as e:
-        print(f"   -> Erro ao processar a nova planilha: {e}")
-        return None
+    return processar_planilha(filepath)
 
 # --- Execução Principal ---
 
-novo_link = encontrar_link_mais_recente()
-
-if novo_link:
-    nome_arquivo_novo = os.path.basename(novo_link)
-    caminho_arquivo_novo = os.path.join(PASTA_DOWNLOAD, nome_arquivo_novo)
-
-    # 1. Baixar o novo arquivo
-    print(f"Baixando '{nome_arquivo_novo}'...")
-    try:
-        os.makedirs(PASTA_DOWNLOAD, exist_ok=True)
-        r = requests.get(novo_link, timeout=60)
-        r.raise_for_status()
-        with open(caminho_arquivo_novo, 'wb') as f:
-            f.write(r.content)
-    except Exception as e:
-        print(f"Falha no download: {e}")
-        exit()
+def main():
+    parser = argparse.ArgumentParser(description="Inclui a planilha mais recente no armazenamento particionado.")
+    parser.add_argument('--exportar', action='store_true',
+                        help=f"Regrava também '{ARQUIVO_PRINCIPAL}' inteiro a partir das partições")
+    parser.add_argument('--csv', action='store_true', help="Com --exportar, grava também a versão CSV")
+    args = parser.parse_args()
+
+    novo_link = encontrar_link_mais_recente()
+    if not novo_link:
+        print("Nenhuma ação realizada.")
+        return
+
+    # 1. Baixar o novo arquivo (só se mudou desde o último download)
+    print(f"Baixando '{os.path.basename(novo_link)}'...")
+    download, = baixar_urls([novo_link], PASTA_DOWNLOAD)
+    if download.estado == 'falha':
+        print(f"Falha no download: {download.erro}")
+        return
+    caminho_arquivo_novo = download.caminho
+    nome_arquivo_novo = os.path.basename(caminho_arquivo_novo)
+
+    armazenamento = ArmazenamentoParticionado(PASTA_PARTICOES)
+    if download.estado == 'inalterado' and any(nome_arquivo_novo in p['arquivos_origem']
+                                               for p in armazenamento.particoes.values()):
+        print("A planilha não mudou desde a última atualização. Nenhuma ação realizada.")
+        return
 
     # 2. Processar o novo arquivo
     novos_dados_df = processar_planilha_nova(caminho_arquivo_novo)
-
-    if novos_dados_df is not None:
-        # 3. Carregar o arquivo principal existente
-        if os.path.exists(ARQUIVO_PRINCIPAL):
-            print(f"Carregando dados existentes de '{ARQUIVO_PRINCIPAL}'...")
-            dados_antigos_df = pd.read_csv(ARQUIVO_PRINCIPAL)
-            # Concatenar dados antigos e novos
-            df_final = pd.concat([dados_antigos_df, novos_dados_df], ignore_index=True)
-        else:
-            print("Arquivo principal não encontrado. Criando um novo.")
-            df_final = novos_dados_df
-
-        # 4. Remover duplicatas e ordenar
-        df_final['competencia'] = pd.to_datetime(df_final['competencia'])
-        df_final.drop_duplicates(subset=['competencia', 'fator', 'mes_referencia_planilha'], keep='last', inplace=True)
-        df_final.sort_values(by=['mes_referencia_planilha', 'competencia'], inplace=True)
-
-        # 5. Salvar o arquivo atualizado
-        df_final.to_csv(ARQUIVO_PRINCIPAL, index=False, encoding='utf-8-sig')
-        print(f"\nSucesso! '{ARQUIVO_PRINCIPAL}' foi atualizado com {len(novos_dados_df)} novas linhas.")
-        print(f"Total de linhas agora: {len(df_final)}.")
-else:
-    print("Nenhuma ação realizada.")
+    if novos_dados_df is None:
+        return
+
+    # 3. Criar o armazenamento particionado a partir do arquivo principal, na primeira vez
+    if not armazenamento.existe() and (os.path.exists(caminho_parquet(ARQUIVO_PRINCIPAL))
+                                       or os.path.exists(caminho_csv(ARQUIVO_PRINCIPAL))):
+        print(f"Criando '{PASTA_PARTICOES}' a partir de '{ARQUIVO_PRINCIPAL}' (só na primeira execução)...")
+        armazenamento.importar(ler_dados(ARQUIVO_PRINCIPAL))
+
+    # 4. Gravar só a partição da nova publicação; o histórico não é relido
+    for mes_referencia, grupo in novos_dados_df.groupby('mes_referencia_planilha'):
+        novas_linhas = armazenamento.gravar_particao(mes_referencia, grupo)
+        print(f"\nSucesso! Partição '{mes_referencia}' atualizada com {novas_linhas} novas linhas.")
+    print(f"Total de linhas agora: {armazenamento.total_linhas()} em {len(armazenamento.particoes)} partições.")
+
+    # 5. Arquivo único, só se pedido
+    if args.exportar:
+        total = armazenamento.exportar(ARQUIVO_PRINCIPAL, csv=args.csv)
+        print(f"'{ARQUIVO_PRINCIPAL}' regravado com {total} linhas.")
+
+if __name__ == '__main__':
+    main()
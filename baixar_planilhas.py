@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse, unquote
+
+import requests
+
+# Download das planilhas listadas no links.txt. Os downloads rodam em paralelo
+# (asyncio, com um semáforo limitando as conexões simultâneas; cada conexão
+# usa uma requests.Session própria numa thread) e um manifesto guarda, para
+# cada URL, o ETag, o Last-Modified e o sha256 do arquivo baixado. Na execução
+# seguinte o servidor é consultado com If-None-Match/If-Modified-Since e só
+# responde com o arquivo se ele mudou. Um download interrompido fica num
+# arquivo .part e é retomado de onde parou (Range) na próxima tentativa.
+
+ARQUIVO_LINKS = "links.txt"
+PASTA_DOWNLOAD = "planilhas"
+ARQUIVO_MANIFESTO = ".manifesto.json"
+
+CONEXOES = 8
+TENTATIVAS = 4
+# Espera antes da 2ª tentativa, dobrando a cada nova falha
+ESPERA = 1.0
+TIMEOUT = 60
+TAMANHO_BLOCO = 1 << 16
+
+# Respostas que valem uma nova tentativa (as demais falham de vez)
+STATUS_TEMPORARIOS = {408, 429, 500, 502, 503, 504}
+
+# estado: 'novo', 'atualizado', 'inalterado' ou 'falha'
+ResultadoDownload = namedtuple('ResultadoDownload', ['url', 'caminho', 'estado', 'erro'])
+
+
+class ErroTemporario(Exception):
+    """Falha que vale nova tentativa; `registro` é o manifesto atualizado (com o validador do .part)."""
+
+    def __init__(self, mensagem, registro=None):
+        super().__init__(mensagem)
+        self.registro = registro
+
+
+def ler_links(arquivo=ARQUIVO_LINKS):
+    """URLs do arquivo de links, sem linhas vazias nem repetidas, na ordem original."""
+    with open(arquivo, encoding='utf-8') as f:
+        return list(dict.fromkeys(linha.strip() for linha in f if linha.strip()))
+
+
+def nomes_locais(urls, manifesto):
+    """
+    Nome do arquivo local de cada URL: o do manifesto, se já foi baixada;
+    senão o último trecho do caminho, com um sufixo se outro URL já o usa.
+    """
+    nomes = {}
+    usados = {registro['arquivo'] for url, registro in manifesto.items() if url in urls}
+    for url in urls:
+        if url in manifesto:
+            nomes[url] = manifesto[url]['arquivo']
+            continue
+        nome = unquote(os.path.basename(urlparse(url).path)) or 'planilha'
+        if nome in usados:
+            base, ext = os.path.splitext(nome)
+            nome = f"{base}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+        usados.add(nome)
+        nomes[url] = nome
+    return nomes
+
+
+def ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def gravar_manifesto(pasta, manifesto):
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _hash_parcial(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h
+
+
+_sessoes = threading.local()
+
+
+def _sessao():
+    # Uma Session por thread: reaproveita a conexão com o servidor entre arquivos
+    if not hasattr(_sessoes, 'sessao'):
+        _sessoes.sessao = requests.Session()
+    return _sessoes.sessao
+
+
+def baixar_arquivo(url, destino, registro, timeout=TIMEOUT):
+    """
+    Baixa `url` em `destino` (executado numa thread). `registro` é a entrada do
+    manifesto da última vez, ou None. Devolve (estado, novo_registro).
+    Falhas que valem nova tentativa levantam ErroTemporario.
+    """
+    registro = dict(registro or {}, arquivo=os.path.basename(destino))
+    parcial = destino + ".part"
+    headers = {}
+
+    # Só pergunta "mudou?" se o arquivo local ainda é o que o manifesto descreve
+    local_ok = os.path.exists(destino) and os.path.getsize(destino) == registro.get('tamanho')
+    if local_ok:
+        if registro.get('etag'):
+            headers['If-None-Match'] = registro['etag']
+        if registro.get('last_modified'):
+            headers['If-Modified-Since'] = registro['last_modified']
+
+    # Retoma um .part, desde que seja da mesma versão do arquivo no servidor
+    inicio = 0
+    validador_parcial = registro.get('parcial')
+    if os.path.exists(parcial) and validador_parcial:
+        inicio = os.path.getsize(parcial)
+        headers['Range'] = f"bytes={inicio}-"
+        headers['If-Range'] = validador_parcial
+
+    try:
+        resposta = _sessao().get(url, headers=headers, stream=True, timeout=timeout)
+    except requests.RequestException as e:
+        raise ErroTemporario(str(e), registro)
+
+    with resposta:
+        if resposta.status_code == 304:
+            return 'inalterado', registro
+        if resposta.status_code == 416:
+            # O .part não corresponde mais ao arquivo: recomeça do zero
+            try:
+                os.remove(parcial)
+            except FileNotFoundError:
+                pass
+            registro.pop('parcial', None)
+            raise ErroTemporario("faixa inválida, recomeçando o download", registro)
+        if resposta.status_code in STATUS_TEMPORARIOS:
+            raise ErroTemporario(f"HTTP {resposta.status_code}", registro)
+        resposta.raise_for_status()
+
+        etag = resposta.headers.get('ETag')
+        last_modified = resposta.headers.get('Last-Modified')
+        if resposta.status_code == 206 and inicio:
+            h = _hash_parcial(parcial)
+            modo = 'ab'
+            # 'bytes 1000-4999/5000': o total vem depois da barra
+            esperado = resposta.headers.get('Content-Range', '').rpartition('/')[2]
+        else:
+            h = hashlib.sha256()
+            modo = 'wb'
+            esperado = resposta.headers.get('Content-Length')
+
+        # O validador do .part fica no registro, para retomar se a conexão cair
+        registro = dict(registro, parcial=etag or last_modified)
+        try:
+            with open(parcial, modo) as f:
+                for bloco in resposta.iter_content(TAMANHO_BLOCO):
+                    f.write(bloco)
+                    h.update(bloco)
+        except requests.RequestException as e:
+            raise ErroTemporario(str(e), registro)
+
+    digest = h.hexdigest()
+    tamanho = os.path.getsize(parcial)
+    if esperado and esperado.isdigit() and int(esperado) != tamanho:
+        raise ErroTemporario(f"download incompleto ({tamanho} de {esperado} bytes)", registro)
+
+    novo_registro = {
+        'arquivo': registro['arquivo'],
+        'etag': etag,
+        'last_modified': last_modified,
+        'sha256': digest,
+        'tamanho': tamanho,
+        'baixado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    if local_ok and digest == registro.get('sha256'):
+        # O servidor mandou de novo, mas o conteúdo é o mesmo: não mexe no arquivo
+        os.remove(parcial)
+        return 'inalterado', dict(novo_registro, baixado_em=registro.get('baixado_em'))
+
+    estado = 'atualizado' if os.path.exists(destino) else 'novo'
+    os.replace(parcial, destino)
+    return estado, novo_registro
+
+
+async def baixar_todos(urls, pasta=PASTA_DOWNLOAD, conexoes=CONEXOES, tentativas=TENTATIVAS,
+                       espera=ESPERA, timeout=TIMEOUT, progresso=None):
+    """
+    Baixa as `urls` para `pasta` com no máximo `conexoes` downloads ao mesmo
+    tempo. Devolve um ResultadoDownload por URL, na ordem de `urls`.
+    `progresso(feitos, total, resultado)` é chamado a cada arquivo concluído.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = ler_manifesto(pasta)
+    nomes = nomes_locais(urls, manifesto)
+    limite = asyncio.Semaphore(conexoes)
+    loop = asyncio.get_running_loop()
+    feitos = 0
+
+    async def baixar(url, executor):
+        nonlocal feitos
+        destino = os.path.join(pasta, nomes[url])
+        estado, erro = 'falha', None
+        async with limite:
+            for tentativa in range(tentativas):
+                try:
+                    estado, manifesto[url] = await loop.run_in_executor(
+                        executor, baixar_arquivo, url, destino, manifesto.get(url), timeout)
+                    erro = None
+                    break
+                except ErroTemporario as e:
+                    erro = str(e)
+                    if e.registro is not None:
+                        manifesto[url] = e.registro
+                    if tentativa + 1 < tentativas:
+                        await asyncio.sleep(espera * 2 ** tentativa)
+                except Exception as e:
+                    erro = str(e)
+                    break
+
+        resultado = ResultadoDownload(url, destino, estado, erro)
+        feitos += 1
+        if progresso:
+            progresso(feitos, len(urls), resultado)
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=conexoes) as executor:
+        try:
+            return await asyncio.gather(*(baixar(url, executor) for url in urls))
+        finally:
+            gravar_manifesto(pasta, manifesto)
+
+
+def baixar_urls(urls, pasta=PASTA_DOWNLOAD, **opcoes):
+    """Versão síncrona de baixar_todos, para usar em outros scripts."""
+    return asyncio.run(baixar_todos(urls, pasta, **opcoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixa as planilhas do links.txt, só as novas ou alteradas.")
+    parser.add_argument('--links', default=ARQUIVO_LINKS, help="Arquivo com um URL por linha")
+    parser.add_argument('--pasta', default=PASTA_DOWNLOAD, help="Pasta de destino")
+    parser.add_argument('--conexoes', type=int, default=CONEXOES, help="Downloads simultâneos")
+    parser.add_argument('--tentativas', type=int, default=TENTATIVAS, help="Tentativas por arquivo")
+    args = parser.parse_args()
+
+    urls = ler_links(args.links)
+    print(f"{len(urls)} planilhas em '{args.links}', {args.conexoes} conexões...")
+
+    def progresso(feitos, total, resultado):
+        detalhe = f" ({resultado.erro})" if resultado.erro else ""
+        print(f"[{feitos}/{total}] {os.path.basename(resultado.caminho)}: {resultado.estado}{detalhe}")
+
+    inicio = time.perf_counter()
+    resultados = baixar_urls(urls, args.pasta, conexoes=args.conexoes, tentativas=args.tentativas,
+                             progresso=progresso)
+
+    contagem = {}
+    for resultado in resultados:
+        contagem[resultado.estado] = contagem.get(resultado.estado, 0) + 1
+    resumo = ", ".join(f"{n} {estado}" for estado, n in sorted(contagem.items()))
+    print(f"\nConcluído em {time.perf_counter() - inicio:.1f}s: {resumo}.")
+    if contagem.get('falha'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
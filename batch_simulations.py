@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+import time
+from app import app, db
+from app import User
+from app import batch
+from app.factor_cache import get_factors
+
+
+def load_specs(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.json'):
+            return batch.specs_from_json(json.load(f))
+        return batch.specs_from_csv(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and calculate many simulations from a CSV or JSON file.")
+    parser.add_argument('input', help="CSV (server_name,dob,benefit_type,gender,month_year,amount) or JSON file")
+    parser.add_argument('--username', required=True, help="Owner of the new simulations")
+    parser.add_argument('--dry-run', action='store_true', help="Calculate the results without saving them")
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User.query.filter_by(username=args.username).first()
+        if not user:
+            print(f"User '{args.username}' not found.")
+            sys.exit(1)
+
+        started = time.perf_counter()
+        factors = get_factors()
+        try:
+            specs = load_specs(args.input)
+            batch.check_factors(specs, factors)
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+            sys.exit(1)
+        print(f"Loaded {len(specs)} simulations in {time.perf_counter() - started:.2f}s.")
+
+        started = time.perf_counter()
+        if args.dry_run:
+            results = batch.calculate_specs(specs, factors)
+            for spec, result in zip(specs, results):
+                print(f"{spec.server_name}: {result:.2f}")
+        else:
+            ids, results = batch.create_simulations(user, specs, factors)
+            db.session.commit()
+            print(f"Saved simulations {ids[0]}..{ids[-1]}.")
+        print(f"Calculated {len(specs)} simulations in {time.perf_counter() - started:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
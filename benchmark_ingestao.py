@@ -0,0 +1,395 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+# Benchmark da ingestão sobre um corpus sintético de planilhas. O corpus tem
+# um arquivo por publicação mensal, alternando entre os layouts conhecidos (as
+# linhas de cabeçalho e nomes de coluna das `strategies` do processador_final
+# e o layout fixo B5/B10 do processador_inteligente), em .xlsx e, se o xlwt
+# estiver instalado, também em .xls. Cada etapa roda num subprocesso próprio,
+# para que o pico de memória medido seja só dela, e o resultado vai para um
+# JSON (e uma linha no histórico) que pode ser comparado com o de outra execução.
+
+PASTA_BENCHMARK = ".benchmark"
+ARQUIVO_HISTORICO = "historico.jsonl"
+VERSAO_RESULTADO = 1
+
+# Primeira publicação do corpus; as seguintes avançam um mês por arquivo
+PRIMEIRA_PUBLICACAO = (2015, 1)
+
+# Etapas na ordem em que rodam: as de cache e índice dependem das anteriores
+ETAPAS = ('processador_final', 'processador_final_cache', 'processador_inteligente',
+          'consolidar', 'filtrar', 'filtrar_indice')
+
+try:
+    import xlwt
+except ImportError:
+    xlwt = None
+
+
+def layouts():
+    """
+    (nome, linha do cabeçalho, [(coluna, título ou None)] de competência e
+    fator) de cada layout conhecido, tirados do próprio código dos processadores.
+    """
+    from processador_final import strategies
+    from processador_inteligente import LAYOUT_FIXO
+
+    resultado = []
+    vistos = set()
+    for header_row, col_map in strategies:
+        colunas = []
+        for posicao, nome in enumerate(col_map):
+            if nome.startswith('unnamed: '):
+                colunas.append((int(nome.split(': ')[1]), None))
+            else:
+                colunas.append((posicao + 1, nome.capitalize()))
+        chave = (header_row, tuple(colunas))
+        if chave not in vistos:
+            vistos.add(chave)
+            nome = f"cabecalho_{header_row}_" + "_".join(t or f"col{c}" for c, t in colunas)
+            resultado.append((re.sub(r'\W+', '_', nome.lower()).strip('_'), header_row, colunas))
+    resultado.append(('fixo_b5_b10', LAYOUT_FIXO.linha_cabecalho,
+                      [(LAYOUT_FIXO.col_competencia, None), (LAYOUT_FIXO.col_fator, None)]))
+    return resultado
+
+
+def publicacao(indice):
+    ano, mes = PRIMEIRA_PUBLICACAO
+    total = ano * 12 + mes - 1 + indice
+    return total // 12, total % 12 + 1
+
+
+MESES = ('janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+         'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro')
+
+
+def grade_sintetica(indice, linhas, layout):
+    """Células (linha, coluna, valor) de uma planilha e o DataFrame dos dados que ela contém."""
+    _, header_row, colunas = layout
+    ano, mes = publicacao(indice)
+    (col_comp, titulo_comp), (col_fator, titulo_fator) = colunas
+
+    celulas = [
+        (0, 0, 'MINISTÉRIO DA PREVIDÊNCIA SOCIAL'),
+        (2, 1, 'Fatores de atualização dos salários de contribuição'),
+        (4, 1, f"Referência: {MESES[mes - 1]}/{ano}"),
+    ]
+    if titulo_comp:
+        celulas.append((header_row, col_comp, titulo_comp))
+    if titulo_fator:
+        celulas.append((header_row, col_fator, titulo_fator))
+
+    # Competências até o mês anterior à publicação, fator diminuindo com elas
+    ultima = ano * 12 + mes - 2
+    competencias = [datetime(c // 12, c % 12 + 1, 1) for c in range(ultima - linhas + 1, ultima + 1)]
+    fatores = [round(1.004 ** (linhas - i), 6) for i in range(linhas)]
+    for i, (competencia, fator) in enumerate(zip(competencias, fatores)):
+        celulas.append((header_row + 1 + i, col_comp, competencia))
+        celulas.append((header_row + 1 + i, col_fator, fator))
+    celulas.append((header_row + 2 + linhas, 1, 'Fonte: INSS'))
+
+    dados = pd.DataFrame({'competencia': competencias, 'fator': fatores})
+    return celulas, dados
+
+
+def gravar_xlsx(caminho, celulas):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    for linha, coluna, valor in celulas:
+        celula = ws.cell(row=linha + 1, column=coluna + 1, value=valor)
+        if isinstance(valor, datetime):
+            celula.number_format = 'mm/yyyy'
+    wb.save(caminho)
+
+
+def gravar_xls(caminho, celulas):
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet('Planilha1')
+    estilo_data = xlwt.easyxf(num_format_str='mm/yyyy')
+    for linha, coluna, valor in celulas:
+        if isinstance(valor, datetime):
+            ws.write(linha, coluna, valor, estilo_data)
+        else:
+            ws.write(linha, coluna, valor)
+    wb.save(caminho)
+
+
+def gerar_corpus(pasta, arquivos, linhas, formatos):
+    """
+    Grava `arquivos` planilhas em pasta/planilhas e, em pasta/processados, o
+    CSV que a ferramenta assistida faria de cada uma (um em cada dez com uma
+    cópia '-1', para a consolidação ter repetidas a descartar). Devolve o
+    total de linhas das planilhas.
+    """
+    pasta_planilhas = os.path.join(pasta, 'planilhas')
+    pasta_processados = os.path.join(pasta, 'processados')
+    for p in (pasta_planilhas, pasta_processados):
+        shutil.rmtree(p, ignore_errors=True)
+        os.makedirs(p)
+
+    conhecidos = layouts()
+    total = 0
+    for indice in range(arquivos):
+        layout = conhecidos[indice % len(conhecidos)]
+        formato = formatos[(indice // len(conhecidos)) % len(formatos)]
+        ano, mes = publicacao(indice)
+        nome = f"fatores_de_atualizacao_{mes:02d}_{ano}_art_33"
+
+        celulas, dados = grade_sintetica(indice, linhas, layout)
+        (gravar_xls if formato == 'xls' else gravar_xlsx)(os.path.join(pasta_planilhas, f"{nome}.{formato}"), celulas)
+        total += len(dados)
+
+        dados['arquivo_origem'] = f"{nome}.{formato}"
+        dados.to_csv(os.path.join(pasta_processados, f"{nome}.csv"), index=False)
+        if indice % 10 == 0:
+            dados.to_csv(os.path.join(pasta_processados, f"{nome}-1.csv"), index=False)
+    return total
+
+
+def preparar_corpus(pasta, arquivos, linhas, formatos):
+    """Reaproveita o corpus de uma execução anterior com os mesmos parâmetros; senão gera outro."""
+    parametros = {'arquivos': arquivos, 'linhas': linhas, 'formatos': list(formatos),
+                  'layouts': [nome for nome, _, _ in layouts()]}
+    caminho = os.path.join(pasta, 'corpus.json')
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            salvo = json.load(f)
+        if salvo['parametros'] == parametros:
+            return salvo
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    os.makedirs(pasta, exist_ok=True)
+    inicio = time.perf_counter()
+    total = gerar_corpus(pasta, arquivos, linhas, formatos)
+    corpus = {'parametros': parametros, 'linhas_planilhas': total,
+              'segundos_geracao': round(time.perf_counter() - inicio, 3)}
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=2)
+    return corpus
+
+
+# --- Etapas (cada uma roda num subprocesso: ver medir_etapa) ---
+
+def _planilhas(pasta):
+    pasta_planilhas = os.path.join(pasta, 'planilhas')
+    return [os.path.join(pasta_planilhas, f) for f in os.listdir(pasta_planilhas) if f.endswith((".xlsx", ".xls"))]
+
+
+def _processar(pasta, funcao, saida, workers, cache):
+    from ingestao_paralela import processar_arquivos
+    from colunar import gravar_dados
+
+    file_paths = _planilhas(pasta)
+    dataframes, falhas = processar_arquivos(file_paths, funcao, workers, cache=cache)
+    linhas = 0
+    if dataframes:
+        final_df = pd.concat(dataframes, ignore_index=True)
+        gravar_dados(final_df, os.path.join(pasta, saida))
+        linhas = len(final_df)
+    return {'arquivos': len(file_paths), 'linhas': linhas, 'falhas': len(falhas)}
+
+
+def etapa_processador_final(pasta, workers):
+    from processador_final import parse_file
+    from cache_ingestao import CacheIngestao
+    # Cache vazio: mede a leitura de todas as planilhas mais a gravação do cache
+    shutil.rmtree(os.path.join(pasta, 'cache'), ignore_errors=True)
+    return _processar(pasta, parse_file, 'dados_consolidados.parquet', workers,
+                      CacheIngestao(os.path.join(pasta, 'cache')))
+
+
+def etapa_processador_final_cache(pasta, workers):
+    from processador_final import parse_file
+    from cache_ingestao import CacheIngestao
+    return _processar(pasta, parse_file, 'dados_consolidados.parquet', workers,
+                      CacheIngestao(os.path.join(pasta, 'cache')))
+
+
+def etapa_processador_inteligente(pasta, workers):
+    from processador_inteligente import processar_planilha
+    return _processar(pasta, processar_planilha, 'dados_completos_automatico.parquet', workers, None)
+
+
+def etapa_consolidar(pasta, workers):
+    from consolidar import consolidar
+    pasta_processados = os.path.join(pasta, 'processados')
+    arquivos = len(os.listdir(pasta_processados))
+    linhas, _ = consolidar(pasta_processados, os.path.join(pasta, 'dados_completos_planilhas.parquet'))
+    return {'arquivos': arquivos, 'linhas': linhas, 'falhas': 0}
+
+
+def _filtrar(pasta):
+    from filtrar_dados import filtrar, PERIODO_PADRAO
+    entrada = os.path.join(pasta, 'dados_completos_automatico.parquet')
+    linhas = filtrar(entrada, os.path.join(pasta, 'dados_filtrados.parquet'), publicado=PERIODO_PADRAO)
+    return {'arquivos': len(_planilhas(pasta)), 'linhas': linhas, 'falhas': 0}
+
+
+def etapa_filtrar(pasta, workers):
+    from filtrar_dados import caminho_indice
+    # Sem o índice de períodos: inclui o custo de montá-lo
+    indice = caminho_indice(os.path.join(pasta, 'dados_completos_automatico.parquet'))
+    if os.path.exists(indice):
+        os.remove(indice)
+    return _filtrar(pasta)
+
+
+def etapa_filtrar_indice(pasta, workers):
+    return _filtrar(pasta)
+
+
+def rodar_etapa(nome, pasta, workers):
+    """Executado no subprocesso: roda a etapa e devolve tempos, contagens e picos de memória."""
+    funcao = globals()[f"etapa_{nome}"]
+    inicio = time.perf_counter()
+    resultado = funcao(pasta, workers)
+    resultado['segundos'] = time.perf_counter() - inicio
+    # ru_maxrss vem em KB no Linux (em bytes no macOS)
+    escala = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    resultado['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala
+    resultado['pico_rss_workers_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / escala
+    return resultado
+
+
+def medir_etapa(nome, pasta, workers):
+    """Roda uma etapa num processo novo, com a saída dos scripts descartada."""
+    comando = [sys.executable, os.path.abspath(__file__), '--etapa', nome, '--pasta', pasta]
+    if workers:
+        comando += ['--workers', str(workers)]
+    processo = subprocess.run(comando, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"etapa '{nome}' falhou:\n{processo.stderr.strip()}")
+    # O resultado é a última linha; as anteriores são o que os módulos imprimiram
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def resumir(medicoes):
+    """Mediana dos tempos e maior pico de memória das repetições de uma etapa."""
+    segundos = [m['segundos'] for m in medicoes]
+    mediana = statistics.median(segundos)
+    ultima = medicoes[-1]
+    return {
+        'segundos': round(mediana, 4),
+        'segundos_min': round(min(segundos), 4),
+        'arquivos': ultima['arquivos'],
+        'linhas': ultima['linhas'],
+        'falhas': ultima['falhas'],
+        'arquivos_por_s': round(ultima['arquivos'] / mediana, 2) if mediana else None,
+        'linhas_por_s': round(ultima['linhas'] / mediana, 1) if mediana else None,
+        'pico_rss_mb': round(max(m['pico_rss_mb'] for m in medicoes), 1),
+        'pico_rss_workers_mb': round(max(m['pico_rss_workers_mb'] for m in medicoes), 1),
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparar(atual, anterior, tolerancia):
+    """Etapas em que o tempo mediano piorou mais que `tolerancia` (0.2 = 20%): [(nome, antes, agora)]."""
+    regressoes = []
+    for nome, medida in atual['etapas'].items():
+        antes = anterior.get('etapas', {}).get(nome)
+        if antes and antes['segundos'] and medida['segundos'] > antes['segundos'] * (1 + tolerancia):
+            regressoes.append((nome, antes['segundos'], medida['segundos']))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a ingestão das planilhas sobre um corpus sintético.")
+    parser.add_argument('--arquivos', type=int, default=60, help="Planilhas no corpus")
+    parser.add_argument('--linhas', type=int, default=360, help="Competências por planilha")
+    parser.add_argument('--formatos', default='xlsx,xls', help="Formatos do corpus, separados por vírgula")
+    parser.add_argument('--etapas', default=','.join(ETAPAS), help="Etapas a medir, separadas por vírgula")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções de cada etapa (vale a mediana)")
+    parser.add_argument('--workers', type=int, default=None, help="Processos dos processadores (padrão: CPUs)")
+    parser.add_argument('--pasta', default=PASTA_BENCHMARK, help="Pasta do corpus e dos arquivos gerados")
+    parser.add_argument('--saida', help="Arquivo JSON do resultado (padrão: <pasta>/resultado.json)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior: aponta as etapas que ficaram mais lentas")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Piora aceita em --comparar (0.2 = 20%%)")
+    parser.add_argument('--etapa', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Execução interna: uma etapa só, resultado numa linha JSON
+    if args.etapa:
+        print(json.dumps(rodar_etapa(args.etapa, args.pasta, args.workers)))
+        return
+
+    formatos = [f.strip() for f in args.formatos.split(',') if f.strip()]
+    if 'xls' in formatos and xlwt is None:
+        print("Aviso: xlwt não instalado, o corpus terá só .xlsx (pip install xlwt para incluir .xls).")
+        formatos.remove('xls')
+    if not formatos:
+        print("Erro: nenhum formato de planilha disponível.")
+        sys.exit(2)
+    etapas = [e.strip() for e in args.etapas.split(',') if e.strip()]
+    desconhecidas = [e for e in etapas if e not in ETAPAS]
+    if desconhecidas:
+        print(f"Erro: etapas desconhecidas: {', '.join(desconhecidas)} (conhecidas: {', '.join(ETAPAS)})")
+        sys.exit(2)
+
+    # Lido antes de medir: --comparar pode apontar para o próprio arquivo de saída
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+
+    print(f"Preparando corpus: {args.arquivos} planilhas x {args.linhas} linhas ({', '.join(formatos)})...")
+    corpus = preparar_corpus(args.pasta, args.arquivos, args.linhas, formatos)
+
+    resultado = {
+        'versao': VERSAO_RESULTADO,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_atual(),
+        'ambiente': {'python': platform.python_version(), 'pandas': pd.__version__,
+                     'plataforma': platform.platform(), 'cpus': os.cpu_count(), 'workers': args.workers},
+        'corpus': corpus,
+        'repeticoes': args.repeticoes,
+        'etapas': {},
+    }
+
+    print(f"\n{'etapa':<26}{'s (mediana)':>12}{'arquivos/s':>12}{'linhas/s':>12}{'RSS MB':>9}{'workers MB':>12}")
+    for nome in etapas:
+        medicoes = [medir_etapa(nome, args.pasta, args.workers) for _ in range(max(1, args.repeticoes))]
+        medida = resultado['etapas'][nome] = resumir(medicoes)
+        print(f"{nome:<26}{medida['segundos']:>12.3f}{medida['arquivos_por_s'] or 0:>12.1f}"
+              f"{medida['linhas_por_s'] or 0:>12.0f}{medida['pico_rss_mb']:>9.1f}{medida['pico_rss_workers_mb']:>12.1f}")
+        if medida['falhas']:
+            print(f"   -> {medida['falhas']} planilhas falharam")
+
+    saida = args.saida or os.path.join(args.pasta, 'resultado.json')
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(args.pasta, ARQUIVO_HISTORICO), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    print(f"\nResultado salvo em '{saida}'.")
+
+    if anterior is not None:
+        regressoes = comparar(resultado, anterior, args.tolerancia)
+        for nome, antes, agora in regressoes:
+            print(f"Regressão em '{nome}': {antes:.3f}s -> {agora:.3f}s ({agora / antes - 1:+.0%})")
+        if regressoes:
+            sys.exit(1)
+        print(f"Nenhuma etapa mais de {args.tolerancia:.0%} mais lenta que em '{args.comparar}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+# Load test for the main routes. The app is pointed at a scratch SQLite
+# database (DATABASE_URL, set before `app` is imported), seeded with the
+# factors from seed_factors.py, a few users and full-career simulations.
+# Each endpoint is then hit by --concurrency threads, each logged in as its
+# own user, through the Flask test client or, with --server, over HTTP
+# against a local threaded WSGI server.
+
+ENDPOINTS = ('dashboard', 'enter_salaries', 'calculate_salaries', 'generate_pdf')
+
+# Responses that count as a success; generate_pdf answers 202 while the render is pending
+EXPECTED_STATUS = {
+    'dashboard': {200},
+    'enter_salaries': {200},
+    'calculate_salaries': {302},
+    'generate_pdf': {200, 202},
+}
+
+PASSWORD = 'benchmark'
+
+
+def career_salaries(competences, rng):
+    """A full career: one salary per factor month, growing with small raises along the way."""
+    amount = rng.uniform(800, 3000)
+    salaries = {}
+    for competence in competences:
+        if rng.random() < 1 / 12:
+            amount *= 1 + rng.uniform(0.02, 0.12)
+        salaries[competence] = round(amount, 2)
+    return salaries
+
+
+def seed(users, simulations_per_user, rng):
+    """Creates the tables, the factors and the test data. Returns {username: [simulation ids]}."""
+    from app import app, db, bcrypt, User
+    from app import batch
+    from app.competence import format_competence
+    from app.factor_cache import get_factors
+    import seed_factors
+
+    seed_factors.seed_db()
+    owned = {}
+    with app.app_context():
+        competences = [row.competence for row in get_factors().rows]
+        # Low bcrypt cost: logging in is not what is being measured
+        password_hash = bcrypt.generate_password_hash(PASSWORD, rounds=4).decode('utf-8')
+        for number in range(users):
+            user = User(username=f'bench{number:03d}', password_hash=password_hash, role='standard')
+            db.session.add(user)
+            db.session.flush()
+            records = [{
+                'server_name': f'Server {number:03d}-{index:04d}',
+                'dob': date(rng.randint(1955, 1980), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+                'benefit_type': rng.choice(['Aposentadoria', 'Pensão', 'Auxílio']),
+                'gender': rng.choice(['FEMININO', 'MASCULINO']),
+                'salaries': {format_competence(c): a for c, a in career_salaries(competences, rng).items()},
+            } for index in range(simulations_per_user)]
+            specs = [batch.make_spec(record, position) for position, record in enumerate(records, 1)]
+            ids, _ = batch.create_simulations(user, specs, get_factors())
+            db.session.commit()
+            owned[user.username] = ids
+    return owned
+
+
+class TestClientSession:
+    """Requests through the Flask test client (no network, no WSGI server)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class HttpSession:
+    """Requests over HTTP to a running server, without following redirects (like the test client)."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get(self, path):
+        response = self.session.get(self.base_url + path, allow_redirects=False)
+        response.close()
+        return response.status_code
+
+    def post(self, path, data):
+        response = self.session.post(self.base_url + path, data=data, allow_redirects=False)
+        response.close()
+        return response.status_code
+
+
+def start_server(app):
+    """Serves the app from a threaded werkzeug server on a free local port. Returns (server, base URL)."""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        # One access log line per request would swamp the report
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def salary_form(simulation_ids):
+    """{simulation id: form data for calculate_salaries with its whole salary series}."""
+    from app import app, db, Simulation
+    from app.competence import format_competence
+    with app.app_context():
+        forms = {}
+        for simulation_id in simulation_ids:
+            competences, amounts = db.session.get(Simulation, simulation_id).salary_series()
+            forms[simulation_id] = {f'salary_{format_competence(int(c))}': f'{a:.2f}'
+                                    for c, a in zip(competences, amounts)}
+    return forms
+
+
+class Worker:
+    """One simulated user: a logged-in session plus the simulations it owns."""
+
+    def __init__(self, session, simulation_ids, forms, rng):
+        self.session = session
+        self.simulation_ids = simulation_ids
+        self.forms = forms
+        self.rng = rng
+
+    def request(self, endpoint):
+        simulation_id = self.rng.choice(self.simulation_ids)
+        if endpoint == 'dashboard':
+            return self.session.get('/dashboard')
+        if endpoint == 'enter_salaries':
+            return self.session.get(f'/simulation/{simulation_id}/salaries')
+        if endpoint == 'generate_pdf':
+            return self.session.get(f'/simulation/{simulation_id}/pdf')
+        # calculate_salaries: a user correcting a few months and recalculating
+        form = dict(self.forms[simulation_id])
+        for key in self.rng.sample(sorted(form), 3):
+            form[key] = f'{float(form[key]) * self.rng.uniform(0.9, 1.1):.2f}'
+        return self.session.post(f'/simulation/{simulation_id}/calculate', form)
+
+
+def run_endpoint(endpoint, workers, requests_total, warmup):
+    """
+    Sends `requests_total` requests to one endpoint, spread over the workers
+    running at the same time. Returns the endpoint's statistics.
+    """
+    for worker in workers:
+        for _ in range(warmup):
+            worker.request(endpoint)
+
+    latencies = []
+    statuses = {}
+    errors = []
+    remaining = [requests_total]
+    lock = threading.Lock()
+
+    def loop(worker):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status = worker.request(endpoint)
+            except Exception as e:
+                status = type(e).__name__
+                with lock:
+                    errors.append(str(e))
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    failed = sum(n for status, n in statuses.items() if status not in EXPECTED_STATUS[endpoint])
+    return {
+        'requests': len(latencies),
+        'failed': failed,
+        'statuses': {str(status): n for status, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        'seconds': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': round(float(ms.mean()), 2),
+            'p50': round(float(np.percentile(ms, 50)), 2),
+            'p95': round(float(np.percentile(ms, 95)), 2),
+            'p99': round(float(np.percentile(ms, 99)), 2),
+            'max': round(float(ms.max()), 2),
+        },
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def weasyprint_available():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure latency and throughput of the main routes under concurrent load.")
+    parser.add_argument('--users', type=int, default=8, help="Seeded users (default: 8)")
+    parser.add_argument('--simulations', type=int, default=25, help="Full-career simulations per user (default: 25)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Simultaneous clients, one user each (default: 4)")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per endpoint (default: 200)")
+    parser.add_argument('--warmup', type=int, default=2, help="Unmeasured requests per client before each endpoint")
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"Comma-separated endpoints to run (default: {','.join(ENDPOINTS)})")
+    parser.add_argument('--storage', choices=['rows', 'packed'], default='rows',
+                        help="SALARY_STORAGE mode for the seeded simulations and the writes")
+    parser.add_argument('--server', action='store_true',
+                        help="Go through a local threaded WSGI server over HTTP instead of the test client")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for the data and the request mix")
+    parser.add_argument('--output', help="Also write the results as JSON to this file")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch database and PDF cache")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        print(f"Unknown endpoints: {', '.join(unknown)} (known: {', '.join(ENDPOINTS)})")
+        sys.exit(2)
+    if 'generate_pdf' in endpoints and not weasyprint_available():
+        print("WeasyPrint is not installed; skipping generate_pdf.")
+        endpoints.remove('generate_pdf')
+    if args.concurrency > args.users:
+        print(f"--concurrency {args.concurrency} needs as many users; seeding {args.concurrency}.")
+        args.users = args.concurrency
+
+    # The scratch database must be set before the app (and its engine) is created
+    workdir = tempfile.mkdtemp(prefix='benchmark_web_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'benchmark.db')
+    from app import app, db
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['SALARY_STORAGE'] = args.storage
+    app.config['PDF_CACHE_DIR'] = os.path.join(workdir, 'pdf_cache')
+    server = None
+    try:
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+        owned = seed(args.users, args.simulations, rng)
+        print(f"Seeded {args.users} users x {args.simulations} simulations in {time.perf_counter() - started:.1f}s "
+              f"({args.storage} storage, database in {workdir}).")
+
+        if args.server:
+            server, base_url = start_server(app)
+            new_session = lambda: HttpSession(base_url)
+        else:
+            new_session = lambda: TestClientSession(app)
+
+        workers = []
+        for username in sorted(owned)[:args.concurrency]:
+            session = new_session()
+            status = session.post('/login', {'username': username, 'password': PASSWORD})
+            if status != 302:
+                print(f"Login as '{username}' failed (HTTP {status}).")
+                sys.exit(1)
+            workers.append(Worker(session, owned[username], salary_form(owned[username]),
+                                  random.Random(rng.random())))
+
+        results = {
+            'transport': 'http' if args.server else 'test_client',
+            'users': args.users,
+            'simulations_per_user': args.simulations,
+            'concurrency': args.concurrency,
+            'storage': args.storage,
+            'endpoints': {},
+        }
+        print(f"\n{'endpoint':<20}{'req':>6}{'fail':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for endpoint in endpoints:
+            stats = results['endpoints'][endpoint] = run_endpoint(endpoint, workers, args.requests, args.warmup)
+            latency = stats['latency_ms']
+            print(f"{endpoint:<20}{stats['requests']:>6}{stats['failed']:>6}{stats['throughput_rps']:>9.1f}"
+                  f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}")
+            if stats['failed']:
+                detail = f": {stats['first_error']}" if stats['first_error'] else ""
+                print(f"   statuses {stats['statuses']}{detail}")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults written to {args.output}.")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
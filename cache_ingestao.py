@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+import inspect
+import importlib
+
+import numpy as np
+import pandas as pd
+
+from ingestao_paralela import ResultadoArquivo
+
+# Cache persistente da leitura das planilhas. Planilhas publicadas não mudam,
+# então o resultado de cada arquivo é guardado num .npz identificado pelo
+# sha256 do conteúdo e pela versão do parser. Um índice com tamanho e data de
+# modificação de cada caminho evita recalcular o hash de arquivos que não
+# mudaram, de modo que uma execução sem planilhas novas não abre nenhum Excel.
+# Falhas não são guardadas: um arquivo que falhou é lido de novo na próxima vez.
+
+PASTA_CACHE = ".cache_ingestao"
+ARQUIVO_INDICE = "indice.json"
+
+# Incrementar quando o formato do .npz mudar
+VERSAO_CACHE = 2
+
+# Módulos cuja mudança invalida os resultados de qualquer parser
+MODULOS_LEITURA = ("leitor_planilhas", "deteccao_layout")
+
+
+def sha256_arquivo(file_path):
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def versao_parser(funcao):
+    """
+    Identifica o parser pelo nome da função e pelo código-fonte do módulo dela
+    e dos módulos de leitura: qualquer alteração invalida o cache sozinha.
+    """
+    h = hashlib.sha256(f"{VERSAO_CACHE}:{funcao.__qualname__}".encode())
+    modulos = [inspect.getmodule(funcao)] + [importlib.import_module(m) for m in MODULOS_LEITURA]
+    for modulo in modulos:
+        caminho = inspect.getsourcefile(modulo) if modulo is not None else None
+        if caminho:
+            with open(caminho, 'rb') as f:
+                h.update(f.read())
+    return f"{funcao.__name__}-{h.hexdigest()[:12]}"
+
+
+def codificar_valor(valor):
+    """Valor de uma coluna constante em JSON. Timestamps viram {'timestamp': ISO}; outros tipos levantam TypeError."""
+    if isinstance(valor, pd.Timestamp):
+        return {'timestamp': valor.isoformat()}
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    raise TypeError(f"Valor sem representação no cache: {valor!r} ({type(valor).__name__})")
+
+
+def decodificar_valor(valor):
+    return pd.Timestamp(valor['timestamp']) if isinstance(valor, dict) else valor
+
+
+def _mesmo_valor(a, b):
+    return type(a) is type(b) and (a == b or (a != a and b != b))
+
+
+class CacheIngestao:
+    def __init__(self, pasta=PASTA_CACHE):
+        self.pasta = pasta
+        self.caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+        self.indice = self._ler_indice()
+        # Entradas calculadas nesta execução, as únicas que gravar_indice escreve por cima do disco
+        self._novas = set()
+        self._versoes = {}
+
+    def _ler_indice(self):
+        try:
+            with open(self.caminho_indice, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def versao(self, funcao):
+        if funcao not in self._versoes:
+            self._versoes[funcao] = versao_parser(funcao)
+        return self._versoes[funcao]
+
+    def conhece(self, file_path):
+        """True se o caminho já passou pelo cache alguma vez."""
+        return os.path.abspath(file_path) in self.indice
+
+    def hash_arquivo(self, file_path):
+        """sha256 do arquivo, recalculado só se tamanho ou data de modificação mudaram."""
+        chave = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        registro = self.indice.get(chave)
+        if registro and registro[0] == st.st_size and registro[1] == st.st_mtime_ns:
+            return registro[2]
+
+        digest = sha256_arquivo(file_path)
+        self.indice[chave] = [st.st_size, st.st_mtime_ns, digest]
+        self._novas.add(chave)
+        return digest
+
+    def _caminho(self, digest, versao):
+        return os.path.join(self.pasta, versao, f"{digest}.npz")
+
+    def carregar(self, digest, versao, nome_arquivo):
+        """ResultadoArquivo em cache para o conteúdo `digest`, ou None."""
+        try:
+            with np.load(self._caminho(digest, versao), allow_pickle=False) as dados:
+                meta = json.loads(str(dados['meta']))
+                competencias = dados['competencias'].view('datetime64[ns]')
+                fatores = dados['fatores']
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+        if meta['erro'] is not None:
+            # Gravado por uma versão que ainda guardava falhas
+            return None
+
+        # O mesmo conteúdo pode aparecer com outro nome (cópias); o nome é sempre o atual
+        constantes = tuple(
+            (coluna, nome_arquivo if coluna in meta['colunas_nome'] else decodificar_valor(valor))
+            for coluna, valor in meta['constantes']
+        )
+        return ResultadoArquivo(nome_arquivo, competencias, fatores, constantes, None)
+
+    def salvar(self, digest, versao, resultado):
+        """
+        Guarda um resultado bem-sucedido. Devolve False, sem gravar nada, para
+        falhas e para colunas constantes que o JSON não representa ou que não
+        voltariam iguais do cache; o arquivo só fica de fora do cache.
+        """
+        if resultado.erro is not None:
+            return False
+        try:
+            constantes = [[c, codificar_valor(v)] for c, v in resultado.constantes]
+        except TypeError:
+            return False
+        meta = {
+            'constantes': constantes,
+            'colunas_nome': [c for c, v in resultado.constantes if v == resultado.nome_arquivo],
+            'erro': None,
+        }
+        texto = json.dumps(meta)
+        # Um acerto do cache tem que devolver exatamente o que a leitura devolveu
+        lidas = [(c, decodificar_valor(v)) for c, v in json.loads(texto)['constantes']]
+        if len(lidas) != len(resultado.constantes) or not all(
+                ca == cb and _mesmo_valor(va, vb) for (ca, va), (cb, vb) in zip(lidas, resultado.constantes)):
+            return False
+
+        caminho = self._caminho(digest, versao)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        vazio = np.array([], dtype=np.int64)
+        competencias = vazio if resultado.competencias is None else resultado.competencias.view(np.int64)
+        fatores = np.array([], dtype=np.float64) if resultado.fatores is None else resultado.fatores
+
+        # Grava num temporário e renomeia, para nunca deixar um .npz pela metade
+        temporario = caminho + f".{os.getpid()}.tmp.npz"
+        np.savez(temporario, competencias=competencias, fatores=fatores, meta=np.array(texto))
+        os.replace(temporario, caminho)
+        return True
+
+    def gravar_indice(self):
+        """
+        Grava as entradas novas no índice. Outro processador pode ter gravado o
+        mesmo índice enquanto este rodava, então o arquivo é relido e só as
+        entradas calculadas aqui são sobrepostas às dele.
+        """
+        if not self._novas:
+            return
+        os.makedirs(self.pasta, exist_ok=True)
+        indice = self._ler_indice()
+        indice.update({chave: self.indice[chave] for chave in self._novas})
+        temporario = self.caminho_indice + f".{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indice, f)
+        os.replace(temporario, self.caminho_indice)
+        self.indice = indice
+        self._novas = set()
@@ -0,0 +1,169 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Gravação e leitura dos conjuntos de dados do pipeline em Parquet: competência
+# como data nativa (date32), fator como float64 e os nomes de arquivo/mês de
+# referência em dicionário (cada nome é guardado uma vez por bloco, não em toda
+# linha). Quem lê recebe os tipos prontos, sem converter datas e números de
+# texto. O CSV continua disponível como saída opcional, com o mesmo nome base.
+
+COLUNAS_TEXTO = ('mes_referencia_planilha', 'arquivo_origem')
+
+
+def caminho_parquet(caminho):
+    base, _ = os.path.splitext(caminho)
+    return base + ".parquet"
+
+
+def caminho_csv(caminho):
+    base, _ = os.path.splitext(caminho)
+    return base + ".csv"
+
+
+def para_tabela(df):
+    """Converte o DataFrame para uma tabela Arrow com os tipos do pipeline."""
+    df = df.copy()
+    if 'competencia' in df.columns:
+        df['competencia'] = pd.to_datetime(df['competencia'])
+    if 'fator' in df.columns:
+        df['fator'] = df['fator'].astype('float64')
+    for coluna in COLUNAS_TEXTO:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(str).astype('category')
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    if 'competencia' in tabela.column_names:
+        i = tabela.column_names.index('competencia')
+        tabela = tabela.set_column(i, 'competencia', tabela.column('competencia').cast(pa.date32(), safe=False))
+    return tabela
+
+
+def gravar_dados(df, output_file, csv=False):
+    """
+    Grava `df` em Parquet (output_file com extensão .parquet) e, se `csv`
+    for True, também no CSV de mesmo nome. Devolve o caminho do Parquet.
+    """
+    destino = caminho_parquet(output_file)
+    temporario = destino + ".tmp"
+    pq.write_table(para_tabela(df), temporario, compression='zstd')
+    os.replace(temporario, destino)
+    if csv:
+        df.to_csv(caminho_csv(output_file), index=False, encoding='utf-8-sig')
+    return destino
+
+
+class GravadorDados:
+    """
+    Grava um conjunto de dados em partes, com as mesmas regras de gravar_dados:
+    cada gravar(df) vira um row group do Parquet (e linhas a mais no CSV), sem
+    juntar tudo na memória. Os arquivos só aparecem com o nome final no fechar().
+    """
+
+    def __init__(self, output_file, csv=False):
+        self.destino = caminho_parquet(output_file)
+        self.destino_csv = caminho_csv(output_file) if csv else None
+        self._escritor = None
+        self._schema = None
+        self._csv = open(self.destino_csv + ".tmp", 'w', newline='', encoding='utf-8-sig') if csv else None
+        self.linhas = 0
+
+    def gravar(self, df):
+        tabela = para_tabela(df)
+        if self._escritor is None:
+            # Índices de dicionário em int32, para todas as partes terem o mesmo schema
+            self._schema = pa.schema([
+                pa.field(f.name, pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(f.type) else f
+                for f in tabela.schema
+            ])
+            self._escritor = pq.ParquetWriter(self.destino + ".tmp", self._schema, compression='zstd')
+        self._escritor.write_table(tabela.cast(self._schema))
+        if self._csv is not None:
+            df.to_csv(self._csv, index=False, header=self.linhas == 0)
+        self.linhas += len(df)
+
+    def fechar(self):
+        if self._escritor is None:
+            # Nada foi gravado: não cria arquivos vazios
+            if self._csv is not None:
+                self._csv.close()
+                os.remove(self.destino_csv + ".tmp")
+            return None
+        if self._csv is not None:
+            self._csv.close()
+            os.replace(self.destino_csv + ".tmp", self.destino_csv)
+        self._escritor.close()
+        os.replace(self.destino + ".tmp", self.destino)
+        return self.destino
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        if tipo is None:
+            self.fechar()
+            return
+        # Em caso de erro, descarta as partes já gravadas
+        if self._csv is not None:
+            self._csv.close()
+            os.remove(self.destino_csv + ".tmp")
+        if self._escritor is not None:
+            self._escritor.close()
+            os.remove(self.destino + ".tmp")
+
+
+def para_dataframe(tabela):
+    """Tabela Arrow -> DataFrame, com competência em datetime64 e textos como categorias ordenadas."""
+    if 'competencia' in tabela.column_names:
+        i = tabela.column_names.index('competencia')
+        tabela = tabela.set_column(i, 'competencia', tabela.column('competencia').cast(pa.timestamp('ns')))
+    df = tabela.to_pandas()
+    for coluna in COLUNAS_TEXTO:
+        if coluna in df.columns and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # Categorias em ordem alfabética, para sort_values ordenar como texto
+            df[coluna] = df[coluna].cat.set_categories(sorted(df[coluna].cat.categories))
+    return df
+
+
+def filtrar_dataframe(df, filtros):
+    """Aplica filtros no formato do pyarrow ([(coluna, operador, valor), ...], todos com E) a um DataFrame."""
+    mascara = pd.Series(True, index=df.index)
+    for coluna, operador, valor in filtros:
+        serie = df[coluna]
+        if coluna == 'competencia':
+            valor = [pd.Timestamp(v) for v in valor] if operador in ('in', 'not in') else pd.Timestamp(valor)
+        elif operador in ('in', 'not in'):
+            serie = serie.astype(str)
+        if operador == 'in':
+            mascara &= serie.isin(valor)
+        elif operador == 'not in':
+            mascara &= ~serie.isin(valor)
+        else:
+            mascara &= {'==': serie.eq, '!=': serie.ne, '<': serie.lt, '<=': serie.le,
+                        '>': serie.gt, '>=': serie.ge}[operador](valor)
+    return df[mascara]
+
+
+def ler_dados(input_file, colunas=None, filtros=None):
+    """
+    Lê um conjunto de dados do pipeline. Usa o .parquet de mesmo nome se
+    existir (lendo só as `colunas` pedidas); senão, o CSV antigo, com as
+    mesmas conversões de tipo. `filtros` ([(coluna, operador, valor), ...])
+    vai para o leitor do Parquet, que pula os row groups que não podem ter
+    linhas que atendam aos filtros (competência como datetime.date).
+    """
+    parquet = caminho_parquet(input_file)
+    if os.path.exists(parquet):
+        return para_dataframe(pq.read_table(parquet, columns=colunas, filters=filtros or None))
+
+    df = pd.read_csv(caminho_csv(input_file), usecols=colunas)
+    if 'competencia' in df.columns:
+        df['competencia'] = pd.to_datetime(df['competencia'], errors='coerce')
+    if 'fator' in df.columns:
+        df['fator'] = pd.to_numeric(df['fator'], errors='coerce')
+    for coluna in COLUNAS_TEXTO:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(str).astype('category')
+    return filtrar_dataframe(df, filtros) if filtros else df
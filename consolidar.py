@@ -1,55 +1,119 @@
-
 import pandas as pd
 import os
+import heapq
+import argparse
+from itertools import groupby
+from operator import itemgetter
+from colunar import GravadorDados
+from indice_periodos import periodo_arquivo
 
 # Pasta onde os arquivos CSV processados estão salvos
 input_folder = "processados_2015_2025"
 # Arquivo de saída final
-output_file = "dados_completos_planilhas_2015_a_2025.csv"
-
-if not os.path.isdir(input_folder):
-    print(f"Erro: A pasta '{input_folder}' não foi encontrada.")
-    print("Execute a 'ferramenta_assistida.py' primeiro.")
-    exit()
+output_file = "dados_completos_planilhas_2015_a_2025.parquet"
 
-# Lista todos os arquivos CSV na pasta de processados
-csv_files = [f for f in os.listdir(input_folder) if f.endswith(".csv")]
+# Os arquivos são agrupados por publicação (mês e artigo, tirados do nome) e
+# cada publicação é consolidada e gravada de uma vez: os arquivos dela são
+# intercalados por competência (merge de k listas ordenadas) e um índice
+# competência -> linha remove as repetidas. Só uma publicação fica na memória
+# por vez, não importa quantos anos de planilhas existam.
 
-if not csv_files:
-    print("Nenhum arquivo CSV encontrado para consolidar.")
-    exit()
 
-print(f"Consolidando {len(csv_files)} arquivos da pasta '{input_folder}'...")
+def chave_publicacao(nome_arquivo):
+    """(ano, mês, artigo) da publicação do arquivo; nomes não reconhecidos ficam no fim, um por publicação."""
+    periodo = periodo_arquivo(nome_arquivo)
+    if periodo is None:
+        return (1, nome_arquivo)
+    return (0, periodo.ano, periodo.mes, periodo.artigo or '')
 
-all_dataframes = []
 
-for filename in csv_files:
-    filepath = os.path.join(input_folder, filename)
-    try:
-        df = pd.read_csv(filepath)
+def ler_arquivo(filepath):
+    """Lê um CSV processado com os tipos certos, em ordem de competência."""
+    df = pd.read_csv(filepath)
+    if 'arquivo_origem' not in df.columns:
         # Adiciona o nome do arquivo de origem, caso não tenha sido adicionado antes
-        if 'arquivo_origem' not in df.columns:
-            df['arquivo_origem'] = filename
-        all_dataframes.append(df)
-    except Exception as e:
-        print(f"Erro ao ler '{filename}': {e}")
+        df['arquivo_origem'] = os.path.basename(filepath)
+    df['competencia'] = pd.to_datetime(df['competencia'], errors='coerce')
+    df['fator'] = pd.to_numeric(df['fator'], errors='coerce')
+    df = df.dropna(subset=['competencia', 'fator'])
+    return df.sort_values('competencia', kind='stable')
+
+
+def linhas(df):
+    return zip(df['competencia'], df['fator'], df['arquivo_origem'].astype(str))
+
+
+def consolidar_publicacao(filepaths):
+    """
+    Junta os arquivos de uma publicação. Se a mesma competência aparece em
+    mais de um arquivo (cópias, versões -1, -2...), vale o último em ordem de nome.
+    """
+    dataframes = []
+    for filepath in filepaths:
+        try:
+            dataframes.append(ler_arquivo(filepath))
+        except Exception as e:
+            print(f"Erro ao ler '{os.path.basename(filepath)}': {e}")
+
+    # heapq.merge mantém a ordem dos arquivos entre competências iguais: o último sobrescreve
+    por_competencia = {}
+    for competencia, fator, origem in heapq.merge(*(linhas(df) for df in dataframes), key=itemgetter(0)):
+        por_competencia[competencia] = (fator, origem)
+
+    return pd.DataFrame({
+        'competencia': list(por_competencia),
+        'fator': [fator for fator, _ in por_competencia.values()],
+        'arquivo_origem': [origem for _, origem in por_competencia.values()],
+    })
+
+
+def ordenar_arquivos(nomes):
+    """CSVs em ordem de publicação e, dentro dela, de nome (o último vence as repetidas)."""
+    return sorted((f for f in nomes if f.endswith(".csv")), key=lambda f: (chave_publicacao(f), f))
+
+
+def consolidar(pasta, saida, csv_files=None, csv=False):
+    """Consolida os CSVs de `pasta` em `saida`, uma publicação por vez. Devolve (linhas, publicações)."""
+    if csv_files is None:
+        csv_files = ordenar_arquivos(os.listdir(pasta))
+    publicacoes = 0
+    with GravadorDados(saida, csv=csv) as gravador:
+        for _, grupo in groupby(csv_files, key=chave_publicacao):
+            df = consolidar_publicacao([os.path.join(pasta, f) for f in grupo])
+            if not df.empty:
+                gravador.gravar(df)
+                publicacoes += 1
+    return gravador.linhas, publicacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Junta os CSVs da ferramenta assistida num único arquivo.")
+    parser.add_argument('--csv', action='store_true', help="Grava também a saída em CSV, além do Parquet")
+    args = parser.parse_args()
+
+    if not os.path.isdir(input_folder):
+        print(f"Erro: A pasta '{input_folder}' não foi encontrada.")
+        print("Execute a 'ferramenta_assistida.py' primeiro.")
+        exit()
+
+    # Lista todos os arquivos CSV na pasta de processados, agrupados por publicação
+    csv_files = ordenar_arquivos(os.listdir(input_folder))
 
-if not all_dataframes:
-    print("Nenhum dado pôde ser lido para a consolidação.")
-    exit()
+    if not csv_files:
+        print("Nenhum arquivo CSV encontrado para consolidar.")
+        exit()
 
-final_df = pd.concat(all_dataframes, ignore_index=True)
+    print(f"Consolidando {len(csv_files)} arquivos da pasta '{input_folder}'...")
 
-# Garante que a coluna de competência está no formato correto
-final_df['competencia'] = pd.to_datetime(final_df['competencia'], errors='coerce')
+    linhas_gravadas, publicacoes = consolidar(input_folder, output_file, csv_files, csv=args.csv)
 
-# Ordena os dados pela planilha de origem e depois pela data
-final_df.sort_values(by=['arquivo_origem', 'competencia'], inplace=True)
+    if not linhas_gravadas:
+        print("Nenhum dado pôde ser lido para a consolidação.")
+        exit()
 
-# Remove duplicatas baseadas na competência e fator, mantendo a última ocorrência
-final_df.drop_duplicates(subset=['competencia', 'fator'], keep='last', inplace=True)
+    print("\n--- Consolidação Concluída ---")
+    print(f"Total de {linhas_gravadas} linhas únicas de {publicacoes} publicações salvas em '{output_file}'.")
 
-final_df.to_csv(output_file, index=False, encoding='utf-8-sig')
 
-print("\n--- Consolidação Concluída ---")
-print(f"Total de {len(final_df)} linhas únicas salvas em '{output_file}'.")
+if __name__ == '__main__':
+    main()
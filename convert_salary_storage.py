@@ -0,0 +1,90 @@
+import argparse
+from app import app, db
+from app import Simulation, SalaryContribution
+from app.competence import format_competence
+from app.salary_packing import pack_series, unpack_series
+
+# Moves stored salary series between the two storage modes. Run migrate_db.py
+# first, then set SALARY_STORAGE to the same mode so new saves match.
+
+
+def to_packed(batch_size):
+    table = SalaryContribution.__table__
+    converted = 0
+    while True:
+        simulation_ids = db.session.execute(
+            db.select(table.c.simulation_id).distinct().order_by(table.c.simulation_id).limit(batch_size)
+        ).scalars().all()
+        if not simulation_ids:
+            return converted
+
+        series = {simulation_id: {} for simulation_id in simulation_ids}
+        rows = db.session.execute(
+            db.select(table.c.simulation_id, table.c.competence, table.c.amount)
+            .where(table.c.simulation_id.in_(simulation_ids))
+        )
+        for simulation_id, competence, amount in rows:
+            if amount > 0:
+                series[simulation_id][competence] = amount
+
+        packed = []
+        for simulation_id, salaries in series.items():
+            start, data = pack_series(salaries)
+            packed.append({'simulation_id': simulation_id, 'start': start, 'data': data})
+        db.session.execute(
+            Simulation.__table__.update()
+            .where(Simulation.id == db.bindparam('simulation_id'))
+            .values(salary_start=db.bindparam('start'), salary_data=db.bindparam('data')),
+            packed,
+        )
+        db.session.execute(table.delete().where(table.c.simulation_id.in_(simulation_ids)))
+        db.session.commit()
+        converted += len(simulation_ids)
+        print(f" -> {converted} simulations packed")
+
+
+def to_rows(batch_size):
+    converted = 0
+    while True:
+        packed = db.session.execute(
+            db.select(Simulation.id, Simulation.salary_start, Simulation.salary_data)
+            .where(Simulation.salary_data.is_not(None))
+            .order_by(Simulation.id)
+            .limit(batch_size)
+        ).all()
+        if not packed:
+            return converted
+
+        rows = []
+        for simulation_id, start, data in packed:
+            competences, amounts = unpack_series(start, data)
+            rows.extend({'simulation_id': simulation_id, 'month_year': format_competence(c),
+                         'competence': c, 'amount': a}
+                        for c, a in zip(competences.tolist(), amounts.tolist()))
+        if rows:
+            db.session.execute(SalaryContribution.__table__.insert(), rows)
+        db.session.execute(
+            Simulation.__table__.update()
+            .where(Simulation.id.in_([p.id for p in packed]))
+            .values(salary_start=None, salary_data=None)
+        )
+        db.session.commit()
+        converted += len(packed)
+        print(f" -> {converted} simulations unpacked")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored salary series between storage modes.")
+    parser.add_argument('--to', choices=['packed', 'rows'], required=True)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        convert = to_packed if args.to == 'packed' else to_rows
+        print(f"Converting salary series to '{args.to}' storage...")
+        count = convert(args.batch_size)
+        print(f"Done: {count} simulations converted.")
+
+
+if __name__ == '__main__':
+    main()
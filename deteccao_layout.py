@@ -0,0 +1,150 @@
+import warnings
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Detecção automática do layout das planilhas de fatores. A grade bruta de
+# células (pd.read_excel com header=None) é analisada uma única vez: cada
+# coluna é convertida para competências (ano*12 + mês - 1) e para números, e
+# cada par de colunas é pontuado pelo conteúdo. Uma boa coluna de competência
+# avança um mês por linha; uma boa coluna de fator é positiva e diminui à
+# medida que a competência avança.
+
+# Abaixo deste valor o layout é considerado ambíguo
+LIMIAR_CONFIANCA = 0.8
+
+# Linhas de dados necessárias para confiança total na cobertura
+MINIMO_LINHAS = 12
+
+Layout = namedtuple('Layout', ['linha_cabecalho', 'primeira_linha', 'col_competencia', 'col_fator', 'linhas', 'confianca'])
+
+
+def _competencias_coluna(coluna):
+    """Competência (ano*12 + mês - 1) de cada célula que pareça uma data, NaN nas demais."""
+    valores = coluna.to_numpy(dtype=object)
+    resultado = np.full(len(valores), np.nan)
+
+    datas = np.fromiter((isinstance(v, (datetime, date)) for v in valores), dtype=bool, count=len(valores))
+    textos = np.fromiter((isinstance(v, str) for v in valores), dtype=bool, count=len(valores))
+
+    if datas.any():
+        convertidas = pd.to_datetime(pd.Series(valores[datas]), errors='coerce')
+        resultado[datas] = (convertidas.dt.year * 12 + convertidas.dt.month - 1).to_numpy(dtype=float)
+    if textos.any():
+        # Números soltos (ex.: '1,0234') não são datas; só textos com separador de data
+        candidatos = pd.Series(valores[textos]).str.strip()
+        parecem_data = candidatos.str.contains(r'\d{4}|[/-]\d{2}$', regex=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            convertidas = pd.to_datetime(candidatos.where(parecem_data), errors='coerce')
+        resultado[textos] = (convertidas.dt.year * 12 + convertidas.dt.month - 1).to_numpy(dtype=float)
+    return resultado
+
+
+def _numeros_coluna(coluna):
+    """Valor numérico de cada célula que seja número (datas e booleanos ficam NaN)."""
+    valores = coluna.to_numpy(dtype=object)
+    numericos = np.fromiter(
+        (isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_)) for v in valores),
+        dtype=bool, count=len(valores),
+    )
+    resultado = np.full(len(valores), np.nan)
+    resultado[numericos] = valores[numericos].astype(float)
+
+    textos = np.fromiter((isinstance(v, str) for v in valores), dtype=bool, count=len(valores))
+    if textos.any():
+        # Fatores digitados como texto, com vírgula decimal
+        resultado[textos] = pd.to_numeric(
+            pd.Series(valores[textos]).str.strip().str.replace(',', '.', regex=False), errors='coerce'
+        ).to_numpy(dtype=float)
+    return resultado
+
+
+def _fracao(mascara):
+    return float(mascara.mean()) if len(mascara) else 0.0
+
+
+def _pontuar(competencias, fatores):
+    """
+    Pontua um par de colunas (competência, fator). Devolve (confiança, linhas
+    usadas) considerando apenas as linhas em que as duas células são válidas.
+    """
+    validas = ~np.isnan(competencias) & ~np.isnan(fatores)
+    linhas = np.flatnonzero(validas)
+    if len(linhas) < 2:
+        return 0.0, linhas
+
+    comp = competencias[linhas]
+    fat = fatores[linhas]
+    passos = np.diff(comp)
+
+    # Competências mensais em sequência (crescente ou decrescente)
+    sentido = 1 if (passos > 0).sum() >= (passos < 0).sum() else -1
+    mensal = _fracao(passos == sentido)
+    # Fatores positivos que não aumentam conforme a competência avança
+    positivos = _fracao(fat > 0)
+    decrescentes = _fracao(sentido * np.diff(fat) <= 0)
+    # Fatores são fracionários; colunas só de inteiros (numeração, anos) pesam metade
+    fracionarios = 0.5 + 0.5 * min(1.0, 2 * _fracao(fat != np.round(fat)))
+    cobertura = min(1.0, len(linhas) / MINIMO_LINHAS)
+
+    return mensal * positivos * decrescentes * fracionarios * cobertura, linhas
+
+
+def _linha_cabecalho(grade, primeira_linha, colunas):
+    """Última linha com texto, acima dos dados, em alguma das colunas detectadas."""
+    for linha in range(primeira_linha - 1, -1, -1):
+        if any(isinstance(grade.iat[linha, c], str) for c in colunas):
+            return linha
+    return max(primeira_linha - 1, 0)
+
+
+def detectar_layout(grade):
+    """
+    Encontra na grade a melhor combinação de linha de cabeçalho, coluna de
+    competência e coluna de fator. Devolve um Layout com a confiança (0 a 1)
+    ou None se nenhuma coluna tiver competências.
+    """
+    if grade is None or grade.empty:
+        return None
+
+    competencias = {}
+    for c in range(grade.shape[1]):
+        valores = _competencias_coluna(grade.iloc[:, c])
+        if (~np.isnan(valores)).sum() >= 2:
+            competencias[c] = valores
+    if not competencias:
+        return None
+
+    numeros = {c: _numeros_coluna(grade.iloc[:, c]) for c in range(grade.shape[1])}
+
+    melhor = None
+    for col_comp, comp in competencias.items():
+        for col_fator, fat in numeros.items():
+            if col_fator == col_comp:
+                continue
+            confianca, linhas = _pontuar(comp, fat)
+            # Em caso de empate, prefere a coluna de fator mais próxima e à direita da competência
+            chave = (confianca, len(linhas), -abs(col_fator - col_comp), col_fator > col_comp)
+            if melhor is None or chave > melhor[0]:
+                melhor = (chave, col_comp, col_fator, linhas)
+
+    (confianca, *_), col_comp, col_fator, linhas = melhor
+    if len(linhas) == 0:
+        return None
+
+    primeira_linha = int(linhas[0])
+    return Layout(
+        linha_cabecalho=_linha_cabecalho(grade, primeira_linha, (col_comp, col_fator)),
+        primeira_linha=primeira_linha,
+        col_competencia=col_comp,
+        col_fator=col_fator,
+        linhas=len(linhas),
+        confianca=round(confianca, 4),
+    )
+
+
+def layout_confiavel(layout):
+    return layout is not None and layout.confianca >= LIMIAR_CONFIANCA
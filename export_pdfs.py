@@ -0,0 +1,56 @@
+import argparse
+import sys
+import time
+from app import app
+from app import User
+from app import pdf_reports
+from app.factor_cache import factors_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the PDF reports of many simulations into one ZIP file.")
+    parser.add_argument('--username', required=True, help="Owner of the simulations")
+    parser.add_argument('--ids', type=int, nargs='*', default=[], help="Simulation ids to export")
+    parser.add_argument('--server-name', help="Only simulations whose server name contains this text")
+    parser.add_argument('--benefit-type', help="Only simulations with this benefit type")
+    parser.add_argument('--output', default='simulations.zip', help="ZIP file to write")
+    parser.add_argument('--workers', type=int, default=app.config['PDF_RENDER_WORKERS'],
+                        help="Number of render processes")
+    args = parser.parse_args()
+
+    app.config['PDF_RENDER_WORKERS'] = args.workers
+
+    with app.app_context():
+        user = User.query.filter_by(username=args.username).first()
+        if not user:
+            print(f"User '{args.username}' not found.")
+            sys.exit(1)
+
+        simulations = pdf_reports.export_query(user, args.ids, args.server_name, args.benefit_type).all()
+        if not simulations:
+            print("No simulations matched.")
+            sys.exit(1)
+
+        print(f"Exporting {len(simulations)} simulations with {args.workers} workers...")
+        started = time.perf_counter()
+        failed = 0
+
+        def progress(done, total, item):
+            nonlocal failed
+            if item.error is not None:
+                failed += 1
+                status = f"FAILED ({item.error})"
+            else:
+                status = 'cached' if item.cached else f"rendered in {item.seconds:.2f}s"
+            print(f"[{done}/{total}] simulation {item.simulation.id}: {status}")
+
+        with open(args.output, 'wb') as f:
+            for chunk in pdf_reports.stream_export_zip(simulations, factors_for, progress=progress):
+                f.write(chunk)
+
+        elapsed = time.perf_counter() - started
+        print(f"Wrote '{args.output}' in {elapsed:.1f}s ({len(simulations) / elapsed:.1f} files/s, {failed} failed).")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,61 +2,48 @@
 import pandas as pd
 import os
 import re
+from deteccao_layout import detectar_layout, layout_confiavel
+from leitor_planilhas import extrair_dados, limpar_dados, tabela_com_cabecalho
+from ingestao_paralela import compactar, expandir
+from cache_ingestao import CacheIngestao
+from indice_periodos import arquivos_dos_links
 
 def identify_target_files():
     """Identifica os nomes dos arquivos das planilhas de Jan/2015 a Out/2025."""
     try:
-        with open("links.txt", "r") as f:
-            urls = [line.strip() for line in f.readlines()]
+        return arquivos_dos_links("links.txt")
     except FileNotFoundError:
         print("Erro: 'links.txt' não encontrado. Execute 'get_links.py' primeiro.")
         return []
 
-    target_files = []
-    # Itera de 2015 até 2025
-    for year in range(2015, 2026):
-        # Itera de Janeiro a Dezembro
-        for month in range(1, 13):
-            # Para em Outubro de 2025
-            if year == 2025 and month > 10:
-                break
-
-            # Constrói padrões de busca para encontrar o arquivo do mês/ano
-            # Ex: "01_2015", "janeiro_2015", "2015...01"
-            month_str = f"{month:02d}"
-            year_str = str(year)
-            # Padrões mais robustos que procuram pelo ano e mês no URL
-            pattern1 = f"/{year_str}.*_{month_str}"
-            pattern2 = f"_{month_str}.*_{year_str}"
-            pattern3 = f"/{month_str}.*{year_str}"
-
-            found_url = None
-            for url in urls:
-                if re.search(pattern1, url, re.IGNORECASE) or \
-                   re.search(pattern2, url, re.IGNORECASE) or \
-                   re.search(pattern3, url, re.IGNORECASE):
-                    found_url = url
-                    break
-
-            if found_url:
-                target_files.append(os.path.basename(found_url))
-
-    # Remove duplicatas e retorna a lista
-    return sorted(list(set(target_files)))
-
 def processar_planilha_com_ajuda(filepath):
-    """Exibe as primeiras linhas e pede ajuda ao usuário para processar."""
+    """
+    Tenta detectar o layout automaticamente; só exibe as primeiras linhas e pede
+    ajuda ao usuário quando a detecção não é confiável.
+    """
     print("-" * 70)
     print(f"Analisando: {os.path.basename(filepath)}")
 
     try:
         df_preview = pd.read_excel(filepath, header=None)
-        print("Pré-visualização (primeiras 15 linhas):")
-        print(df_preview.head(15).to_string())
     except Exception as e:
         print(f"  -> Erro ao ler o arquivo: {e}")
         return None
 
+    layout = detectar_layout(df_preview)
+    if layout_confiavel(layout):
+        df_processed = extrair_dados(df_preview, layout, os.path.basename(filepath))
+        if df_processed is not None:
+            print(f"  -> Layout detectado automaticamente (cabeçalho na linha {layout.linha_cabecalho}, "
+                  f"confiança {layout.confianca:.2f}).")
+            return df_processed.drop(columns=['arquivo_origem'])
+
+    print("Pré-visualização (primeiras 15 linhas):")
+    print(df_preview.head(15).to_string())
+    if layout is not None:
+        print(f"  -> Sugestão: cabeçalho na linha {layout.linha_cabecalho}, competência na coluna "
+              f"{layout.col_competencia}, fator na coluna {layout.col_fator} (confiança {layout.confianca:.2f}).")
+
     try:
         header_row_str = input("  -> Digite o número da linha do CABEÇALHO (começando em 0), ou 'p' para pular: ")
         if header_row_str.lower() == 'p':
@@ -66,26 +53,23 @@ def processar_planilha_com_ajuda(filepath):
             return None
         header_row = int(header_row_str)
 
-        df = pd.read_excel(filepath, header=header_row)
-        df.columns = [str(col).strip() for col in df.columns]
+        # Reaproveita a grade já lida em vez de abrir a planilha de novo
+        df = tabela_com_cabecalho(df_preview, header_row)
+        if df is None:
+            print("  -> Linha fora da planilha. Pulando.")
+            return None
 
         print("\n  Colunas disponíveis:", df.columns.tolist())
-        competencia_col = input("  -> Copie e cole o nome da coluna de COMPETÊNCIA: ")
-        fator_col = input("  -> Copie e cole o nome da coluna de FATOR: ")
+        competencia_col = input("  -> Copie e cole o nome da coluna de COMPETÊNCIA: ").strip().lower()
+        fator_col = input("  -> Copie e cole o nome da coluna de FATOR: ").strip().lower()
 
         if competencia_col not in df.columns or fator_col not in df.columns:
             print("  -> Nomes de coluna inválidos. Pulando.")
             return None
 
         df_processed = df[[competencia_col, fator_col]].copy()
-        df_processed.rename(columns={competencia_col: 'competencia', fator_col: 'fator'}, inplace=True)
-
-        df_processed.dropna(how='all', inplace=True)
-        df_processed['competencia'] = pd.to_datetime(df_processed['competencia'], errors='coerce')
-        df_processed['fator'] = pd.to_numeric(df_processed['fator'], errors='coerce')
-        df_processed.dropna(subset=['competencia', 'fator'], inplace=True)
-
-        return df_processed
+        df_processed.columns = ['competencia', 'fator']
+        return limpar_dados(df_processed)
 
     except Exception as e:
         print(f"  -> Ocorreu um erro durante o processamento: {e}")
@@ -97,6 +81,10 @@ input_folder = "planilhas"
 output_folder = "processados_2015_2025"
 os.makedirs(output_folder, exist_ok=True)
 
+# Respostas já dadas ficam no cache pelo conteúdo da planilha, não pelo nome
+VERSAO_ASSISTIDA = "assistida-1"
+cache = CacheIngestao()
+
 target_files = identify_target_files()
 processed_count = 0
 
@@ -110,7 +98,25 @@ else:
         # Define o caminho do arquivo de saída
         output_path = os.path.join(output_folder, re.sub(r'\.xlsx?$', '.csv', filename))
 
-        if os.path.exists(output_path):
+        if not os.path.exists(filepath):
+            print(f"  -> Falha no processamento de {filename}: arquivo não encontrado.")
+            continue
+
+        conhecido = cache.conhece(filepath)
+        digest = cache.hash_arquivo(filepath)
+        em_cache = cache.carregar(digest, VERSAO_ASSISTIDA, filename)
+        if em_cache is not None and em_cache.erro is None:
+            if not os.path.exists(output_path):
+                expandir(em_cache).to_csv(output_path, index=False, encoding='utf-8-sig')
+            print(f"Já processado: {filename}")
+            processed_count += 1
+            continue
+
+        if os.path.exists(output_path) and not conhecido:
+            # CSV gerado antes do cache existir: passa a valer para este conteúdo
+            anterior = pd.read_csv(output_path, parse_dates=['competencia'])
+            cache.salvar(digest, VERSAO_ASSISTIDA, compactar(filename, anterior))
+            cache.gravar_indice()
             print(f"Já processado: {filename}")
             processed_count += 1
             continue
@@ -119,12 +125,14 @@ else:
 
         if isinstance(result, pd.DataFrame) and not result.empty:
             result.to_csv(output_path, index=False, encoding='utf-8-sig')
+            cache.salvar(digest, VERSAO_ASSISTIDA, compactar(filename, result))
             print(f"  -> Salvo com sucesso em '{output_path}'")
             processed_count += 1
         elif result == "skipped":
              print(f"  -> {filename} pulado pelo usuário.")
         else:
             print(f"  -> Falha no processamento de {filename}.")
+        cache.gravar_indice()
 
 print("\n--- Ferramenta de Análise Assistida Concluída ---")
 print(f"{processed_count} de {len(target_files)} planilhas alvo foram processadas e salvas em '{output_folder}'.")
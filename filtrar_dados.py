@@ -0,0 +1,188 @@
+import os
+import json
+import argparse
+from datetime import date
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from colunar import ler_dados, gravar_dados, caminho_parquet, caminho_csv
+from indice_periodos import periodo_arquivo, periodo_rotulo, INICIO_PADRAO, FIM_PADRAO
+from armazenamento_particionado import ArmazenamentoParticionado, PASTA_PARTICOES
+
+# Filtro dos dados consolidados por mês de publicação da planilha e por
+# intervalo de competência. O mês de publicação de cada arquivo_origem vem de
+# um índice guardado ao lado dos dados (<nome>.periodos.json), refeito só
+# quando os dados mudam; os filtros vão para o leitor do Parquet, que pula os
+# row groups (ou, no armazenamento particionado, as partições) sem linhas
+# do período pedido.
+
+VERSAO_INDICE = 1
+
+# Publicações usadas pelos scripts: o mesmo período do índice de planilhas
+PERIODO_PADRAO = (INICIO_PADRAO, FIM_PADRAO)
+
+
+def caminho_indice(input_file):
+    base, _ = os.path.splitext(input_file)
+    return base + ".periodos.json"
+
+
+def periodo_origem(arquivo, rotulo=None):
+    """(ano, mes) de publicação de um arquivo: pelo nome e, se não der, pelo mes_referencia_planilha."""
+    periodo = periodo_arquivo(arquivo)
+    if periodo is not None:
+        return periodo.ano, periodo.mes
+    return periodo_rotulo(rotulo) if rotulo is not None else None
+
+
+def _colunas_disponiveis(dados):
+    if dados.endswith('.parquet'):
+        return pq.read_schema(dados).names
+    return pd.read_csv(dados, nrows=0).columns.tolist()
+
+
+def indice_origens(input_file):
+    """
+    {arquivo_origem: (ano, mes) ou None} dos dados em `input_file`. Lido do
+    índice ao lado dos dados; recalculado (lendo só as colunas de texto) se
+    os dados mudaram desde que ele foi gravado.
+    """
+    dados = caminho_parquet(input_file)
+    if not os.path.exists(dados):
+        dados = caminho_csv(input_file)
+    st = os.stat(dados)
+    assinatura = [os.path.basename(dados), st.st_size, st.st_mtime_ns]
+
+    caminho = caminho_indice(input_file)
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            salvo = json.load(f)
+        if salvo.get('versao') == VERSAO_INDICE and salvo.get('dados') == assinatura:
+            return {arquivo: tuple(p) if p else None for arquivo, p in salvo['arquivos'].items()}
+    except (FileNotFoundError, ValueError):
+        pass
+
+    colunas = [c for c in ('arquivo_origem', 'mes_referencia_planilha') if c in _colunas_disponiveis(dados)]
+    origens = ler_dados(input_file, colunas=colunas).astype(str).drop_duplicates()
+    indice = {}
+    for linha in origens.itertuples(index=False):
+        periodo = periodo_origem(linha.arquivo_origem, getattr(linha, 'mes_referencia_planilha', None))
+        if indice.get(linha.arquivo_origem) is None:
+            indice[linha.arquivo_origem] = periodo
+
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_INDICE, 'dados': assinatura,
+                   'arquivos': {a: list(p) if p else None for a, p in sorted(indice.items())}},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+    return indice
+
+
+def filtros_competencia(competencia):
+    """Filtros do pyarrow para um intervalo (inicio, fim) de datas, inclusivo; None deixa o lado aberto."""
+    filtros = []
+    if competencia is not None:
+        inicio, fim = competencia
+        if inicio is not None:
+            filtros.append(('competencia', '>=', inicio))
+        if fim is not None:
+            filtros.append(('competencia', '<=', fim))
+    return filtros
+
+
+def _formatar(periodo):
+    ano, mes = periodo
+    return f"{mes:02d}/{ano}"
+
+
+def _no_periodo(periodo, publicado):
+    return periodo is not None and publicado[0] <= periodo <= publicado[1]
+
+
+def carregar_filtrado(input_file, publicado=None, competencia=None, particionado=False):
+    """
+    Linhas publicadas entre publicado=((ano, mes), (ano, mes)) e com
+    competência em competencia=(date, date), ambos inclusivos e opcionais.
+    Com `particionado`, lê as partições de PASTA_PARTICOES em vez de `input_file`.
+    """
+    filtros = filtros_competencia(competencia)
+
+    if particionado:
+        armazenamento = ArmazenamentoParticionado(PASTA_PARTICOES)
+        meses = None
+        if publicado is not None:
+            # Cada partição é uma publicação: as de fora do período nem são abertas
+            alvos = []
+            for mes_referencia, info in armazenamento.particoes.items():
+                periodos = [periodo_origem(a, mes_referencia) for a in info['arquivos_origem']]
+                if any(_no_periodo(p, publicado) for p in periodos):
+                    alvos.append(mes_referencia)
+            print(f"Encontradas {len(alvos)} publicações entre {_formatar(publicado[0])} e {_formatar(publicado[1])}.")
+            meses = alvos
+        df = armazenamento.carregar(meses, filtros)
+    else:
+        if publicado is not None:
+            indice = indice_origens(input_file)
+            alvos = sorted(a for a, p in indice.items() if _no_periodo(p, publicado))
+            print(f"Encontrados {len(alvos)} arquivos de planilha publicados entre "
+                  f"{_formatar(publicado[0])} e {_formatar(publicado[1])}.")
+            if not alvos:
+                return pd.DataFrame(columns=['competencia', 'fator', 'arquivo_origem'])
+            filtros.append(('arquivo_origem', 'in', alvos))
+        df = ler_dados(input_file, filtros=filtros)
+
+    df = df.dropna(subset=['competencia'])
+    for coluna in ('arquivo_origem', 'mes_referencia_planilha'):
+        if coluna in df.columns and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
+
+
+def filtrar(input_file, output_file, publicado=None, competencia=None, particionado=False, csv=False):
+    """Grava em `output_file` as linhas de carregar_filtrado. Devolve quantas foram gravadas."""
+    df = carregar_filtrado(input_file, publicado, competencia, particionado)
+    if not df.empty:
+        gravar_dados(df, output_file, csv=csv)
+    return len(df)
+
+
+def _ano_mes(texto):
+    ano, mes = texto.split('-')
+    return int(ano), int(mes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtra os dados consolidados por publicação e competência.")
+    parser.add_argument('entrada', help="Arquivo de dados (.parquet ou .csv)")
+    parser.add_argument('saida', help="Arquivo de saída (.parquet)")
+    parser.add_argument('--publicado-de', type=_ano_mes, help="Primeira publicação, AAAA-MM")
+    parser.add_argument('--publicado-ate', type=_ano_mes, help="Última publicação, AAAA-MM")
+    parser.add_argument('--competencia-de', type=date.fromisoformat, help="Primeira competência, AAAA-MM-DD")
+    parser.add_argument('--competencia-ate', type=date.fromisoformat, help="Última competência, AAAA-MM-DD")
+    parser.add_argument('--particionado', action='store_true',
+                        help=f"Lê o armazenamento particionado ('{PASTA_PARTICOES}') em vez da entrada")
+    parser.add_argument('--csv', action='store_true', help="Grava também a saída em CSV, além do Parquet")
+    args = parser.parse_args()
+
+    publicado = None
+    if args.publicado_de or args.publicado_ate:
+        publicado = (args.publicado_de or (0, 0), args.publicado_ate or (9999, 12))
+    competencia = None
+    if args.competencia_de or args.competencia_ate:
+        competencia = (args.competencia_de, args.competencia_ate)
+
+    try:
+        total = filtrar(args.entrada, args.saida, publicado, competencia, args.particionado, args.csv)
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{args.entrada}' não encontrado.")
+        return
+    if total:
+        print(f"{total} linhas salvas em '{args.saida}'.")
+    else:
+        print("Nenhum dado encontrado para o filtro pedido.")
+
+
+if __name__ == '__main__':
+    main()
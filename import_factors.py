@@ -0,0 +1,146 @@
+import argparse
+import re
+import sys
+import time
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import app, db
+from app import CorrectionFactor
+from app.competence import format_competence, to_competence
+from app.factor_cache import bump_factor_version, invalidate
+from app import recalculation
+from colunar import ler_dados
+from import_vintages import parse_vintage
+from indice_periodos import periodo_arquivo
+
+# Refreshes the CorrectionFactor table from one publication in a pipeline
+# output (dados_consolidados.csv or its .parquet), in a single transaction.
+
+DEFAULT_INPUT = 'dados_consolidados.csv'
+
+# Rows per INSERT round trip
+CHUNK_SIZE = 5000
+
+def source_vintage(row_label, source):
+    """Publication month of a source file: its mes_referencia_planilha label, else its name."""
+    vintage = parse_vintage(row_label) if row_label is not None else None
+    if vintage is None:
+        period = periodo_arquivo(source)
+        if period is not None:
+            vintage = to_competence(period.ano, period.mes)
+    return vintage
+
+
+def publications(df, exclude_pattern):
+    """{source file: vintage} for the files in `df`, skipping those matching `exclude_pattern`."""
+    columns = ['arquivo_origem'] + (['mes_referencia_planilha'] if 'mes_referencia_planilha' in df.columns else [])
+    sources = df[columns].astype(str).drop_duplicates('arquivo_origem')
+    result = {}
+    for row in sources.itertuples(index=False):
+        if exclude_pattern and re.search(exclude_pattern, row.arquivo_origem, re.IGNORECASE):
+            continue
+        result[row.arquivo_origem] = source_vintage(getattr(row, 'mes_referencia_planilha', None), row.arquivo_origem)
+    return result
+
+
+def publication_table(df, sources):
+    """{competence: value} of the rows from `sources`; a later file (by name) wins on the same month."""
+    df = df[df['arquivo_origem'].astype(str).isin(sources)].dropna(subset=['competencia', 'fator'])
+    df = df.sort_values(['arquivo_origem', 'competencia'], kind='stable')
+    competences = (df['competencia'].dt.year * 12 + df['competencia'].dt.month - 1).tolist()
+    return dict(zip(competences, df['fator'].astype(float).tolist()))
+
+
+def diff(current, new, replace):
+    """Splits the change into (added, changed, removed) competence lists."""
+    added = sorted(c for c in new if c not in current)
+    changed = sorted(c for c in new if c in current and current[c] != new[c])
+    removed = sorted(c for c in current if c not in new) if replace else []
+    return added, changed, removed
+
+
+def apply(table, competences, removed):
+    """Upserts `competences` from `table` and deletes `removed`, without committing."""
+    target = CorrectionFactor.__table__
+    if removed:
+        db.session.execute(target.delete().where(target.c.competence.in_(removed)))
+    rows = [{'month_year': format_competence(c), 'competence': c, 'value': table[c]} for c in competences]
+    upsert = sqlite_insert(target)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[target.c.competence],
+        set_={'value': upsert.excluded.value, 'month_year': upsert.excluded.month_year},
+    )
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(upsert, rows[start:start + CHUNK_SIZE])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the correction factors of one publication from the pipeline output.")
+    parser.add_argument('input', nargs='?', default=DEFAULT_INPUT,
+                        help=f"Pipeline output, .csv or .parquet (default: {DEFAULT_INPUT})")
+    parser.add_argument('--source', action='append',
+                        help="arquivo_origem to import (repeatable); default: the latest publication")
+    parser.add_argument('--exclude-pattern', default='175|idoso',
+                        help="Skip source files whose name matches this regex (default: the art. 175 tables)")
+    parser.add_argument('--replace', action='store_true',
+                        help="Also delete the months that are not in the publication")
+    parser.add_argument('--dry-run', action='store_true', help="Only print what would change")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        df = ler_dados(args.input)
+    except FileNotFoundError:
+        print(f"Input '{args.input}' not found.")
+        sys.exit(1)
+
+    found = publications(df, args.exclude_pattern)
+    if args.source:
+        missing = [s for s in args.source if s not in found]
+        if missing:
+            print(f"Source files not in '{args.input}': {', '.join(missing)}")
+            sys.exit(1)
+        sources = args.source
+    else:
+        dated = [v for v in found.values() if v is not None]
+        if not dated:
+            print("Could not tell the publication month of any source file; pass --source.")
+            sys.exit(1)
+        latest = max(dated)
+        sources = sorted(s for s, v in found.items() if v == latest)
+        print(f"Latest publication: {format_competence(latest)}")
+    print(f"Importing from {', '.join(sources)}")
+
+    table = publication_table(df, set(sources))
+    with app.app_context():
+        current = dict(db.session.execute(
+            db.select(CorrectionFactor.competence, CorrectionFactor.value)
+        ).all())
+        added, changed, removed = diff(current, table, args.replace)
+
+        for c in changed:
+            print(f"  ~ {format_competence(c)}: {current[c]} -> {table[c]}")
+        for c in removed:
+            print(f"  - {format_competence(c)}: {current[c]}")
+        if added:
+            print(f"  + {len(added)} new months ({format_competence(added[0])} .. {format_competence(added[-1])})")
+        print(f"{len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+              f"{len(table) - len(added) - len(changed)} unchanged.")
+
+        if args.dry_run or not (added or changed or removed):
+            return
+
+        apply(table, added + changed, removed)
+        bump_factor_version()
+        db.session.commit()
+        invalidate()
+        print(f"Factor table updated in {time.perf_counter() - started:.3f}s.")
+
+        # Same follow-up as an edit in the admin pages, but run here before exiting;
+        # added months count too, since a month without a factor is calculated with 1.0
+        recalculation.recalculate_months({format_competence(c) for c in added + changed + removed})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import sys
+import time
+
+from app import app, db
+from app import VintageFactor
+from app.competence import format_competence, to_competence
+from app.factor_cache import bump_factor_version, invalidate
+from app import recalculation
+from armazenamento_particionado import ArmazenamentoParticionado, PASTA_PARTICOES
+from colunar import ler_dados
+from indice_periodos import periodo_rotulo
+
+# Loads every factor table published in the spreadsheets into VintageFactor,
+# one vintage per mes_referencia_planilha ('Outubro/2020' -> out/20).
+
+DEFAULT_INPUT = 'dados_completos_automatico.parquet'
+
+# Rows per INSERT round trip
+CHUNK_SIZE = 5000
+
+def parse_vintage(label):
+    """Turns a spreadsheet label such as 'MARÇO/2016' into a competence, or None if it isn't one."""
+    period = periodo_rotulo(label)
+    return None if period is None else to_competence(*period)
+
+
+def load_tables(df, exclude_pattern):
+    """
+    Groups the pipeline rows into {vintage: {competence: value}}. Returns the
+    tables, the skipped labels and how many (vintage, competence) pairs had
+    different values in different files (the last file by name wins).
+    """
+    df = df[['competencia', 'fator', 'mes_referencia_planilha', 'arquivo_origem']].dropna().astype(
+        {'mes_referencia_planilha': str, 'arquivo_origem': str})
+    if exclude_pattern:
+        df = df[~df['arquivo_origem'].str.contains(exclude_pattern, case=False, regex=True)]
+    df = df.sort_values(['arquivo_origem', 'competencia'], kind='stable')
+
+    vintages = {label: parse_vintage(label) for label in df['mes_referencia_planilha'].unique()}
+    skipped = sorted(label for label, vintage in vintages.items() if vintage is None)
+
+    competences = (df['competencia'].dt.year * 12 + df['competencia'].dt.month - 1).tolist()
+    tables = {}
+    conflicts = 0
+    for label, competence, value in zip(df['mes_referencia_planilha'].tolist(), competences, df['fator'].tolist()):
+        vintage = vintages[label]
+        if vintage is None:
+            continue
+        table = tables.setdefault(vintage, {})
+        previous = table.get(competence)
+        if previous is not None and previous != value:
+            conflicts += 1
+        table[competence] = value
+    return tables, skipped, conflicts
+
+
+def store_tables(tables):
+    """Replaces the stored rows of every vintage in `tables`, all in the current transaction."""
+    db.session.execute(db.delete(VintageFactor).where(VintageFactor.vintage.in_(list(tables))))
+    rows = [{'vintage': vintage, 'competence': competence, 'value': value}
+            for vintage, table in tables.items()
+            for competence, value in table.items()]
+    insert = VintageFactor.__table__.insert()
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert, rows[start:start + CHUNK_SIZE])
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the published factor tables (vintages) from the pipeline output.")
+    parser.add_argument('--input', default=DEFAULT_INPUT,
+                        help="Consolidated pipeline file (.parquet or .csv) with mes_referencia_planilha")
+    parser.add_argument('--partitioned', action='store_true',
+                        help=f"Read the per-publication partitions in {PASTA_PARTICOES}/ instead of --input")
+    parser.add_argument('--exclude-pattern', default='175|idoso',
+                        help="Skip source files whose name matches this regex (default: the art. 175 tables)")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be imported without saving")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.partitioned:
+        df = ArmazenamentoParticionado().carregar()
+    else:
+        try:
+            df = ler_dados(args.input)
+        except FileNotFoundError:
+            print(f"Input '{args.input}' not found.")
+            sys.exit(1)
+
+    tables, skipped, conflicts = load_tables(df, args.exclude_pattern)
+    print(f"Read {len(df)} rows into {len(tables)} vintages in {time.perf_counter() - started:.2f}s.")
+    for label in skipped:
+        print(f" -> Skipping '{label}': not a month/year label")
+    if conflicts:
+        print(f" -> {conflicts} months had different values in different files; kept the last file's value")
+    if not tables:
+        sys.exit(1)
+
+    first, last = min(tables), max(tables)
+    print(f"Vintages {format_competence(first)} .. {format_competence(last)}")
+    if args.dry_run:
+        return
+
+    with app.app_context():
+        count = store_tables(tables)
+        bump_factor_version()
+        db.session.commit()
+        invalidate()
+        print(f"Stored {count} factors in {time.perf_counter() - started:.2f}s.")
+        # Simulations pinned to a re-imported vintage pick up its new values
+        recalculation.recalculate_vintages(tables)
+
+
+if __name__ == '__main__':
+    main()
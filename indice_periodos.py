@@ -0,0 +1,100 @@
+import os
+import re
+import unicodedata
+from collections import namedtuple
+
+# Identificação do mês de publicação (e do artigo, quando aparece) pelo nome
+# do arquivo de cada planilha. Os padrões são compilados uma única vez e cada
+# nome é analisado uma vez só; o índice resultante, (ano, mes) -> arquivos, é
+# o que os scripts consultam para saber quais planilhas pertencem a um período.
+
+Periodo = namedtuple('Periodo', ['ano', 'mes', 'artigo'])
+
+# Período das planilhas de referência usadas pelos scripts de 2015 a 2025
+INICIO_PADRAO = (2015, 1)
+FIM_PADRAO = (2025, 10)
+
+MESES = ('janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho',
+         'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro')
+
+# Famílias de nomes encontradas no links.txt, da mais específica para a mais genérica
+_PADROES = (
+    # benatual33-18.08.xlsx, benatual33a_17.09.xlsx, benatual33-19.03b.xlsx (AA.MM)
+    ('aamm', re.compile(r'benatual(\d+)a?[-_](\d{2})\.(\d{2})(?!\d)')),
+    # 3a_120315-164228-888.xls: data e hora da publicação (AAMMDD-HHMMSS)
+    ('carimbo', re.compile(r'^\d+a_(\d{2})(\d{2})\d{2}-\d{6}-\d+')),
+    # 01a_2015a_arta_33.xlsx, 10_2020_art_175_idoso_gab-1.xlsx, fatores_de_atualizacao___08_2023_art__33.xlsx
+    ('mmaaaa', re.compile(r'(?<!\d)(\d{2})a?[-_]+(\d{4})(?!\d)')),
+    # maio2016a_arta_33.xlsx, indice-...-art-33-fevereiro-2019.xlsx
+    ('nome', re.compile(r'(' + '|'.join(MESES) + r')[-_]*(\d{4})(?!\d)')),
+)
+
+_ARTIGO = re.compile(r'(?:art|benatual)a?[-_]*(33|175)(?!\d)')
+
+
+def _sem_acentos(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().lower()
+
+
+def _normalizar(nome):
+    return _sem_acentos(os.path.basename(nome))
+
+
+def periodo_arquivo(nome):
+    """Periodo(ano, mes, artigo) de um nome de arquivo ou URL, ou None se não for reconhecido."""
+    nome = _normalizar(nome)
+    artigo = _ARTIGO.search(nome)
+    artigo = artigo.group(1) if artigo else None
+
+    for familia, padrao in _PADROES:
+        encontrado = padrao.search(nome)
+        if not encontrado:
+            continue
+        if familia == 'aamm':
+            artigo = encontrado.group(1)
+            ano, mes = 2000 + int(encontrado.group(2)), int(encontrado.group(3))
+        elif familia == 'carimbo':
+            ano, mes = 2000 + int(encontrado.group(1)), int(encontrado.group(2))
+        elif familia == 'mmaaaa':
+            mes, ano = int(encontrado.group(1)), int(encontrado.group(2))
+        else:
+            mes, ano = MESES.index(encontrado.group(1)) + 1, int(encontrado.group(2))
+        if 1 <= mes <= 12:
+            return Periodo(ano, mes, artigo)
+    return None
+
+
+_ROTULO = re.compile(r'(' + '|'.join(m[:3] for m in MESES) + r')[a-z]*\s*/\s*(\d{4})')
+
+
+def periodo_rotulo(rotulo):
+    """(ano, mes) de um mes_referencia_planilha como 'MARÇO/2016' ou 'Fevereiri/2017', ou None."""
+    encontrado = _ROTULO.search(_sem_acentos(str(rotulo)))
+    if not encontrado:
+        return None
+    return int(encontrado.group(2)), [m[:3] for m in MESES].index(encontrado.group(1)) + 1
+
+
+def indice_periodos(nomes):
+    """Índice {(ano, mes): [nomes]} dos arquivos reconhecidos, cada lista em ordem alfabética."""
+    indice = {}
+    for nome in nomes:
+        periodo = periodo_arquivo(nome)
+        if periodo is not None:
+            indice.setdefault((periodo.ano, periodo.mes), []).append(nome)
+    for lista in indice.values():
+        lista.sort()
+    return indice
+
+
+def arquivos_do_periodo(nomes, inicio=INICIO_PADRAO, fim=FIM_PADRAO):
+    """Nomes de arquivo (sem o caminho) publicados entre `inicio` e `fim`, inclusive, sem repetição."""
+    indice = indice_periodos({os.path.basename(nome) for nome in nomes})
+    return sorted(nome for periodo, lista in indice.items() if inicio <= periodo <= fim for nome in lista)
+
+
+def arquivos_dos_links(arquivo="links.txt", inicio=INICIO_PADRAO, fim=FIM_PADRAO):
+    """Como arquivos_do_periodo, para os URLs do links.txt. Levanta FileNotFoundError se ele não existir."""
+    with open(arquivo, "r") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    return arquivos_do_periodo(urls, inicio, fim)
@@ -0,0 +1,139 @@
+import os
+import argparse
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Ingestão paralela das planilhas: os arquivos são distribuídos entre os
+# processos de um ProcessPoolExecutor (a leitura do Excel é limitada pela CPU)
+# e cada processo devolve um resultado compacto por arquivo, só com arrays
+# numpy e metadados, em vez de um DataFrame inteiro. O processo principal
+# junta os resultados sempre na ordem dos nomes de arquivo, então a saída
+# não depende de qual processo terminou primeiro.
+
+# Resultado compacto de um arquivo: `constantes` guarda as colunas que têm o
+# mesmo valor em todas as linhas (arquivo_origem, mes_referencia_planilha...)
+ResultadoArquivo = namedtuple('ResultadoArquivo', ['nome_arquivo', 'competencias', 'fatores', 'constantes', 'erro'])
+
+
+def _valor_nativo(valor):
+    # Escalares numpy viram tipos do Python, e datas viram pd.Timestamp, para o
+    # resultado ser o mesmo vindo da leitura ou do cache
+    if isinstance(valor, (np.datetime64, datetime)):
+        return pd.Timestamp(valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def compactar(nome_arquivo, df):
+    """Converte o DataFrame de um arquivo em arrays (competência, fator) mais as colunas constantes."""
+    constantes = []
+    for coluna in df.columns:
+        if coluna in ('competencia', 'fator'):
+            continue
+        valores = df[coluna].unique()
+        if len(valores) > 1:
+            raise ValueError(f"Coluna '{coluna}' não é constante no arquivo")
+        constantes.append((coluna, _valor_nativo(valores[0]) if len(valores) else None))
+    return ResultadoArquivo(
+        nome_arquivo=nome_arquivo,
+        competencias=df['competencia'].to_numpy(dtype='datetime64[ns]'),
+        fatores=df['fator'].to_numpy(dtype=np.float64),
+        constantes=tuple(constantes),
+        erro=None,
+    )
+
+
+def expandir(resultado):
+    """Reconstrói o DataFrame de um ResultadoArquivo, com as colunas na ordem original."""
+    df = pd.DataFrame({'competencia': resultado.competencias, 'fator': resultado.fatores})
+    for coluna, valor in resultado.constantes:
+        df[coluna] = valor
+    return df
+
+
+def _processar(funcao, file_path):
+    """Executado em cada processo: aplica `funcao` a um arquivo e compacta o resultado."""
+    nome_arquivo = os.path.basename(file_path)
+    try:
+        df = funcao(file_path)
+        if df is None or df.empty:
+            return ResultadoArquivo(nome_arquivo, None, None, (), "nenhum dado extraído")
+        return compactar(nome_arquivo, df)
+    except Exception as e:
+        return ResultadoArquivo(nome_arquivo, None, None, (), str(e))
+
+
+def _executar(file_paths, funcao, workers):
+    if workers == 1 or len(file_paths) <= 1:
+        return [_processar(funcao, file_path) for file_path in file_paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map devolve os resultados na ordem de entrada, não na de término
+        chunksize = max(1, len(file_paths) // (workers * 4))
+        return list(executor.map(_processar, [funcao] * len(file_paths), file_paths, chunksize=chunksize))
+
+
+def processar_arquivos(file_paths, funcao, workers=None, cache=None):
+    """
+    Aplica `funcao` (caminho -> DataFrame ou None; precisa ser uma função de
+    módulo, para poder ser enviada aos processos) a todos os arquivos.
+    Devolve (dataframes, arquivos_com_falha), ambos na ordem dos nomes de arquivo.
+    Com workers=1 tudo roda no próprio processo, sem pool. Com um
+    CacheIngestao, só os arquivos novos ou modificados são lidos.
+    """
+    file_paths = sorted(file_paths, key=os.path.basename)
+    workers = workers or os.cpu_count() or 1
+
+    resultados = {}
+    pendentes = file_paths
+    if cache is not None:
+        versao = cache.versao(funcao)
+        digests = {file_path: cache.hash_arquivo(file_path) for file_path in file_paths}
+        pendentes = []
+        for file_path in file_paths:
+            resultado = cache.carregar(digests[file_path], versao, os.path.basename(file_path))
+            if resultado is None:
+                pendentes.append(file_path)
+            else:
+                resultados[file_path] = resultado
+
+    for file_path, resultado in zip(pendentes, _executar(pendentes, funcao, workers)):
+        resultados[file_path] = resultado
+        if cache is not None:
+            cache.salvar(digests[file_path], versao, resultado)
+    if cache is not None:
+        cache.gravar_indice()
+
+    dataframes = []
+    falhas = []
+    for file_path in file_paths:
+        resultado = resultados[file_path]
+        if resultado.erro is None:
+            dataframes.append(expandir(resultado))
+        else:
+            falhas.append(resultado.nome_arquivo)
+    return dataframes, falhas
+
+
+def registrar_falhas(falhas, error_log_file):
+    """Grava um nome de arquivo por linha, como o processing_errors.log sempre teve."""
+    if falhas:
+        with open(error_log_file, "w") as f:
+            for name in falhas:
+                f.write(f"{name}\n")
+
+
+def argumentos_ingestao(descricao):
+    """Lê as opções --workers, --sem-cache e --csv comuns aos processadores."""
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs; 1 = sem paralelismo)")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Relê todas as planilhas, ignorando o cache em .cache_ingestao/")
+    parser.add_argument('--csv', action='store_true',
+                        help="Grava também a saída em CSV, além do Parquet")
+    return parser.parse_args()
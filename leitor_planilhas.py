@@ -0,0 +1,109 @@
+import os
+import pandas as pd
+from deteccao_layout import detectar_layout, layout_confiavel
+
+# Leitura de planilhas em uma única passagem: cada arquivo é lido do disco
+# uma só vez como grade bruta de células (header=None) e todas as estratégias
+# de cabeçalho/colunas são avaliadas sobre essa grade em memória. O layout
+# detectado automaticamente (deteccao_layout) é tentado antes delas.
+
+
+def ler_grade(file_path):
+    """Lê a primeira aba da planilha inteira, sem cabeçalho."""
+    return pd.read_excel(file_path, header=None)
+
+
+def normalizar_nome(nome):
+    return str(nome).strip().lower().replace('\n', ' ')
+
+
+def nomes_colunas(linha):
+    """
+    Reproduz os nomes que pd.read_excel(header=n) daria às colunas (células
+    vazias viram 'Unnamed: i', repetidos ganham '.1', '.2'...), já normalizados.
+    """
+    nomes = []
+    vistos = {}
+    for i, valor in enumerate(linha):
+        nome = f"Unnamed: {i}" if pd.isna(valor) else str(valor)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(normalizar_nome(nome))
+    return nomes
+
+
+def tabela_com_cabecalho(grade, header_row):
+    """Equivalente em memória a pd.read_excel(file_path, header=header_row)."""
+    if header_row >= len(grade):
+        return None
+    df = grade.iloc[header_row + 1:].copy()
+    df.columns = nomes_colunas(grade.iloc[header_row].tolist())
+    return df
+
+
+def limpar_dados(df):
+    """Remove linhas vazias e converte competência/fator, descartando o que não converter."""
+    df = df.dropna(how='all')
+    df['competencia'] = pd.to_datetime(df['competencia'], errors='coerce')
+    df['fator'] = pd.to_numeric(df['fator'], errors='coerce')
+    return df.dropna(subset=['competencia', 'fator'])
+
+
+def aplicar_estrategia(grade, strategy, nome_arquivo):
+    """Tenta extrair competência/fator da grade com uma estratégia (header_row, col_map)."""
+    header_row, col_map = strategy
+    try:
+        df = tabela_com_cabecalho(grade, header_row)
+        if df is None or not all(k in df.columns for k in col_map.keys()):
+            return None
+
+        df = df[list(col_map.keys())].rename(columns=col_map)
+        df = limpar_dados(df)
+
+        if not df.empty:
+            df['arquivo_origem'] = nome_arquivo
+            return df.reset_index(drop=True)
+    except Exception:
+        return None
+    return None
+
+
+def extrair_dados(grade, layout, nome_arquivo):
+    """Extrai competência/fator da grade nas colunas de um Layout detectado."""
+    df = grade.iloc[layout.primeira_linha:, [layout.col_competencia, layout.col_fator]].copy()
+    df.columns = ['competencia', 'fator']
+    df = limpar_dados(df)
+    if df.empty:
+        return None
+    df['arquivo_origem'] = nome_arquivo
+    return df.reset_index(drop=True)
+
+
+def processar_com_estrategias(file_path, strategies, detectar=True):
+    """
+    Lê a planilha uma vez e extrai os dados pelo layout detectado
+    automaticamente; se a detecção não for confiável, devolve o resultado da
+    primeira estratégia que funcionar. None se nada funcionar (ou se o arquivo
+    não puder ser lido).
+    """
+    try:
+        grade = ler_grade(file_path)
+    except Exception:
+        return None
+
+    nome_arquivo = os.path.basename(file_path)
+    if detectar:
+        layout = detectar_layout(grade)
+        if layout_confiavel(layout):
+            result_df = extrair_dados(grade, layout, nome_arquivo)
+            if result_df is not None:
+                return result_df
+
+    for strategy in strategies:
+        result_df = aplicar_estrategia(grade, strategy, nome_arquivo)
+        if result_df is not None:
+            return result_df
+    return None
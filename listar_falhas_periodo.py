@@ -1,47 +1,14 @@
 
-import os
-import re
+from indice_periodos import arquivos_dos_links
 
 def identify_target_files():
     """Identifica os nomes dos arquivos das planilhas de Jan/2015 a Out/2025."""
     try:
-        with open("links.txt", "r") as f:
-            urls = [line.strip() for line in f.readlines()]
+        return arquivos_dos_links("links.txt")
     except FileNotFoundError:
         print("Erro: 'links.txt' não encontrado.")
         return []
 
-    target_files = set()
-    for year in range(2015, 2026):
-        for month in range(1, 13):
-            if year == 2025 and month > 10:
-                break
-
-            month_str = f"{month:02d}"
-            year_str = str(year)
-
-            # Padrões de busca melhorados
-            patterns = [
-                re.compile(f"_{month_str}_{year_str}"),
-                re.compile(f"-{month_str}-{year_str}"),
-                re.compile(f"/{year_str}/.*{month_str}"),
-                re.compile(f"/{year_str}/.*{month:01d}"), # para meses sem zero à esquerda
-            ]
-
-            found_url = None
-            for url in urls:
-                # Extrai o nome do arquivo do URL para a correspondência
-                filename_from_url = os.path.basename(url)
-                # Tenta corresponder o ano e o mês de forma mais explícita
-                if (year_str in filename_from_url) and (f"_{month_str}" in filename_from_url or f"-{month_str}" in filename_from_url or f".{month_str}" in filename_from_url):
-                     # Regra especial para 2017, onde os nomes eram "benatual33a_17.09"
-                    if year_str == '2017' and f".{month_str}" in filename_from_url:
-                        target_files.add(filename_from_url)
-                    elif year_str != '2017':
-                         target_files.add(filename_from_url)
-
-    return sorted(list(target_files))
-
 
 # 1. Obter a lista de arquivos de planilhas que falharam
 try:
@@ -0,0 +1,152 @@
+from sqlalchemy import inspect, text
+from app import app, db
+from app.competence import parse_month_year, format_competence
+
+# Brings an existing site.db up to date with the current models.
+# Every step checks the schema first, so the script is safe to run again.
+
+
+def column_names(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def add_column(table, column, ddl):
+    if column not in column_names(table):
+        print(f" -> Adding {table}.{column}")
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def fill_competence(table, unique_within=()):
+    """
+    Populates the competence column from the 'jul/94' strings already stored
+    and rewrites those strings in the canonical form ('sep/25' -> 'set/25'),
+    the one new rows are written with. Where two spellings of a month meet
+    within `unique_within`, only the newest row is kept.
+    """
+    month_years = db.session.execute(text(f"SELECT DISTINCT month_year FROM {table}")).scalars().all()
+    params = []
+    for month_year in month_years:
+        try:
+            competence = parse_month_year(month_year)
+        except ValueError:
+            print(f" -> Skipping unrecognized month '{month_year}' in {table}")
+            continue
+        params.append({'month_year': month_year, 'competence': competence,
+                       'canonical': format_competence(competence)})
+    if not params:
+        return
+
+    db.session.execute(text("DROP TABLE IF EXISTS temp.month_map"))
+    db.session.execute(text("CREATE TEMP TABLE month_map (month_year TEXT PRIMARY KEY, competence INTEGER, canonical TEXT)"))
+    db.session.execute(text("INSERT INTO month_map VALUES (:month_year, :competence, :canonical)"), params)
+
+    group_by = ', '.join([*(f"t.{column}" for column in unique_within), 'm.competence'])
+    deleted = db.session.execute(text(
+        f"DELETE FROM {table} WHERE month_year IN (SELECT month_year FROM month_map) AND id NOT IN ("
+        f"SELECT MAX(t.id) FROM {table} t JOIN month_map m ON m.month_year = t.month_year GROUP BY {group_by})"
+    )).rowcount
+    if deleted:
+        print(f" -> Removed {deleted} rows repeating a month in {table}")
+
+    updated = db.session.execute(text(
+        f"UPDATE {table} SET "
+        f"competence = (SELECT competence FROM month_map m WHERE m.month_year = {table}.month_year), "
+        f"month_year = (SELECT canonical FROM month_map m WHERE m.month_year = {table}.month_year) "
+        f"WHERE month_year IN (SELECT month_year FROM month_map) "
+        f"AND (competence IS NULL OR month_year NOT IN (SELECT canonical FROM month_map))"
+    )).rowcount
+    db.session.execute(text("DROP TABLE month_map"))
+    if updated:
+        print(f" -> Filled competence and month spelling for {updated} rows in {table}")
+
+
+def migrate_competence():
+    add_column('correction_factor', 'competence', 'INTEGER')
+    add_column('salary_contribution', 'competence', 'INTEGER')
+    fill_competence('correction_factor')
+    fill_competence('salary_contribution', unique_within=('simulation_id',))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_correction_factor_competence "
+        "ON correction_factor (competence)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_salary_contribution_competence "
+        "ON salary_contribution (competence)"
+    ))
+
+
+def migrate_factor_version():
+    add_column('simulation', 'factor_version', 'INTEGER')
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_salary_contribution_month_year "
+        "ON salary_contribution (month_year)"
+    ))
+
+
+def migrate_salary_unique_month():
+    # Keep only the newest row of any duplicated (simulation, month) pair
+    db.session.execute(text(
+        "DELETE FROM salary_contribution WHERE id NOT IN ("
+        "SELECT MAX(id) FROM salary_contribution GROUP BY simulation_id, month_year)"
+    ))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_salary_contribution_simulation_month "
+        "ON salary_contribution (simulation_id, month_year)"
+    ))
+
+
+def migrate_packed_salaries():
+    # Columns only; existing series are converted with convert_salary_storage.py
+    add_column('simulation', 'salary_start', 'INTEGER')
+    add_column('simulation', 'salary_data', 'BLOB')
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_simulation_salary_start ON simulation (salary_start)"
+    ))
+
+
+def migrate_dashboard_index():
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_simulation_user_created "
+        "ON simulation (user_id, created_at, id)"
+    ))
+
+
+def migrate_created_at_format():
+    # Rows from the old CURRENT_TIMESTAMP default have no fraction; the
+    # dashboard cursor compares against the '%Y-%m-%d %H:%M:%S.%f' text
+    updated = db.session.execute(text(
+        "UPDATE simulation SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    )).rowcount
+    if updated:
+        print(f" -> Added microseconds to created_at of {updated} simulations")
+
+
+def migrate_reference_vintage():
+    # The vintage_factor table itself comes from create_all()
+    add_column('simulation', 'reference_vintage', 'INTEGER')
+
+
+MIGRATIONS = [
+    ('competence', migrate_competence),
+    ('factor_version', migrate_factor_version),
+    ('salary_unique_month', migrate_salary_unique_month),
+    ('packed_salaries', migrate_packed_salaries),
+    ('dashboard_index', migrate_dashboard_index),
+    ('created_at_format', migrate_created_at_format),
+    ('reference_vintage', migrate_reference_vintage),
+]
+
+
+def main():
+    with app.app_context():
+        # New tables are created directly; the steps below only alter existing ones
+        db.create_all()
+        for name, step in MIGRATIONS:
+            print(f"Applying '{name}'...")
+            step()
+            db.session.commit()
+        print("Database is up to date.")
+
+
+if __name__ == '__main__':
+    main()
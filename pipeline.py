@@ -0,0 +1,376 @@
+import os
+import ast
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Executa as etapas do INSTRUCOES.md como um grafo de dependências. Cada etapa
+# declara os arquivos (ou pastas) que lê e que grava; uma etapa depende das
+# que gravam as suas entradas. A impressão digital de uma etapa junta o
+# sha256 das entradas, o código-fonte do script e dos módulos locais que ele
+# importa, e os argumentos; se for a mesma da última execução bem-sucedida e
+# as saídas continuarem como ficaram, a etapa é pulada. Etapas independentes
+# rodam ao mesmo tempo, cada uma num subprocesso, com a saída guardada em
+# .pipeline_logs/<etapa>.log; só as que declaram um mesmo recurso (os
+# processadores, que gravam no mesmo .cache_ingestao) esperam uma pela outra.
+
+ARQUIVO_ESTADO = ".pipeline_estado.json"
+PASTA_LOGS = ".pipeline_logs"
+VERSAO_ESTADO = 1
+
+PASTA_RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# `remota`: o resultado depende do site, não dos arquivos locais, então a
+# etapa roda sempre (fora do modo --offline); o próprio download só traz o
+# que mudou. `aceita_csv`/`aceita_workers`: repassa --csv/--workers ao script.
+# `recursos`: pastas que a etapa altera sem que sejam saídas dela; duas etapas
+# com um recurso em comum nunca rodam ao mesmo tempo.
+Etapa = namedtuple('Etapa', ['nome', 'script', 'entradas', 'saidas', 'remota', 'aceita_csv', 'aceita_workers',
+                             'recursos'],
+                   defaults=[False, False, False, ()])
+
+# A ferramenta_assistida.py fica de fora por ser interativa: a etapa
+# 'consolidar' usa o que ela já deixou em processados_2015_2025/.
+# processador_dedicado.py e consolidar.py gravam o mesmo arquivo, então só o
+# caminho do INSTRUCOES.md (consolidar) está aqui.
+ETAPAS = (
+    Etapa('links', 'get_links.py', (), ('links.txt',), remota=True),
+    Etapa('download', 'baixar_planilhas.py', ('links.txt',), ('planilhas',), remota=True),
+    Etapa('processador_final', 'processador_final.py', ('planilhas',),
+          ('dados_consolidados.parquet',), aceita_csv=True, aceita_workers=True, recursos=('.cache_ingestao',)),
+    Etapa('processador_inteligente', 'processador_inteligente.py', ('planilhas',),
+          ('dados_completos_automatico.parquet',), aceita_csv=True, aceita_workers=True,
+          recursos=('.cache_ingestao',)),
+    Etapa('consolidar', 'consolidar.py', ('processados_2015_2025',),
+          ('dados_completos_planilhas_2015_a_2025.parquet',), aceita_csv=True),
+    Etapa('filtrar_por_data', 'filtrar_por_data.py', ('dados_consolidados.parquet',),
+          ('dados_2015_a_2025.parquet',), aceita_csv=True),
+    Etapa('filtrar_final', 'filtrar_final.py', ('dados_completos_automatico.parquet',),
+          ('dados_planilhas_2015_a_2025.parquet',), aceita_csv=True),
+)
+
+
+def dependencias(etapas):
+    """{nome: [nomes das etapas que gravam alguma entrada dela]}; valida saídas repetidas e ciclos."""
+    produtor = {}
+    for etapa in etapas:
+        for saida in etapa.saidas:
+            if saida in produtor:
+                raise ValueError(f"'{saida}' é gravado por '{produtor[saida]}' e por '{etapa.nome}'")
+            produtor[saida] = etapa.nome
+    deps = {etapa.nome: sorted({produtor[e] for e in etapa.entradas if e in produtor}) for etapa in etapas}
+
+    # Ordenação topológica só para achar ciclos
+    visitando, visitadas = set(), set()
+
+    def visitar(nome, caminho):
+        if nome in visitadas:
+            return
+        if nome in visitando:
+            raise ValueError("Ciclo entre as etapas: " + " -> ".join(caminho + [nome]))
+        visitando.add(nome)
+        for dep in deps[nome]:
+            visitar(dep, caminho + [nome])
+        visitando.discard(nome)
+        visitadas.add(nome)
+
+    for nome in deps:
+        visitar(nome, [])
+    return deps
+
+
+def com_dependencias(nomes, deps):
+    """As etapas pedidas mais tudo de que elas dependem."""
+    selecionadas = set()
+    pendentes = list(nomes)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome not in selecionadas:
+            selecionadas.add(nome)
+            pendentes.extend(deps[nome])
+    return selecionadas
+
+
+def modulos_locais(script):
+    """O script e os módulos da pasta do projeto que ele importa, direta ou indiretamente."""
+    encontrados = []
+    pendentes = [os.path.join(PASTA_RAIZ, script)]
+    while pendentes:
+        caminho = pendentes.pop()
+        if caminho in encontrados or not os.path.exists(caminho):
+            continue
+        encontrados.append(caminho)
+        with open(caminho, 'rb') as f:
+            arvore = ast.parse(f.read(), filename=caminho)
+        for no in ast.walk(arvore):
+            if isinstance(no, ast.Import):
+                nomes = [a.name for a in no.names]
+            elif isinstance(no, ast.ImportFrom) and not no.level and no.module:
+                nomes = [no.module]
+            else:
+                continue
+            for nome in nomes:
+                pendentes.append(os.path.join(PASTA_RAIZ, nome.split('.')[0] + '.py'))
+    return sorted(encontrados)
+
+
+class Impressoes:
+    """
+    sha256 de arquivos e pastas, reaproveitando o hash guardado de quem não
+    mudou de tamanho nem de data de modificação (como o índice do cache de ingestão).
+    """
+
+    def __init__(self, salvas=None):
+        self.arquivos = dict(salvas or {})
+
+    def arquivo(self, caminho):
+        st = os.stat(caminho)
+        salvo = self.arquivos.get(caminho)
+        if salvo and salvo[0] == st.st_size and salvo[1] == st.st_mtime_ns:
+            return salvo[2]
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        self.arquivos[caminho] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def caminho(self, caminho):
+        """Impressão de um arquivo ou de uma pasta (arquivos ocultos e .part ignorados); None se não existe."""
+        if os.path.isfile(caminho):
+            return self.arquivo(caminho)
+        if not os.path.isdir(caminho):
+            return None
+        h = hashlib.sha256()
+        for nome in sorted(os.listdir(caminho)):
+            completo = os.path.join(caminho, nome)
+            if nome.startswith('.') or nome.endswith('.part') or not os.path.isfile(completo):
+                continue
+            h.update(f"{nome}\0{self.arquivo(completo)}\n".encode('utf-8'))
+        return h.hexdigest()
+
+
+def impressao_etapa(etapa, argumentos, impressoes):
+    """Impressão das entradas, do código e dos argumentos; None se falta alguma entrada."""
+    h = hashlib.sha256(f"{VERSAO_ESTADO}:{etapa.nome}:{json.dumps(argumentos)}".encode('utf-8'))
+    for modulo in modulos_locais(etapa.script):
+        h.update(f"{os.path.relpath(modulo, PASTA_RAIZ)}\0{impressoes.arquivo(modulo)}\n".encode('utf-8'))
+    for entrada in etapa.entradas:
+        impressao = impressoes.caminho(entrada)
+        if impressao is None:
+            return None
+        h.update(f"{entrada}\0{impressao}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+def impressao_saidas(etapa, impressoes):
+    return {saida: impressoes.caminho(saida) for saida in etapa.saidas}
+
+
+def ler_estado(caminho=ARQUIVO_ESTADO):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            estado = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'etapas': {}, 'arquivos': {}}
+    if estado.get('versao') != VERSAO_ESTADO:
+        return {'etapas': {}, 'arquivos': {}}
+    return estado
+
+
+def gravar_estado(estado, caminho=ARQUIVO_ESTADO):
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dict(estado, versao=VERSAO_ESTADO), f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def argumentos_etapa(etapa, csv):
+    return ['--csv'] if csv and etapa.aceita_csv else []
+
+
+def rodar_etapa(etapa, argumentos, workers):
+    """Roda o script num subprocesso (executado numa thread). Devolve (código de saída, segundos)."""
+    comando = [sys.executable, os.path.join(PASTA_RAIZ, etapa.script)] + argumentos
+    if workers and etapa.aceita_workers:
+        comando += ['--workers', str(workers)]
+    os.makedirs(PASTA_LOGS, exist_ok=True)
+    inicio = time.perf_counter()
+    with open(os.path.join(PASTA_LOGS, f"{etapa.nome}.log"), 'w', encoding='utf-8') as log:
+        # stdin fechado: um script que pedir entrada falha em vez de travar o pipeline
+        codigo = subprocess.run(comando, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                env=dict(os.environ, PYTHONUNBUFFERED='1')).returncode
+    return codigo, time.perf_counter() - inicio
+
+
+def executar(etapas=ETAPAS, alvos=None, forcar=False, offline=False, paralelo=2, csv=False,
+             simular=False, caminho_estado=ARQUIVO_ESTADO, aviso=print):
+    """
+    Roda as etapas desatualizadas entre `alvos` (nomes; None = todas) e as de
+    que elas dependem, até `paralelo` ao mesmo tempo. Devolve {nome: situação},
+    com situação 'executada', 'atualizada', 'falha', 'sem_entrada' ou 'bloqueada'
+    (ou 'executaria', com `simular`).
+    """
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    deps = dependencias(etapas)
+    desconhecidas = [nome for nome in alvos or () if nome not in por_nome]
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {', '.join(desconhecidas)}")
+    selecionadas = com_dependencias(alvos, deps) if alvos else set(por_nome)
+    forcadas = set(alvos or por_nome) if forcar else set()
+
+    estado = ler_estado(caminho_estado)
+    impressoes = Impressoes(estado.get('arquivos'))
+    # Os processadores já usam um pool de processos cada: divide as CPUs entre as etapas simultâneas
+    workers = max(1, (os.cpu_count() or 1) // paralelo)
+
+    situacao = {}
+    # Etapas que rodaram (ou rodariam) nesta execução: as dependentes não podem ser avaliadas pelo disco
+    mudaram = set()
+    rodando = {}
+
+    def decidir(etapa):
+        """(rodar, impressao, motivo) de uma etapa cujas dependências já terminaram."""
+        if etapa.remota and offline and etapa.nome not in forcadas:
+            # Usa o que já foi baixado, mesmo sem as entradas
+            faltando = [s for s in etapa.saidas if not os.path.exists(s)]
+            if faltando:
+                return None, None, "modo offline, sem " + ", ".join(faltando)
+            return False, None, "modo offline"
+        argumentos = argumentos_etapa(etapa, csv)
+        impressao = impressao_etapa(etapa, argumentos, impressoes)
+        if simular and any(d in mudaram for d in deps[etapa.nome]):
+            return True, impressao, "entrada refeita por " + ", ".join(d for d in deps[etapa.nome] if d in mudaram)
+        if impressao is None:
+            return None, None, "entrada ausente: " + ", ".join(e for e in etapa.entradas if not os.path.exists(e))
+        if etapa.nome in forcadas:
+            return True, impressao, "forçada"
+        if etapa.remota:
+            return True, impressao, "consulta o site"
+        anterior = estado['etapas'].get(etapa.nome)
+        if anterior is None:
+            return True, impressao, "nunca executada"
+        if anterior['impressao'] != impressao:
+            return True, impressao, "entradas ou código mudaram"
+        if anterior['saidas'] != impressao_saidas(etapa, impressoes):
+            return True, impressao, "saídas alteradas ou removidas"
+        return False, impressao, "atualizada"
+
+    def prontas():
+        for nome in sorted(selecionadas):
+            if nome in situacao or nome in rodando.values():
+                continue
+            if all(d in situacao or d not in selecionadas for d in deps[nome]):
+                yield por_nome[nome]
+
+    with ThreadPoolExecutor(max_workers=paralelo) as executor:
+        while True:
+            for etapa in prontas():
+                if len(rodando) >= paralelo:
+                    break
+                ocupados = {r for nome in rodando.values() for r in por_nome[nome].recursos}
+                if ocupados.intersection(etapa.recursos):
+                    continue
+                # Sem entrada não bloqueia: a dependente vê pelo disco se tem o que precisa
+                falhas = [d for d in deps[etapa.nome] if situacao.get(d) in ('falha', 'bloqueada')]
+                if falhas:
+                    situacao[etapa.nome] = 'bloqueada'
+                    aviso(f"[{etapa.nome}] bloqueada ({', '.join(falhas)} não concluída)")
+                    continue
+                rodar, impressao, motivo = decidir(etapa)
+                if rodar is None:
+                    situacao[etapa.nome] = 'sem_entrada'
+                    aviso(f"[{etapa.nome}] pulada ({motivo})")
+                elif not rodar:
+                    situacao[etapa.nome] = 'atualizada'
+                    aviso(f"[{etapa.nome}] {motivo}")
+                elif simular:
+                    situacao[etapa.nome] = 'executaria'
+                    mudaram.add(etapa.nome)
+                    aviso(f"[{etapa.nome}] executaria ({motivo})")
+                else:
+                    aviso(f"[{etapa.nome}] executando ({motivo})...")
+                    futuro = executor.submit(rodar_etapa, etapa, argumentos_etapa(etapa, csv), workers)
+                    rodando[futuro] = etapa.nome
+
+            if not rodando:
+                if all(nome in situacao for nome in selecionadas):
+                    break
+                continue
+
+            feitos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                etapa = por_nome[rodando.pop(futuro)]
+                codigo, segundos = futuro.result()
+                saidas = impressao_saidas(etapa, impressoes)
+                faltando = [s for s, impressao in saidas.items() if impressao is None]
+                if codigo != 0 or faltando:
+                    situacao[etapa.nome] = 'falha'
+                    detalhe = f"código {codigo}" if codigo != 0 else "não gravou " + ", ".join(faltando)
+                    aviso(f"[{etapa.nome}] falhou em {segundos:.1f}s ({detalhe}); "
+                          f"ver {os.path.join(PASTA_LOGS, etapa.nome + '.log')}")
+                    estado['etapas'].pop(etapa.nome, None)
+                else:
+                    situacao[etapa.nome] = 'executada'
+                    mudaram.add(etapa.nome)
+                    aviso(f"[{etapa.nome}] concluída em {segundos:.1f}s")
+                    # A impressão é recalculada depois: um script pode ter reescrito a própria entrada
+                    estado['etapas'][etapa.nome] = {
+                        'impressao': impressao_etapa(etapa, argumentos_etapa(etapa, csv), impressoes),
+                        'saidas': saidas,
+                        'concluida_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    }
+                # Gravado a cada etapa: uma interrupção não perde o que já terminou
+                estado['arquivos'] = impressoes.arquivos
+                gravar_estado(estado, caminho_estado)
+
+    if not simular:
+        estado['arquivos'] = impressoes.arquivos
+        gravar_estado(estado, caminho_estado)
+    return situacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza os dados rodando só as etapas cujas entradas mudaram.")
+    parser.add_argument('etapas', nargs='*', help="Etapas a atualizar, com as de que dependem (padrão: todas)")
+    parser.add_argument('--forcar', action='store_true', help="Roda as etapas pedidas mesmo se estiverem atualizadas")
+    parser.add_argument('--offline', action='store_true',
+                        help="Não consulta o site: usa o links.txt e as planilhas que já estão na pasta")
+    parser.add_argument('--paralelo', type=int, default=2, help="Etapas executadas ao mesmo tempo")
+    parser.add_argument('--csv', action='store_true', help="Grava também as saídas em CSV, além do Parquet")
+    parser.add_argument('--simular', action='store_true', help="Só mostra o que seria executado")
+    parser.add_argument('--listar', action='store_true', help="Mostra as etapas e suas dependências")
+    args = parser.parse_args()
+
+    os.chdir(PASTA_RAIZ)
+    if args.listar:
+        deps = dependencias(ETAPAS)
+        for etapa in ETAPAS:
+            depois = f" (depois de {', '.join(deps[etapa.nome])})" if deps[etapa.nome] else ""
+            print(f"{etapa.nome}: {etapa.script} -> {', '.join(etapa.saidas)}{depois}")
+        return
+
+    inicio = time.perf_counter()
+    try:
+        situacao = executar(alvos=args.etapas or None, forcar=args.forcar, offline=args.offline,
+                            paralelo=max(1, args.paralelo), csv=args.csv, simular=args.simular)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(2)
+
+    contagem = {}
+    for s in situacao.values():
+        contagem[s] = contagem.get(s, 0) + 1
+    resumo = ", ".join(f"{n} {s}" for s, n in sorted(contagem.items()))
+    print(f"\nPipeline concluído em {time.perf_counter() - inicio:.1f}s: {resumo}.")
+    if contagem.get('falha') or contagem.get('bloqueada'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,53 +1,12 @@
 
 import pandas as pd
 import os
-import re
+from leitor_planilhas import ler_grade, aplicar_estrategia
+from indice_periodos import arquivos_do_periodo
 
 def get_target_files():
-    """Gera a lista dos 130 nomes de arquivo alvo de Jan/2015 a Out/2025."""
-    # Mapeamentos de nomes de arquivo conhecidos e padrões
-    # Esta lista é um exemplo e precisaria ser preenchida com os nomes reais
-    files = []
-    for year in range(2015, 2026):
-        for month in range(1, 13):
-            if year == 2025 and month > 10:
-                continue
-
-            # Tenta encontrar um padrão comum de nome de arquivo
-            # NOTA: Esta lógica é uma simplificação. Os nomes reais são mais complexos.
-            # Em um cenário real, eu teria que mapear os URLs para os nomes dos arquivos.
-            # Exemplo: 'fatores_de_atualizacao_01_2015_art_33.xlsx'
-            # Por simplicidade, vou usar um marcador.
-            files.append(f"planilha_{year}_{month:02d}.xlsx") # Marcador
-
-    # A lógica real seria mais parecida com isto:
-    # 1. Ler o links.txt
-    # 2. Para cada ano/mês, encontrar o URL correspondente.
-    # 3. Extrair o nome do arquivo do URL.
-    # Esta é uma tarefa complexa que eu simularia aqui.
-    # Por agora, vou focar em criar o dicionário de regras para os arquivos que JÁ conheço.
-
-    # Vamos usar os arquivos reais que estão na pasta e filtrá-los.
-    real_files = [f for f in os.listdir("planilhas")]
-    target_files = []
-    for year in range(2015, 2026):
-        for month in range(1, 13):
-            if year == 2025 and month > 10:
-                continue
-
-            month_str = f"{month:02d}"
-            year_str = str(year)
-
-            # Procura por arquivos que correspondam ao padrão ano/mês
-            # Ex: fatores_de_atualizacao_01_2015
-            pattern = re.compile(f"_{month_str}.*{year_str}|{year_str}.*{month_str}")
-            found = False
-            for f in real_files:
-                if pattern.search(f):
-                    target_files.append(f)
-                    found = True
-                    break
-    return list(set(target_files)) # Remove duplicatas
+    """Nomes das planilhas da pasta 'planilhas' publicadas de Jan/2015 a Out/2025."""
+    return arquivos_do_periodo(os.listdir("planilhas"))
 
 def process_file_with_rules(filepath, rules):
     """Processa um arquivo usando um dicionário de regras."""
@@ -60,22 +19,7 @@ def process_file_with_rules(filepath, rules):
     header_row, col_map = rules[filename]
 
     try:
-        df = pd.read_excel(filepath, header=header_row)
-        df.columns = [str(col).strip().lower().replace('\n', ' ') for col in df.columns]
-
-        if not all(k in df.columns for k in col_map.keys()):
-            return None
-
-        df = df[list(col_map.keys())]
-        df.rename(columns=col_map, inplace=True)
-
-        df.dropna(how='all', inplace=True)
-        df['competencia'] = pd.to_datetime(df['competencia'], errors='coerce')
-        df['fator'] = pd.to_numeric(df['fator'], errors='coerce')
-        df.dropna(subset=['competencia', 'fator'], inplace=True)
-
-        df['arquivo_origem'] = filename
-        return df
+        return aplicar_estrategia(ler_grade(filepath), (header_row, col_map), filename)
     except Exception as e:
         print(f"   -> Erro ao processar {filename} com sua regra: {e}")
         return None
@@ -102,49 +46,44 @@ regras_dedicadas = {
 
 
 # Reutilizando a abordagem de multi-estratégia por ser mais prática.
-from processador_final import parse_with_strategy, strategies # Importando do script anterior
-
-input_folder = "planilhas"
-output_file = "dados_completos_planilhas_2015_a_2025.csv"
-error_log_file = "erros_processamento_dedicado.log"
-
-target_files = get_target_files()
-all_dataframes = []
-failed_files = []
-
-print(f"Iniciando processamento dedicado de {len(target_files)} planilhas (2015-2025)...")
-
-for filename in target_files:
-    file_path = os.path.join(input_folder, filename)
-    print(f"Processando: {filename}...")
-
-    success = False
-    for strategy in strategies: # Usando as estratégias genéricas
-        result_df = parse_with_strategy(file_path, strategy)
-        if result_df is not None:
-            all_dataframes.append(result_df)
-            success = True
-            break
-
-    if not success:
-        failed_files.append(filename)
-
-# Resultados
-if failed_files:
-    with open(error_log_file, "w") as f:
-        for name in failed_files:
-            f.write(f"{name}\n")
-
-if all_dataframes:
-    final_df = pd.concat(all_dataframes, ignore_index=True)
-    final_df.drop_duplicates(inplace=True)
-    final_df.sort_values(by=['arquivo_origem', 'competencia'], inplace=True)
-    final_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-
-    print("\n--- Processamento Dedicado Concluído ---")
-    print(f" -> {len(target_files) - len(failed_files)} de {len(target_files)} planilhas processadas com sucesso.")
-    if failed_files:
-        print(f" -> {len(failed_files)} planilhas falharam (ver '{error_log_file}').")
-    print(f" -> Total de {len(final_df)} linhas salvas em '{output_file}'.")
-else:
-    print("\nNenhuma planilha do período alvo pôde ser processada.")
+from processador_final import parse_file # Importando do script anterior (lê cada planilha uma vez)
+from ingestao_paralela import processar_arquivos, registrar_falhas, argumentos_ingestao
+from cache_ingestao import CacheIngestao
+from colunar import gravar_dados
+
+def main():
+    args = argumentos_ingestao("Processa as planilhas de 2015 a 2025.")
+
+    input_folder = "planilhas"
+    output_file = "dados_completos_planilhas_2015_a_2025.parquet"
+    error_log_file = "erros_processamento_dedicado.log"
+
+    target_files = get_target_files()
+
+    print(f"Iniciando processamento dedicado de {len(target_files)} planilhas (2015-2025)...")
+
+    # Usando as estratégias genéricas, com as planilhas distribuídas entre processos
+    all_dataframes, failed_files = processar_arquivos(
+        [os.path.join(input_folder, f) for f in target_files], parse_file, args.workers,
+        cache=None if args.sem_cache else CacheIngestao(),
+    )
+
+    # Resultados
+    registrar_falhas(failed_files, error_log_file)
+
+    if all_dataframes:
+        final_df = pd.concat(all_dataframes, ignore_index=True)
+        final_df.drop_duplicates(inplace=True)
+        final_df.sort_values(by=['arquivo_origem', 'competencia'], inplace=True)
+        gravar_dados(final_df, output_file, csv=args.csv)
+
+        print("\n--- Processamento Dedicado Concluído ---")
+        print(f" -> {len(target_files) - len(failed_files)} de {len(target_files)} planilhas processadas com sucesso.")
+        if failed_files:
+            print(f" -> {len(failed_files)} planilhas falharam (ver '{error_log_file}').")
+        print(f" -> Total de {len(final_df)} linhas salvas em '{output_file}'.")
+    else:
+        print("\nNenhuma planilha do período alvo pôde ser processada.")
+
+if __name__ == '__main__':
+    main()
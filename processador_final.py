@@ -1,34 +1,29 @@
 
 import pandas as pd
 import os
-import re
-from datetime import datetime
-
-def parse_with_strategy(file_path, strategy):
-    """Tenta analisar uma planilha com base numa estratégia específica."""
-    header_row, col_map = strategy
+from leitor_planilhas import ler_grade, aplicar_estrategia, processar_com_estrategias
+from ingestao_paralela import processar_arquivos, registrar_falhas, argumentos_ingestao
+from cache_ingestao import CacheIngestao
+from colunar import gravar_dados
+
+def parse_with_strategy(file_path, strategy, grade=None):
+    """
+    Tenta analisar uma planilha com base numa estratégia específica. Se a grade
+    da planilha já foi lida (ver leitor_planilhas.ler_grade), ela é reaproveitada.
+    """
     try:
-        df = pd.read_excel(file_path, header=header_row)
-        df.columns = [str(col).strip().lower().replace('\n', ' ') for col in df.columns]
-
-        if not all(k in df.columns for k in col_map.keys()):
-            return None
-
-        df = df[list(col_map.keys())]
-        df.rename(columns=col_map, inplace=True)
-
-        df.dropna(how='all', inplace=True)
-        df['competencia'] = pd.to_datetime(df['competencia'], errors='coerce')
-        df['fator'] = pd.to_numeric(df['fator'], errors='coerce')
-        df.dropna(subset=['competencia', 'fator'], inplace=True)
-
-        if not df.empty:
-            df['arquivo_origem'] = os.path.basename(file_path)
-            return df
-
+        if grade is None:
+            grade = ler_grade(file_path)
     except Exception:
         return None
-    return None
+    return aplicar_estrategia(grade, strategy, os.path.basename(file_path))
+
+def parse_file(file_path):
+    """
+    Lê a planilha uma única vez; usa o layout detectado automaticamente e, se ele
+    não for confiável, testa as estratégias fixas sobre a grade em memória.
+    """
+    return processar_com_estrategias(file_path, strategies)
 
 strategies = [
     # Estratégias dedicadas para os 3 arquivos que falharam
@@ -47,44 +42,35 @@ strategies = [
     (8, {'mês': 'competencia', 'fator simplificado (multiplicar)': 'fator'}),
 ]
 
-input_folder = "planilhas"
-output_file = "dados_consolidados.csv"
-error_log_file = "processing_errors.log"
-
-all_files = [f for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
-all_dataframes = []
-failed_files = []
+def main():
+    args = argumentos_ingestao("Processa todas as planilhas da pasta 'planilhas'.")
 
-print(f"Iniciando processamento de {len(all_files)} planilhas...")
+    input_folder = "planilhas"
+    output_file = "dados_consolidados.parquet"
+    error_log_file = "processing_errors.log"
 
-for filename in all_files:
-    file_path = os.path.join(input_folder, filename)
+    all_files = [f for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
 
-    success = False
-    for strategy in strategies:
-        result_df = parse_with_strategy(file_path, strategy)
-        if result_df is not None:
-            all_dataframes.append(result_df)
-            success = True
-            break
+    print(f"Iniciando processamento de {len(all_files)} planilhas...")
 
-    if not success:
-        failed_files.append(filename)
+    all_dataframes, failed_files = processar_arquivos(
+        [os.path.join(input_folder, f) for f in all_files], parse_file, args.workers,
+        cache=None if args.sem_cache else CacheIngestao(),
+    )
+    registrar_falhas(failed_files, error_log_file)
 
-if failed_files:
-    with open(error_log_file, "w") as f:
-        for name in failed_files:
-            f.write(f"{name}\n")
+    if all_dataframes:
+        final_df = pd.concat(all_dataframes, ignore_index=True)
+        final_df.drop_duplicates(inplace=True)
+        final_df.sort_values(by=['arquivo_origem', 'competencia'], inplace=True)
+        gravar_dados(final_df, output_file, csv=args.csv)
 
-if all_dataframes:
-    final_df = pd.concat(all_dataframes, ignore_index=True)
-    final_df.drop_duplicates(inplace=True)
-    final_df.sort_values(by=['arquivo_origem', 'competencia'], inplace=True)
-    final_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n--- Processamento Concluído ---")
+        print(f" -> {len(all_files) - len(failed_files)} planilhas processadas com sucesso.")
+        print(f" -> {len(failed_files)} planilhas falharam (ver 'processing_errors.log').")
+        print(f" -> Total de {len(final_df)} linhas únicas salvas em '{output_file}'.")
+    else:
+        print("\nNenhuma planilha pôde ser processada com sucesso.")
 
-    print(f"\n--- Processamento Concluído ---")
-    print(f" -> {len(all_files) - len(failed_files)} planilhas processadas com sucesso.")
-    print(f" -> {len(failed_files)} planilhas falharam (ver 'processing_errors.log').")
-    print(f" -> Total de {len(final_df)} linhas únicas salvas em '{output_file}'.")
-else:
-    print("\nNenhuma planilha pôde ser processada com sucesso.")
+if __name__ == '__main__':
+    main()
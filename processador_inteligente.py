@@ -2,49 +2,55 @@
 import pandas as pd
 import os
 import re
+from deteccao_layout import Layout, detectar_layout, layout_confiavel
+from leitor_planilhas import extrair_dados
+from ingestao_paralela import processar_arquivos, registrar_falhas, argumentos_ingestao
+from cache_ingestao import CacheIngestao
+from colunar import gravar_dados
 
-def processar_planilha_com_regras_fixas(filepath):
+# Layout antigo (dados a partir de B10/C10), usado quando a detecção não é confiável
+LAYOUT_FIXO = Layout(linha_cabecalho=8, primeira_linha=9, col_competencia=1, col_fator=2, linhas=0, confianca=0.0)
+
+def extrair_mes_referencia(df_full, layout, filepath):
     """
-    Processa uma planilha usando as regras fixas fornecidas pelo usuário:
-    - Mês de referência está em B5.
-    - Os dados começam em B10 (competência) e C10 (fator).
+    Procura o mês de referência ('mês/aaaa'): primeiro em B5 (ou A5/C5, se
+    mesclado), depois nas demais células acima do cabeçalho detectado.
     """
-    try:
-        # Lê a planilha inteira sem cabeçalho para acessar células específicas
-        df_full = pd.read_excel(filepath, header=None)
-
-        # Extrai o mês de referência da célula B5 (índice 4, 1)
-        # Às vezes, o valor pode estar em A5 ou C5 se mesclado
-        ref_month_str = str(df_full.iloc[4, 1]) # B5
-        if 'nan' in ref_month_str.lower():
-             ref_month_str = str(df_full.iloc[4, 0]) # Tenta A5
-        if 'nan' in ref_month_str.lower():
-             ref_month_str = str(df_full.iloc[4, 2]) # Tenta C5
-
+    candidatos = []
+    if len(df_full) > 4:
+        candidatos += [df_full.iloc[4, c] for c in (1, 0, 2) if c < df_full.shape[1]]
+    for linha in range(min(layout.linha_cabecalho, len(df_full))):
+        candidatos += df_full.iloc[linha].tolist()
+
+    for valor in candidatos:
+        if pd.isna(valor):
+            continue
         # Pega a parte relevante do texto
-        match = re.search(r'(\w+/\d{4})', ref_month_str)
+        match = re.search(r'(\w+/\d{4})', str(valor))
         if match:
-            ref_month_str = match.group(1)
-        else:
-            ref_month_str = os.path.basename(filepath) # Usa o nome do arquivo como fallback
-
-        # Define a partir de qual linha ler os dados (linha 10, que é índice 9)
-        # e quais colunas usar (B e C, que são índices 1 e 2)
-        df_data = pd.read_excel(filepath, header=None, skiprows=9, usecols=[1, 2])
+            return match.group(1)
+    return os.path.basename(filepath) # Usa o nome do arquivo como fallback
 
-        # Define os nomes das colunas manualmente
-        df_data.columns = ['competencia', 'fator']
+def processar_planilha(filepath):
+    """
+    Processa uma planilha detectando automaticamente a linha de cabeçalho e as
+    colunas de competência/fator. Se a detecção não for confiável, usa o layout
+    fixo: mês de referência em B5 e dados a partir de B10 (competência) e C10 (fator).
+    """
+    try:
+        # Lê a planilha inteira sem cabeçalho uma única vez
+        df_full = pd.read_excel(filepath, header=None)
 
-        # Adiciona a coluna com o mês de referência
-        df_data['mes_referencia_planilha'] = ref_month_str
-        df_data['arquivo_origem'] = os.path.basename(filepath)
+        layout = detectar_layout(df_full)
+        if not layout_confiavel(layout):
+            layout = LAYOUT_FIXO
 
-        # Limpeza final dos dados
-        df_data.dropna(how='all', inplace=True)
-        df_data['competencia'] = pd.to_datetime(df_data['competencia'], errors='coerce')
-        df_data['fator'] = pd.to_numeric(df_data['fator'], errors='coerce')
-        df_data.dropna(subset=['competencia', 'fator'], inplace=True)
+        df_data = extrair_dados(df_full, layout, os.path.basename(filepath))
+        if df_data is None:
+            return None
 
+        # Adiciona a coluna com o mês de referência
+        df_data.insert(2, 'mes_referencia_planilha', extrair_mes_referencia(df_full, layout, filepath))
         return df_data
 
     except Exception as e:
@@ -53,47 +59,44 @@ def processar_planilha_com_regras_fixas(filepath):
 
 # --- Execução Principal ---
 
-input_folder = "planilhas"
-output_file = "dados_completos_automatico.csv"
-error_log_file = "erros_processamento_final.log"
+def main():
+    args = argumentos_ingestao("Processa as planilhas com detecção automática de layout.")
 
-# Garante que a pasta de planilhas existe
-if not os.path.isdir(input_folder):
-    print(f"Erro: Pasta '{input_folder}' não encontrada. Execute o download primeiro.")
-    exit()
+    input_folder = "planilhas"
+    output_file = "dados_completos_automatico.parquet"
+    error_log_file = "erros_processamento_final.log"
 
-all_files = [f for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
-all_dataframes = []
-failed_files = []
+    # Garante que a pasta de planilhas existe
+    if not os.path.isdir(input_folder):
+        print(f"Erro: Pasta '{input_folder}' não encontrada. Execute o download primeiro.")
+        return
 
-print(f"Iniciando processamento de {len(all_files)} planilhas com regras fixas...")
+    all_files = [f for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
 
-for filename in all_files:
-    file_path = os.path.join(input_folder, filename)
+    print(f"Iniciando processamento de {len(all_files)} planilhas com detecção automática de layout...")
 
-    result_df = processar_planilha_com_regras_fixas(file_path)
+    # As planilhas são distribuídas entre processos; falhas saem em ordem alfabética
+    all_dataframes, failed_files = processar_arquivos(
+        [os.path.join(input_folder, f) for f in all_files], processar_planilha, args.workers,
+        cache=None if args.sem_cache else CacheIngestao(),
+    )
 
-    if result_df is not None and not result_df.empty:
-        all_dataframes.append(result_df)
+    # Log de falhas
+    registrar_falhas(failed_files, error_log_file)
+
+    # Consolidação e salvamento
+    if all_dataframes:
+        final_df = pd.concat(all_dataframes, ignore_index=True)
+        final_df.sort_values(by=['mes_referencia_planilha', 'competencia'], inplace=True)
+        gravar_dados(final_df, output_file, csv=args.csv)
+
+        print("\n--- Processamento Concluído ---")
+        print(f" -> {len(all_files) - len(failed_files)} de {len(all_files)} planilhas processadas com sucesso!")
+        if failed_files:
+            print(f" -> {len(failed_files)} planilhas falharam (ver '{error_log_file}').")
+        print(f" -> Total de {len(final_df)} linhas salvas em '{output_file}'.")
     else:
-        failed_files.append(filename)
-
-# Log de falhas
-if failed_files:
-    with open(error_log_file, "w") as f:
-        for name in sorted(failed_files):
-            f.write(f"{name}\n")
-
-# Consolidação e salvamento
-if all_dataframes:
-    final_df = pd.concat(all_dataframes, ignore_index=True)
-    final_df.sort_values(by=['mes_referencia_planilha', 'competencia'], inplace=True)
-    final_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-
-    print("\n--- Processamento Concluído ---")
-    print(f" -> {len(all_files) - len(failed_files)} de {len(all_files)} planilhas processadas com sucesso!")
-    if failed_files:
-        print(f" -> {len(failed_files)} planilhas falharam (ver '{error_log_file}').")
-    print(f" -> Total de {len(final_df)} linhas salvas em '{output_file}'.")
-else:
-    print("\nNenhuma planilha pôde ser processada com sucesso.")
+        print("\nNenhuma planilha pôde ser processada com sucesso.")
+
+if __name__ == '__main__':
+    main()
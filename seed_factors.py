@@ -1,6 +1,8 @@
 import re
 from app import app, db
 from app import CorrectionFactor
+from app.competence import parse_month_year
+from app.factor_cache import bump_factor_version
 
 def parse_factors(text_block):
     """Parses the multiline string of factors into a list of tuples."""
@@ -399,17 +401,19 @@ def seed_db():
     with app.app_context():
         factors_to_add = parse_factors(factors_data_string)
 
-        existing_factors = {f.month_year for f in CorrectionFactor.query.all()}
+        existing_factors = set(db.session.execute(db.select(CorrectionFactor.competence)).scalars())
 
         new_factors = []
         for month_year, value in factors_to_add:
+            competence = parse_month_year(month_year)
             # Check for duplicates like 'set/97'
-            if month_year not in existing_factors:
+            if competence not in existing_factors:
                 new_factors.append(CorrectionFactor(month_year=month_year, value=value))
-                existing_factors.add(month_year) # Add to set to handle duplicates in source data
+                existing_factors.add(competence) # Add to set to handle duplicates in source data
 
         if new_factors:
             db.session.bulk_save_objects(new_factors)
+            bump_factor_version()
             db.session.commit()
             print(f"Added {len(new_factors)} new factors to the database.")
         else:
@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads DATABASE_URL when it is imported, so the scratch database must be set first
+_workdir = tempfile.mkdtemp(prefix='tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, bcrypt, User  # noqa: E402
+from app import factor_cache  # noqa: E402
+
+PASSWORD = 'secret'
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, PDF_CACHE_DIR=str(tmp_path / 'pdf_cache'))
+    # Every test starts from an empty database, so no cached factor table may survive it
+    monkeypatch.setattr(factor_cache, '_snapshot', None)
+    monkeypatch.setattr(factor_cache, '_vintages', {})
+    monkeypatch.setattr(factor_cache, '_vintages_version', None)
+    monkeypatch.setattr(factor_cache, '_vintage_list', None)
+    factor_cache.invalidate()
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='tester', role='standard',
+                password_hash=bcrypt.generate_password_hash(PASSWORD, rounds=4).decode('utf-8'))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    response = client.post('/login', data={'username': user.username, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from baixar_planilhas import baixar_urls, ler_manifesto, ARQUIVO_MANIFESTO
+
+CONTEUDO = bytes(range(256)) * 400
+ETAG = '"v1"'
+LAST_MODIFIED = 'Mon, 01 Sep 2025 10:00:00 GMT'
+
+
+class Servidor(BaseHTTPRequestHandler):
+    """Servidor de planilhas de mentira: ETag, Range/If-Range e respostas forçadas configuráveis."""
+
+    # Configurados por teste (ver a fixture `servidor`)
+    respostas_forcadas = []
+    aceita_range = True
+    antes_de_responder = None
+    pedidos = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.pedidos.append(dict(self.headers))
+        if self.antes_de_responder:
+            self.antes_de_responder()
+        if self.respostas_forcadas:
+            self.send_response(self.respostas_forcadas.pop(0))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        faixa = self.headers.get('Range')
+        inicio = 0
+        if faixa and self.aceita_range and self.headers.get('If-Range') == ETAG:
+            inicio = int(faixa.split('=')[1].rstrip('-'))
+        corpo = CONTEUDO[inicio:]
+        self.send_response(206 if inicio else 200)
+        if inicio:
+            self.send_header('Content-Range', f"bytes {inicio}-{len(CONTEUDO) - 1}/{len(CONTEUDO)}")
+        self.send_header('Content-Length', str(len(corpo)))
+        self.send_header('ETag', ETAG)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(Servidor, 'respostas_forcadas', [])
+    monkeypatch.setattr(Servidor, 'aceita_range', True)
+    monkeypatch.setattr(Servidor, 'antes_de_responder', None)
+    monkeypatch.setattr(Servidor, 'pedidos', [])
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Servidor)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/planilhas/3a_120217-101010-123.xls"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def baixar(url, pasta):
+    (resultado,) = baixar_urls([url], str(pasta), espera=0, timeout=5)
+    return resultado
+
+
+def com_parcial(url, pasta, tamanho):
+    """Deixa um .part com os primeiros `tamanho` bytes, como um download interrompido."""
+    pasta.mkdir(exist_ok=True)
+    (pasta / '3a_120217-101010-123.xls.part').write_bytes(CONTEUDO[:tamanho])
+    (pasta / ARQUIVO_MANIFESTO).write_text(json.dumps({url: {'arquivo': '3a_120217-101010-123.xls',
+                                                             'parcial': ETAG}}))
+
+
+def test_baixa_e_depois_pergunta_se_mudou(servidor, tmp_path):
+    resultado = baixar(servidor, tmp_path)
+    assert (resultado.estado, resultado.erro) == ('novo', None)
+    assert open(resultado.caminho, 'rb').read() == CONTEUDO
+
+    registro = ler_manifesto(str(tmp_path))[servidor]
+    assert registro['arquivo'] == '3a_120217-101010-123.xls'
+    assert registro['etag'] == ETAG
+    assert registro['last_modified'] == LAST_MODIFIED
+    assert registro['tamanho'] == len(CONTEUDO)
+    assert registro['sha256'] == hashlib.sha256(CONTEUDO).hexdigest()
+    assert 'parcial' not in registro
+
+    assert baixar(servidor, tmp_path).estado == 'inalterado'
+    assert Servidor.pedidos[-1]['If-None-Match'] == ETAG
+    assert Servidor.pedidos[-1]['If-Modified-Since'] == LAST_MODIFIED
+    assert ler_manifesto(str(tmp_path))[servidor]['baixado_em'] == registro['baixado_em']
+
+
+def test_retoma_do_part_com_range(servidor, tmp_path):
+    com_parcial(servidor, tmp_path, 30000)
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert resultado.estado == 'novo'
+    assert Servidor.pedidos[0]['Range'] == 'bytes=30000-'
+    assert Servidor.pedidos[0]['If-Range'] == ETAG
+    assert open(resultado.caminho, 'rb').read() == CONTEUDO
+    assert ler_manifesto(str(tmp_path))[servidor]['sha256'] == hashlib.sha256(CONTEUDO).hexdigest()
+    assert not os.path.exists(resultado.caminho + '.part')
+
+
+def test_servidor_que_ignora_range_manda_o_arquivo_inteiro(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(Servidor, 'aceita_range', False)
+    com_parcial(servidor, tmp_path, 30000)
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert Servidor.pedidos[0]['Range'] == 'bytes=30000-'
+    # 200 em vez de 206: o .part é reescrito do início, não acrescentado
+    assert open(resultado.caminho, 'rb').read() == CONTEUDO
+
+
+def test_tenta_de_novo_depois_de_503(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(Servidor, 'respostas_forcadas', [503, 503])
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert (resultado.estado, resultado.erro) == ('novo', None)
+    assert len(Servidor.pedidos) == 3
+
+
+def test_desiste_depois_das_tentativas(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(Servidor, 'respostas_forcadas', [503] * 10)
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert (resultado.estado, resultado.erro) == ('falha', 'HTTP 503')
+    assert len(Servidor.pedidos) == 4
+
+
+def test_416_recomeca_do_zero(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(Servidor, 'respostas_forcadas', [416])
+    com_parcial(servidor, tmp_path, 30000)
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert resultado.estado == 'novo'
+    assert 'Range' not in Servidor.pedidos[1]
+    assert open(resultado.caminho, 'rb').read() == CONTEUDO
+
+
+def test_416_com_o_part_ja_removido(servidor, tmp_path, monkeypatch):
+    parcial = tmp_path / '3a_120217-101010-123.xls.part'
+    monkeypatch.setattr(Servidor, 'respostas_forcadas', [416])
+    # O .part some entre o pedido e a resposta (outro processo, limpeza manual)
+    monkeypatch.setattr(Servidor, 'antes_de_responder',
+                        staticmethod(lambda: parcial.unlink() if parcial.exists() else None))
+    com_parcial(servidor, tmp_path, 30000)
+
+    resultado = baixar(servidor, tmp_path)
+
+    assert (resultado.estado, resultado.erro) == ('novo', None)
+    assert open(resultado.caminho, 'rb').read() == CONTEUDO
@@ -0,0 +1,53 @@
+import pytest
+
+from app import db, CorrectionFactor, Simulation
+from app.batch import specs_from_csv
+
+RECORD = {'server_name': 'Server', 'dob': '1970-01-01', 'benefit_type': 'Aposentadoria', 'gender': 'feminino'}
+
+
+@pytest.fixture
+def factors(app):
+    db.session.add_all([CorrectionFactor(month_year='ago/25', value=1.5),
+                        CorrectionFactor(month_year='set/25', value=2.0)])
+    db.session.commit()
+
+
+def post_batch(client, records):
+    return client.post('/api/simulations/batch', json=records)
+
+
+def test_batch_creates_simulations(client, factors):
+    response = post_batch(client, [dict(RECORD, salaries={'ago/25': 1000, 'sep/25': '1000'})])
+
+    assert response.status_code == 201
+    assert response.get_json()['simulations'][0]['result'] == 2000.0
+    assert Simulation.query.count() == 1
+
+
+@pytest.mark.parametrize('records, message', [
+    (['not an object'], "Simulation #1: expected an object"),
+    ([dict(RECORD, salaries=[1000, 1200])], "Simulation #1: salaries must map"),
+    ([dict(RECORD, salaries='1000')], "Simulation #1: salaries must map"),
+    ([dict(RECORD, salaries={'set/25': 1000}), dict(RECORD, salaries={'set/25': 'inf'})],
+     "Simulation #2: invalid salary 'set/25'"),
+    ([dict(RECORD, salaries={'set/25': 'nan'})], "Simulation #1: invalid salary 'set/25'"),
+    ([dict(RECORD, salaries={'set/25': 1e400})], "Simulation #1: invalid salary 'set/25'"),
+])
+def test_batch_rejects_invalid_records(client, factors, records, message):
+    response = post_batch(client, records)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(message)
+    assert Simulation.query.count() == 0
+
+
+def test_csv_rows_of_one_simulation_need_not_be_consecutive():
+    lines = ['server_name,dob,benefit_type,gender,month_year,amount',
+             'Ana,1970-01-01,Aposentadoria,FEMININO,ago/25,1000',
+             'Bia,1971-01-01,Aposentadoria,FEMININO,ago/25,900',
+             'Ana,1970-01-01,Aposentadoria,FEMININO,set/25,1100']
+
+    specs = specs_from_csv(lines)
+
+    assert [(s.server_name, len(s.salaries)) for s in specs] == [('Ana', 2), ('Bia', 1)]
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_ingestao import CacheIngestao
+from ingestao_paralela import processar_arquivos, ResultadoArquivo
+
+CHAMADAS = []
+# Planilhas cuja leitura falha, como um arquivo ainda aberto em outro programa
+FALHAM = set()
+
+
+def ler_planilha(file_path):
+    # Função de módulo: processar_arquivos precisa de algo que possa ir para outros processos
+    CHAMADAS.append(os.path.basename(file_path))
+    if os.path.basename(file_path) in FALHAM:
+        raise PermissionError("arquivo em uso")
+    return pd.DataFrame({
+        'competencia': pd.to_datetime(['2020-01-01', '2020-02-01']),
+        'fator': [1.5, 1.25],
+        'mes_referencia_planilha': ['Março/2016'] * 2,
+        'arquivo_origem': [os.path.basename(file_path)] * 2,
+        'linha_cabecalho': np.array([7, 7], dtype=np.int64),
+        'publicada_em': pd.to_datetime(['2016-03-10'] * 2),
+    })
+
+
+@pytest.fixture
+def planilhas(tmp_path):
+    CHAMADAS.clear()
+    FALHAM.clear()
+    FALHAM.add('b.xls')
+    caminhos = []
+    for nome in ('a.xls', 'b.xls'):
+        caminho = tmp_path / nome
+        caminho.write_text(nome, encoding='utf-8')
+        caminhos.append(str(caminho))
+    return caminhos
+
+
+def test_acerto_do_cache_igual_a_leitura(tmp_path, planilhas):
+    pasta = str(tmp_path / 'cache')
+    lidos, falhas = processar_arquivos(planilhas, ler_planilha, workers=1, cache=CacheIngestao(pasta))
+    do_cache, falhas_cache = processar_arquivos(planilhas, ler_planilha, workers=1, cache=CacheIngestao(pasta))
+
+    assert falhas == falhas_cache == ['b.xls']
+    assert len(lidos) == len(do_cache) == 1
+    pd.testing.assert_frame_equal(lidos[0], do_cache[0])
+    assert [type(v) for v in do_cache[0].iloc[0]] == [type(v) for v in lidos[0].iloc[0]]
+
+
+def test_falhas_nao_ficam_no_cache(tmp_path, planilhas):
+    pasta = str(tmp_path / 'cache')
+    processar_arquivos(planilhas, ler_planilha, workers=1, cache=CacheIngestao(pasta))
+    assert CHAMADAS == ['a.xls', 'b.xls']
+
+    # Só a planilha que falhou é lida de novo, com o mesmo conteúdo, e agora entra no resultado
+    FALHAM.clear()
+    CHAMADAS.clear()
+    dataframes, falhas = processar_arquivos(planilhas, ler_planilha, workers=1, cache=CacheIngestao(pasta))
+    assert CHAMADAS == ['b.xls']
+    assert falhas == [] and len(dataframes) == 2
+
+
+def test_metadados_que_nao_voltam_iguais_ficam_fora_do_cache(tmp_path):
+    cache = CacheIngestao(str(tmp_path / 'cache'))
+    # np.float64 passa pelo JSON, mas voltaria como float
+    resultado = ResultadoArquivo('a.xls', pd.to_datetime(['2020-01-01']).to_numpy(), np.array([1.5]),
+                                 (('arquivo_origem', 'a.xls'), ('peso', np.float64(1.5))), None)
+
+    assert cache.salvar('abc', 'v1', resultado) is False
+    assert cache.carregar('abc', 'v1', 'a.xls') is None
+
+
+def test_indice_junta_o_que_outro_processo_gravou(tmp_path, planilhas):
+    pasta = str(tmp_path / 'cache')
+    primeiro, segundo = CacheIngestao(pasta), CacheIngestao(pasta)
+    primeiro.hash_arquivo(planilhas[0])
+    segundo.hash_arquivo(planilhas[1])
+    primeiro.gravar_indice()
+    segundo.gravar_indice()
+
+    indice = CacheIngestao(pasta).indice
+    assert sorted(indice) == sorted(os.path.abspath(p) for p in planilhas)
+    assert [n for n in os.listdir(pasta) if n.endswith('.tmp')] == []
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from app.calculations import calculate_benefit, calculate_benefits_batch, top_count
+
+
+def sorted_loop(salaries, factors):
+    """The calculation as calculate_salaries did it before the NumPy version: sort, slice, average."""
+    adjusted = sorted((s * f for s, f in zip(salaries, factors) if s > 0), reverse=True)
+    count = int(len(adjusted) * 0.9)
+    if count < 1:
+        count = 1 if adjusted else 0
+    top = adjusted[:count]
+    return (sum(top) / len(top) if top else 0.0), sum(top), count
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 5, 9, 10, 11, 19, 20, 29, 30, 99, 100, 101, 360, 1000])
+def test_count_top_rounds_down_like_the_original(n):
+    salaries = np.full(n, 1000.0)
+    expected = sorted_loop(salaries, np.ones(n))[2]
+    assert top_count(n) == expected
+    assert calculate_benefit(salaries, np.ones(n)).count_top == expected
+
+
+def test_ties_at_the_cut():
+    # Ten months, the top 9 are kept; the cut falls inside a run of equal values
+    salaries = [500.0, 700.0, 700.0, 700.0, 700.0, 900.0, 900.0, 700.0, 300.0, 700.0]
+    benefit = calculate_benefit(salaries, np.ones(10))
+
+    assert benefit.count_top == 9
+    assert benefit.sum_top == pytest.approx(sum(salaries) - 300.0)
+    assert benefit.average == pytest.approx((sum(salaries) - 300.0) / 9)
+    assert sorted(benefit.adjusted[benefit.top_indices].tolist()) == sorted(salaries)[1:]
+
+
+def test_all_equal_values():
+    benefit = calculate_benefit([1000.0] * 7, [1.5] * 7)
+    assert benefit.count_top == 6
+    assert benefit.average == pytest.approx(1500.0)
+    assert len(set(benefit.top_indices.tolist())) == 6
+
+
+@pytest.mark.parametrize('salaries', [[], [0.0, 0.0, 0.0], [0.0, -10.0]])
+def test_empty_and_all_zero_series(salaries):
+    benefit = calculate_benefit(salaries, np.ones(len(salaries)))
+    assert (benefit.count_top, benefit.sum_top, benefit.total_adjusted, benefit.average) == (0, 0.0, 0.0, 0.0)
+    assert calculate_benefits_batch(np.atleast_2d(salaries) if salaries else np.zeros((1, 0)),
+                                    np.ones(len(salaries))).tolist() == [0.0]
+
+
+def test_single_month():
+    benefit = calculate_benefit([1200.0], [2.0])
+    assert (benefit.count_top, benefit.sum_top, benefit.average) == (1, 2400.0, 2400.0)
+    assert calculate_benefits_batch([[1200.0]], [2.0]).tolist() == [2400.0]
+
+
+def test_zero_months_are_left_out():
+    salaries = [0.0, 1000.0, 0.0, 2000.0]
+    benefit = calculate_benefit(salaries, [9.0, 1.0, 9.0, 1.0])
+    assert benefit.count_top == 1
+    assert benefit.average == 2000.0
+    assert benefit.total_adjusted == 3000.0
+
+
+def test_batch_matches_scalar_and_the_original_on_random_data():
+    rng = np.random.default_rng(7)
+    salaries = rng.uniform(500, 5000, size=(200, 120)).round(2)
+    # Gaps, empty rows and repeated values, as real series have
+    salaries[rng.random(salaries.shape) < 0.3] = 0.0
+    salaries[5] = 0.0
+    salaries[6, :] = 1000.0
+    salaries[7, 1:] = 0.0
+    factors = rng.uniform(0.8, 3.0, size=120)
+
+    batch = calculate_benefits_batch(salaries, factors)
+    for row, result in zip(salaries, batch):
+        scalar = calculate_benefit(row, factors).average
+        assert result == pytest.approx(scalar, rel=1e-12)
+        assert scalar == pytest.approx(sorted_loop(row, factors)[0], rel=1e-12)
@@ -0,0 +1,94 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+import migrate_db
+from app import db, Simulation, SalaryContribution, CorrectionFactor
+from app import pdf_reports
+from app.competence import parse_month_year
+from app.factor_cache import get_factors
+
+
+def add_simulation(user):
+    simulation = Simulation(server_name='Server', dob=date(1970, 1, 1), benefit_type='Aposentadoria',
+                            gender='FEMININO', user_id=user.id)
+    db.session.add(simulation)
+    db.session.commit()
+    return simulation
+
+
+def insert_legacy(table, **values):
+    """A row as written before the competence column was filled: no competence, month as typed."""
+    columns = ', '.join(values)
+    db.session.execute(text(f"INSERT INTO {table} ({columns}) VALUES ({', '.join(':' + c for c in values)})"),
+                       values)
+
+
+def migrate():
+    migrate_db.fill_competence('correction_factor')
+    migrate_db.fill_competence('salary_contribution', unique_within=('simulation_id',))
+    db.session.commit()
+
+
+def test_migration_applies_factor_of_legacy_month(app, user, client):
+    simulation = add_simulation(user)
+    insert_legacy('correction_factor', month_year='sep/25', value=2.0)
+    insert_legacy('salary_contribution', simulation_id=simulation.id, month_year='sep/25', amount=1000.0)
+    db.session.commit()
+
+    migrate()
+
+    assert db.session.execute(text("SELECT month_year, competence FROM correction_factor")).one() == \
+        ('set/25', parse_month_year('set/25'))
+    assert db.session.execute(text("SELECT month_year, competence FROM salary_contribution")).one() == \
+        ('set/25', parse_month_year('set/25'))
+
+    db.session.expire_all()
+    report = pdf_reports.build_report(db.session.get(Simulation, simulation.id), get_factors())
+    assert report['report_data'] == [{'month_year': 'set/25', 'salary': 1000.0, 'factor': 2.0, 'adjusted': 2000.0}]
+
+    page = client.get(f'/simulation/{simulation.id}/salaries').get_data(as_text=True)
+    assert 'name="salary_set/25"' in page and 'value="1000.0"' in page
+
+    response = client.post(f'/simulation/{simulation.id}/calculate', data={'salary_sep/25': '1000'})
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Simulation, simulation.id).result == 2000.0
+
+
+def test_migration_keeps_newest_of_two_spellings(app, user):
+    simulation = add_simulation(user)
+    insert_legacy('salary_contribution', simulation_id=simulation.id, month_year='sep/25', amount=1000.0)
+    insert_legacy('salary_contribution', simulation_id=simulation.id, month_year='set/25', amount=1200.0)
+    db.session.commit()
+
+    migrate()
+    migrate()
+
+    assert db.session.execute(text("SELECT month_year, amount FROM salary_contribution")).all() == \
+        [('set/25', 1200.0)]
+
+
+def test_lookup_rejects_months_without_factor(app):
+    db.session.add(CorrectionFactor(month_year='set/25', value=2.0))
+    db.session.commit()
+
+    factors = get_factors()
+    assert factors.lookup([parse_month_year('set/25')]).tolist() == [2.0]
+    with pytest.raises(KeyError, match='out/25'):
+        factors.lookup([parse_month_year('out/25')])
+
+
+def test_calculation_aborts_on_month_without_factor(app, user, client):
+    simulation = add_simulation(user)
+    db.session.add(CorrectionFactor(month_year='set/25', value=2.0))
+    db.session.commit()
+
+    response = client.post(f'/simulation/{simulation.id}/calculate',
+                           data={'salary_set/25': '1000', 'salary_out/25': '1000'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/simulation/{simulation.id}/salaries')
+    db.session.expire_all()
+    assert db.session.get(Simulation, simulation.id).result is None
+    assert SalaryContribution.query.count() == 0
@@ -0,0 +1,68 @@
+import html
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+import migrate_db
+from app import db, Simulation
+from app import pdf_reports
+
+IDS = re.compile(r'name="simulation_id" value="(\d+)"')
+OLDER = re.compile(r'<a href="([^"]*before=[^"]*)"[^>]*>Older</a>')
+
+
+def walk_dashboard(client):
+    """Follows the 'Older' links from the first page; returns the ids in the order shown."""
+    seen = []
+    url = '/dashboard'
+    while url:
+        page = client.get(url).get_data(as_text=True)
+        seen.extend(int(i) for i in IDS.findall(page))
+        older = OLDER.search(page)
+        url = html.unescape(older.group(1)) if older else None
+    return seen
+
+
+def test_pages_cover_every_simulation_once(app, user, client):
+    app.config['DASHBOARD_PAGE_SIZE'] = 3
+    # Whole seconds (no microseconds) shared by several rows, plus fractional ones in between
+    stamps = [datetime(2026, 1, 1, 12, 0, 0)] * 5 + [datetime(2026, 1, 1, 12, 0, 0, 500000)] * 2 + \
+             [datetime(2026, 1, 1, 11, 59, 59)] * 4 + [datetime(2026, 1, 2)]
+    for n, stamp in enumerate(stamps):
+        db.session.add(Simulation(server_name=f'Server {n}', dob=date(1970, 1, 1), benefit_type='Aposentadoria',
+                                  gender='FEMININO', user_id=user.id, created_at=stamp))
+    db.session.commit()
+
+    expected = [s.id for s in Simulation.query.order_by(Simulation.created_at.desc(), Simulation.id.desc())]
+    assert walk_dashboard(client) == expected
+
+
+def test_pages_cover_rows_from_the_old_timestamp_default(app, user, client):
+    app.config['DASHBOARD_PAGE_SIZE'] = 2
+    # As CURRENT_TIMESTAMP stored them before the migration: no fraction at all
+    for n in range(5):
+        db.session.execute(text(
+            "INSERT INTO simulation (server_name, dob, benefit_type, gender, user_id, created_at) "
+            "VALUES (:name, '1970-01-01', 'Aposentadoria', 'FEMININO', :user_id, '2026-01-01 12:00:00')"
+        ), {'name': f'Server {n}', 'user_id': user.id})
+    db.session.commit()
+
+    migrate_db.migrate_created_at_format()
+    db.session.commit()
+
+    assert walk_dashboard(client) == [5, 4, 3, 2, 1]
+
+
+def test_search_matches_wildcards_literally(app, user, client):
+    names = ['100% Silva', '1000 Silva', 'Ana_Souza', 'AnaXSouza', 'C:\\Dir', 'C:Dir']
+    for name in names:
+        db.session.add(Simulation(server_name=name, dob=date(1970, 1, 1), benefit_type='Aposentadoria',
+                                  gender='FEMININO', user_id=user.id))
+    db.session.commit()
+    ids = {s.server_name: s.id for s in Simulation.query}
+
+    for search, expected in (('0%', '100% Silva'), ('a_s', 'Ana_Souza'), ('c:\\d', 'C:\\Dir')):
+        page = client.get('/dashboard', query_string={'q': search}).get_data(as_text=True)
+        assert [int(i) for i in IDS.findall(page)] == [ids[expected]]
+        assert [s.id for s in pdf_reports.export_query(user, server_name=search)] == [ids[expected]]
@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from app import db, CorrectionFactor, Simulation, SalaryContribution
+from app import pdf_reports
+from app.batch import calculate_series
+from app.competence import parse_month_year
+from app.factor_cache import get_factors, MissingFactorError
+
+RECORD = {'server_name': 'Server', 'dob': '1970-01-01', 'benefit_type': 'Aposentadoria', 'gender': 'FEMININO'}
+SALARIES = {'jul/25': 900.0, 'ago/25': 1000.0, 'set/25': 1200.0}
+
+
+@pytest.fixture
+def factors(app):
+    db.session.add_all([CorrectionFactor(month_year='jul/25', value=1.1),
+                        CorrectionFactor(month_year='ago/25', value=1.5),
+                        CorrectionFactor(month_year='set/25', value=2.0)])
+    db.session.commit()
+
+
+def add_simulation(user, salaries=None):
+    simulation = Simulation(server_name='Server', dob=date(1970, 1, 1), benefit_type='Aposentadoria',
+                            gender='FEMININO', user_id=user.id)
+    db.session.add(simulation)
+    db.session.flush()
+    for month_year, amount in (salaries or {}).items():
+        db.session.add(SalaryContribution(simulation_id=simulation.id, month_year=month_year, amount=amount))
+    db.session.commit()
+    return simulation
+
+
+def report_average(simulation):
+    report = pdf_reports.build_report(simulation, get_factors())
+    return report['sum_top_90'] / report['count_top_90']
+
+
+def test_batch_form_and_report_agree(client, user, factors):
+    response = client.post('/api/simulations/batch', json=[dict(RECORD, salaries=SALARIES)])
+    assert response.status_code == 201
+    batch_result = response.get_json()['simulations'][0]['result']
+
+    simulation = add_simulation(user)
+    client.post(f'/simulation/{simulation.id}/calculate',
+                data={f'salary_{m}': str(a) for m, a in SALARIES.items()})
+    db.session.expire_all()
+    simulation = db.session.get(Simulation, simulation.id)
+
+    assert simulation.result == pytest.approx(batch_result)
+    assert report_average(simulation) == pytest.approx(batch_result)
+    # Top 90% of three months is two: 1200 * 2.0 and 1000 * 1.5
+    assert batch_result == pytest.approx((2400 + 1500) / 2)
+
+
+def test_every_path_refuses_a_month_without_factor(client, user, factors):
+    salaries = dict(SALARIES, **{'out/25': 5000.0})
+
+    response = client.post('/api/simulations/batch', json=[dict(RECORD, salaries=salaries)])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Simulation #1: No correction factor for out/25"
+
+    simulation = add_simulation(user)
+    response = client.post(f'/simulation/{simulation.id}/calculate',
+                           data={f'salary_{m}': str(a) for m, a in salaries.items()})
+    assert response.headers['Location'].endswith(f'/simulation/{simulation.id}/salaries')
+    db.session.expire_all()
+    assert db.session.get(Simulation, simulation.id).result is None
+
+    with pytest.raises(MissingFactorError, match='out/25'):
+        calculate_series([{parse_month_year(m): a for m, a in salaries.items()}], get_factors())
+
+    stored = add_simulation(user, salaries)
+    with pytest.raises(MissingFactorError, match='out/25'):
+        pdf_reports.build_report(stored, get_factors())
+    response = client.get(f'/simulation/{stored.id}/pdf')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/simulation/{stored.id}/salaries')
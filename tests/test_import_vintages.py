@@ -0,0 +1,32 @@
+import pytest
+
+from app.competence import parse_month_year
+from import_factors import source_vintage
+from import_vintages import parse_vintage
+
+
+@pytest.mark.parametrize('label, month_year', [
+    ('MARÇO/2016', 'mar/2016'),
+    ('Fevereiri/2017', 'fev/2017'),
+    ('Outubro / 2020', 'out/2020'),
+])
+def test_parse_vintage(label, month_year):
+    assert parse_vintage(label) == parse_month_year(month_year)
+
+
+def test_parse_vintage_rejects_other_text():
+    assert parse_vintage('nan') is None
+
+
+@pytest.mark.parametrize('source, month_year', [
+    ('01_2021_art_33.xlsx', 'jan/2021'),
+    ('04a_2015a_arta_33.xls', 'abr/2015'),
+    ('benatual33-18.08.xlsx', 'ago/2018'),
+    ('3a_120217-101010-123.xls', 'fev/2012'),
+])
+def test_source_vintage_falls_back_to_file_name(source, month_year):
+    assert source_vintage('nan', source) == parse_month_year(month_year)
+
+
+def test_source_vintage_prefers_the_label():
+    assert source_vintage('Maio/2019', '01_2021_art_33.xlsx') == parse_month_year('mai/2019')
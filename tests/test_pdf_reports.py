@@ -0,0 +1,88 @@
+import csv
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from app import pdf_reports
+
+
+class HeldExecutor:
+    """Accepts render jobs and leaves them pending until the test finishes them."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def executor(app, monkeypatch):
+    executor = HeldExecutor()
+    os.makedirs(app.config['PDF_CACHE_DIR'])
+    monkeypatch.setattr(pdf_reports, '_get_executor', lambda: executor)
+    monkeypatch.setattr(pdf_reports, '_jobs', {})
+    return executor
+
+
+def other_worker_status(monkeypatch, simulation_id, key):
+    # Another web process shares the cache directory but not the in-memory jobs
+    with monkeypatch.context() as m:
+        m.setattr(pdf_reports, '_jobs', {})
+        return pdf_reports.job_status(simulation_id, key)
+
+
+def test_render_in_another_worker_reads_as_pending(executor, monkeypatch):
+    future = pdf_reports.request_render(1, 'abc', '<html></html>')
+
+    assert pdf_reports.job_status(1, 'abc') == 'pending'
+    assert other_worker_status(monkeypatch, 1, 'abc') == 'pending'
+
+    with open(pdf_reports.artifact_path(1, 'abc'), 'wb') as f:
+        f.write(b'%PDF')
+    future.set_result(0.1)
+
+    assert not os.path.exists(pdf_reports.pending_marker(pdf_reports.artifact_path(1, 'abc')))
+    assert other_worker_status(monkeypatch, 1, 'abc') == 'done'
+
+
+def test_failed_render_reads_as_missing_in_another_worker(executor, monkeypatch):
+    future = pdf_reports.request_render(1, 'abc', '<html></html>')
+    future.set_exception(RuntimeError('render failed'))
+
+    assert pdf_reports.job_status(1, 'abc') == 'failed'
+    assert other_worker_status(monkeypatch, 1, 'abc') == 'missing'
+
+
+def test_stale_pending_marker_is_ignored(executor, monkeypatch):
+    marker = pdf_reports.pending_marker(pdf_reports.artifact_path(1, 'abc'))
+    open(marker, 'w').close()
+    assert pdf_reports.job_status(1, 'abc') == 'pending'
+
+    old = time.time() - pdf_reports.PENDING_MARKER_MAX_AGE - 1
+    os.utime(marker, (old, old))
+    assert pdf_reports.job_status(1, 'abc') == 'missing'
+
+
+def test_export_reports_a_pdf_discarded_before_it_is_archived(app, monkeypatch, tmp_path):
+    kept, discarded = tmp_path / 'kept.pdf', tmp_path / 'discarded.pdf'
+    kept.write_bytes(b'%PDF kept')
+    simulations = [SimpleNamespace(id=1, server_name='Kept'), SimpleNamespace(id=2, server_name='Gone')]
+    items = [pdf_reports.ExportItem(simulations[0], str(kept), 0.1, False, None),
+             pdf_reports.ExportItem(simulations[1], str(discarded), 0.1, True, None)]
+    monkeypatch.setattr(pdf_reports, 'render_many', lambda simulations, factors_for: iter(items))
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(pdf_reports.stream_export_zip(simulations, None))))
+
+    report = list(csv.reader(io.StringIO(archive.read('export_report.csv').decode())))
+    assert report[1][:3] == ['1', pdf_reports.export_filename(simulations[0]), 'rendered']
+    assert report[2][0] == '2' and report[2][1] == ''
+    assert report[2][2].startswith('failed:')
+    assert archive.namelist() == [pdf_reports.export_filename(simulations[0]), 'export_report.csv']
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import pipeline
+from pipeline import Etapa, dependencias, executar
+
+# Copia a entrada para a saída e registra início e fim da execução
+SCRIPT = '''import sys, time, json
+entrada, saida, nome = sys.argv[1:4]
+inicio = time.time()
+time.sleep(0.3)
+with open(entrada) as f, open(saida, 'w') as g:
+    g.write(f.read())
+with open('execucoes.log', 'a') as f:
+    f.write(json.dumps([nome, inicio, time.time()]) + "\\n")
+'''
+
+
+@pytest.fixture
+def projeto(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, 'PASTA_RAIZ', str(tmp_path))
+    (tmp_path / 'copiar.py').write_text(SCRIPT)
+    (tmp_path / 'bruto.txt').write_text('dados')
+    # O script recebe entrada, saída e nome pelos argumentos de cada etapa
+    monkeypatch.setattr(pipeline, 'argumentos_etapa',
+                        lambda etapa, csv: [etapa.entradas[0], etapa.saidas[0], etapa.nome])
+    return tmp_path
+
+
+def execucoes(projeto):
+    caminho = projeto / 'execucoes.log'
+    if not caminho.exists():
+        return []
+    return [json.loads(linha) for linha in caminho.read_text().splitlines()]
+
+
+def rodar(etapas, **opcoes):
+    return executar(etapas, caminho_estado='estado.json', aviso=lambda mensagem: None, **opcoes)
+
+
+def test_dependencias_do_pipeline():
+    deps = dependencias(pipeline.ETAPAS)
+    assert deps['download'] == ['links']
+    assert deps['filtrar_por_data'] == ['processador_final']
+    assert deps['filtrar_final'] == ['processador_inteligente']
+    assert deps['consolidar'] == []
+
+
+def test_saida_gravada_por_duas_etapas():
+    etapas = (Etapa('a', 'a.py', (), ('x.parquet',)), Etapa('b', 'b.py', (), ('x.parquet',)))
+    with pytest.raises(ValueError, match="'x.parquet' é gravado por 'a' e por 'b'"):
+        dependencias(etapas)
+
+
+def test_ciclo_entre_etapas():
+    etapas = (Etapa('a', 'a.py', ('z',), ('x',)), Etapa('b', 'b.py', ('x',), ('y',)),
+              Etapa('c', 'c.py', ('y',), ('z',)))
+    with pytest.raises(ValueError, match="Ciclo entre as etapas"):
+        dependencias(etapas)
+
+
+def test_etapa_atualizada_e_pulada(projeto):
+    etapas = (Etapa('limpar', 'copiar.py', ('bruto.txt',), ('limpo.txt',)),
+              Etapa('final', 'copiar.py', ('limpo.txt',), ('final.txt',)))
+
+    assert rodar(etapas) == {'limpar': 'executada', 'final': 'executada'}
+    assert (projeto / 'final.txt').read_text() == 'dados'
+
+    assert rodar(etapas) == {'limpar': 'atualizada', 'final': 'atualizada'}
+    assert len(execucoes(projeto)) == 2
+
+    # Entrada nova: as duas rodam de novo; saída apagada: só a que a grava
+    (projeto / 'bruto.txt').write_text('dados novos')
+    assert rodar(etapas) == {'limpar': 'executada', 'final': 'executada'}
+    (projeto / 'final.txt').unlink()
+    assert rodar(etapas) == {'limpar': 'atualizada', 'final': 'executada'}
+
+
+def test_etapas_com_recurso_comum_nao_rodam_juntas(projeto):
+    etapas = (Etapa('a', 'copiar.py', ('bruto.txt',), ('a.txt',), recursos=('.cache',)),
+              Etapa('b', 'copiar.py', ('bruto.txt',), ('b.txt',), recursos=('.cache',)))
+
+    assert rodar(etapas, paralelo=2) == {'a': 'executada', 'b': 'executada'}
+
+    (_, inicio_1, fim_1), (_, inicio_2, fim_2) = sorted(execucoes(projeto), key=lambda e: e[1])
+    assert fim_1 <= inicio_2
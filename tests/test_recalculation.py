@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+
+from app import db, CorrectionFactor, Simulation, SalaryContribution
+from app import recalculation
+from app.competence import parse_month_year
+from app.factor_cache import bump_factor_version, invalidate, get_factors
+from app.salary_packing import pack_series
+
+
+@pytest.fixture
+def factors(app):
+    db.session.add_all([CorrectionFactor(month_year=m, value=v)
+                        for m, v in (('jan/25', 1.0), ('fev/25', 1.0), ('mar/25', 1.0), ('abr/25', 1.0),
+                                     ('mai/25', 1.0), ('jul/25', 1.1), ('ago/25', 1.5), ('set/25', 2.0))])
+    bump_factor_version()
+    db.session.commit()
+
+
+def add_simulation(user, salaries, packed=False):
+    simulation = Simulation(server_name='Server', dob=date(1970, 1, 1), benefit_type='Aposentadoria',
+                            gender='FEMININO', user_id=user.id, result=0.0)
+    if packed:
+        simulation.salary_start, simulation.salary_data = pack_series(
+            {parse_month_year(m): a for m, a in salaries.items()})
+    db.session.add(simulation)
+    db.session.flush()
+    if not packed:
+        for month_year, amount in salaries.items():
+            db.session.add(SalaryContribution(simulation_id=simulation.id, month_year=month_year, amount=amount))
+    db.session.commit()
+    return simulation.id
+
+
+def test_affected_packed_series_found_by_range(user, factors):
+    # jan/25 .. mar/25 and jul/25 .. ago/25
+    first = add_simulation(user, {'jan/25': 1000, 'fev/25': 1000, 'mar/25': 1000}, packed=True)
+    second = add_simulation(user, {'jul/25': 1000, 'ago/25': 1000}, packed=True)
+    rows = add_simulation(user, {'abr/25': 1000})
+
+    assert recalculation.affected_simulation_ids(['fev/25']) == [first]
+    assert recalculation.affected_simulation_ids(['abr/25', 'mai/25']) == [rows]
+    assert recalculation.affected_simulation_ids(['mar/25', 'set/25']) == [first]
+    assert recalculation.affected_simulation_ids(['jan/24', 'ago/25']) == [second]
+    assert recalculation.affected_simulation_ids([]) == []
+
+
+def test_deleted_factor_clears_results_instead_of_using_one(user, factors):
+    uses_month = add_simulation(user, {'jul/25': 900, 'set/25': 1200})
+    packed = add_simulation(user, {'ago/25': 1000, 'set/25': 1200}, packed=True)
+    other = add_simulation(user, {'jul/25': 900, 'ago/25': 1000})
+
+    db.session.delete(CorrectionFactor.query.filter_by(month_year='set/25').one())
+    bump_factor_version()
+    db.session.commit()
+    invalidate()
+
+    recalculation.recalculate_months({'set/25'})
+    db.session.expire_all()
+
+    version = get_factors().version
+    for simulation_id in (uses_month, packed):
+        simulation = db.session.get(Simulation, simulation_id)
+        assert simulation.result is None
+        assert simulation.factor_version == version
+    assert db.session.get(Simulation, other).result == 0.0
+
+
+def test_recalculation_uses_the_changed_factor(user, factors):
+    simulation_id = add_simulation(user, {'jul/25': 900, 'set/25': 1200})
+
+    CorrectionFactor.query.filter_by(month_year='set/25').one().value = 3.0
+    bump_factor_version()
+    db.session.commit()
+    invalidate()
+
+    recalculation.recalculate_months({'set/25'})
+    db.session.expire_all()
+    # Top 90% of two months is one: 1200 * 3.0
+    assert db.session.get(Simulation, simulation_id).result == pytest.approx(3600.0)